@@ -0,0 +1,84 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import exceptions
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.views import exception_handler
+
+from users.authentication import AsyncJWTAuthentication
+
+
+def render(data, status=200):
+    """ JSON response with the same bytes DRF's JSONRenderer produces for the sync views """
+    return HttpResponse(JSONRenderer().render(data), status=status, content_type='application/json')
+
+
+class AsyncAPIView(View):
+    """
+    Native async counterpart of a read-only DRF APIView.
+
+    DRF 3.15 has no async views, so under ASGI every APIView runs in a thread through
+    sync_to_async. Subclasses define `async def get()`; authentication, permission checks
+    and error responses follow the DRF conventions of the sync views, and the handler
+    receives a DRF Request so paginators and filters can be reused unchanged.
+    """
+    authentication = AsyncJWTAuthentication()
+    permission_classes = [IsAuthenticated]
+    http_method_names = ['get', 'head', 'options']
+
+    async def dispatch(self, request, *args, **kwargs):
+        request = Request(request)
+        try:
+            authenticated = await self.authentication.aauthenticate(request)
+            request.user = authenticated[0] if authenticated else AnonymousUser()
+            self.check_permissions(request)
+            return await super().dispatch(request, *args, **kwargs)
+        except Exception as exc:
+            return self.handle_exception(request, exc)
+
+    def check_permissions(self, request):
+        for permission in [permission_class() for permission_class in self.permission_classes]:
+            # Permission classes other than IsAuthenticated assume a logged-in user
+            if not request.user.is_authenticated:
+                raise exceptions.NotAuthenticated()
+            if not permission.has_permission(request, self):
+                raise exceptions.PermissionDenied(detail=getattr(permission, 'message', None))
+
+    def handle_exception(self, request, exc):
+        response = exception_handler(exc, {'view': self, 'request': request})
+        if response is None:
+            raise exc
+        rendered = render(response.data, status=response.status_code)
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            rendered.status_code = 401
+            rendered['WWW-Authenticate'] = self.authentication.authenticate_header(request)
+        return rendered
+
+
+def read_async(async_view, sync_view):
+    """
+    Serve one URL with both implementations: GET/HEAD go to the native async view and
+    every other method to the synchronous DRF view through sync_to_async.
+
+    Only used when ASYNC_READ_VIEWS is on (config/asgi.py turns it on); under WSGI the
+    sync view is returned as is, since an async view there would need an event loop per request.
+    """
+    if not getattr(settings, 'ASYNC_READ_VIEWS', False):
+        return sync_view
+
+    write_view = sync_to_async(sync_view)
+
+    async def view(request, *args, **kwargs):
+        if request.method in ('GET', 'HEAD'):
+            return await async_view(request, *args, **kwargs)
+        return await write_view(request, *args, **kwargs)
+
+    # Keep what Django and the schema generator read from a DRF view
+    view.csrf_exempt = True
+    view.cls = sync_view.cls
+    view.initkwargs = sync_view.initkwargs
+    return view
@@ -0,0 +1,49 @@
+from django.utils.dateparse import parse_datetime
+
+from .async_api import AsyncAPIView, render
+from .cache import aget_card_payload, aget_list_generation
+from .conditional import conditional_response, make_etag, page_etag, set_validators
+from .models import CreditCard
+from .pagination import CreditCardCursorPagination, apaginate_queryset
+from .serializers import CreditCardListSerializer
+from .views import CreditCardListCreateView
+
+
+class AsyncCreditCardListView(AsyncAPIView):
+    """ Native async implementation of CreditCardListCreateView.get """
+    pagination_class = CreditCardCursorPagination
+
+    async def get(self, request):
+        user = request.user
+        queryset = CreditCard.objects.all() if user.role in ['ADMIN', 'MANAGER'] else CreditCard.objects.filter(user=user)
+        queryset = CreditCardListCreateView().filter_queryset(queryset, request)
+
+        paginator = self.pagination_class()
+        page = await apaginate_queryset(paginator, CreditCardListSerializer.get_queryset(queryset), request, view=self)
+        etag = page_etag(
+            page, 'cards', 'all' if user.role in ['ADMIN', 'MANAGER'] else user.id, request.get_full_path(),
+            paginator.get_next_link(), paginator.get_previous_link(), await aget_list_generation()
+        )
+        not_modified = conditional_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+
+        data = paginator.get_paginated_response(CreditCardListSerializer(page).data).data
+        return set_validators(render(data), etag)
+
+
+class AsyncCreditCardDetailView(AsyncAPIView):
+    """ Native async implementation of CreditCardDetailView.get """
+
+    async def get(self, request, pk):
+        payload = await aget_card_payload(pk)
+        if payload is None or (request.user.role not in ['ADMIN', 'MANAGER'] and payload['user_id'] != request.user.id):
+            return render({'error': 'Card not found'}, status=404)
+
+        data = payload['data']
+        last_modified = parse_datetime(data['updated_at'])
+        etag = make_etag('card', pk, data['updated_at'], data['user_email'], data.get('approved_by_email'))
+        not_modified = conditional_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+        return set_validators(render(data), etag, last_modified)
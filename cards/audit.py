@@ -0,0 +1,147 @@
+import atexit
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.utils import timezone
+
+from .models import CardAuditEvent
+
+logger = logging.getLogger(__name__)
+
+
+def get_batch_size():
+    return int(getattr(settings, 'CARD_AUDIT_BATCH_SIZE', 500))
+
+
+def get_flush_interval():
+    return float(getattr(settings, 'CARD_AUDIT_FLUSH_INTERVAL', 1.0))
+
+
+def describe_changes(card_id, old_values, new_values, changed_by, rejection_reason=None):
+    """ Audit events for the audited fields that differ between old_values and new_values """
+    changed_at = timezone.now()
+    events = []
+    for field, _ in CardAuditEvent.FIELD_CHOICES:
+        if field not in new_values or old_values.get(field) == new_values[field]:
+            continue
+        old_value, new_value = old_values.get(field), new_values[field]
+        events.append(CardAuditEvent(
+            card_id=card_id,
+            field=field,
+            old_value=None if old_value is None else str(old_value),
+            new_value=None if new_value is None else str(new_value),
+            rejection_reason=rejection_reason if field == 'status' and new_value == 'REJECTED' else None,
+            changed_by=changed_by,
+            changed_at=changed_at,
+        ))
+    return events
+
+
+class CardAuditWriter:
+    """
+    Buffers audit events in process memory and writes them with bulk_create from a
+    daemon thread, every CARD_AUDIT_FLUSH_INTERVAL seconds or as soon as a batch is full.
+
+    Events are handed over only when the transaction that produced them commits, so a
+    rolled-back change leaves no trace and the request never waits on the INSERT.
+
+    The buffer is written by close() when the interpreter exits normally (including a
+    server stopping its workers on SIGTERM). A process that is killed or crashes loses
+    the events of its last CARD_AUDIT_FLUSH_INTERVAL seconds, or more while the database
+    refuses the writes; set CARD_AUDIT_ASYNC = False to write them in the committing
+    thread instead.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closing = threading.Event()
+        self._pending = []
+        self._thread = None
+        self._pid = None
+
+    def record(self, events):
+        events = list(events)
+        if events:
+            transaction.on_commit(lambda: self._enqueue(events))
+
+    def _enqueue(self, events):
+        if not getattr(settings, 'CARD_AUDIT_ASYNC', True) or self._closing.is_set():
+            self._write(events)
+            return
+
+        with self._lock:
+            self._reset_after_fork()
+            self._pending.extend(events)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='card-audit-writer', daemon=True)
+                self._thread.start()
+            if len(self._pending) >= get_batch_size():
+                self._wakeup.set()
+
+    def _reset_after_fork(self):
+        # Events buffered by a parent process are the parent's to write
+        if self._pid != os.getpid():
+            self._pending = []
+            self._thread = None
+            self._pid = os.getpid()
+
+    def _run(self):
+        while not self._closing.is_set():
+            self._wakeup.wait(get_flush_interval())
+            self._wakeup.clear()
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Writing card audit events failed, retrying on the next flush')
+        connections.close_all()
+
+    def flush(self):
+        """ Write everything buffered so far; failed batches go back to the front of the buffer """
+        with self._flush_lock:
+            with self._lock:
+                self._reset_after_fork()
+                events, self._pending = self._pending, []
+            try:
+                self._write(events)
+            except Exception:
+                with self._lock:
+                    self._pending[:0] = events
+                raise
+
+    def close(self):
+        """ Stop the writer thread, waiting for a flush it is in, then write what is still buffered """
+        with self._lock:
+            thread = self._thread if self._pid == os.getpid() else None
+        self._closing.set()
+        self._wakeup.set()
+        if thread is not None:
+            thread.join(get_flush_interval() + 5)
+        self.flush()
+
+    @staticmethod
+    def _write(events):
+        batch_size = get_batch_size()
+        while events:
+            CardAuditEvent.objects.bulk_create(events[:batch_size])
+            del events[:batch_size]
+
+
+audit_writer = CardAuditWriter()
+
+
+def record_changes(card_id, old_values, new_values, changed_by, rejection_reason=None):
+    audit_writer.record(describe_changes(card_id, old_values, new_values, changed_by, rejection_reason))
+
+
+@atexit.register
+def _close_on_exit():
+    try:
+        audit_writer.close()
+    except Exception:
+        logger.exception('Card audit events could not be written at exit')
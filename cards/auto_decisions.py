@@ -0,0 +1,180 @@
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, F, Q
+
+from .models import CreditCard
+from .services import CardDecisionService
+
+
+class AutoDecisionRules:
+    """
+    Approval rules from the CARD_AUTO_DECISION_RULES setting.
+
+    A pending card is rejected when its applicant already holds REJECT_AT_CARDS approved
+    cards, approved when the applicant's role is in APPROVE_ROLES, they hold fewer than
+    APPROVE_MAX_CARDS approved cards and the requested limit is within APPROVE_MAX_LIMIT
+    for the card type, and otherwise left pending for a human.
+    """
+    DEFAULTS = {
+        'APPROVE_MAX_LIMIT': {},
+        'APPROVE_ROLES': ['USER'],
+        'APPROVE_MAX_CARDS': 1,
+        'REJECT_AT_CARDS': None,
+        'REJECTION_REASON': 'Applicant already holds the maximum number of cards',
+    }
+
+    def __init__(self, **rules):
+        rules = {**self.DEFAULTS, **rules}
+        self.max_limits = {card_type: Decimal(str(limit)) for card_type, limit in rules['APPROVE_MAX_LIMIT'].items()}
+        self.roles = set(rules['APPROVE_ROLES'])
+        self.max_cards = rules['APPROVE_MAX_CARDS']
+        self.reject_at_cards = rules['REJECT_AT_CARDS']
+        self.rejection_reason = rules['REJECTION_REASON']
+
+    @classmethod
+    def from_settings(cls):
+        return cls(**getattr(settings, 'CARD_AUTO_DECISION_RULES', {}))
+
+    def decide(self, card_type, credit_limit, role, held_cards):
+        """ Returns (status, rejection_reason), or None to leave the card for review """
+        if self.reject_at_cards is not None and held_cards >= self.reject_at_cards:
+            return 'REJECTED', self.rejection_reason
+        if (role in self.roles and held_cards < self.max_cards
+                and card_type in self.max_limits and credit_limit <= self.max_limits[card_type]):
+            return 'APPROVED', None
+        return None
+
+
+class AutoDecisionWorker:
+    """
+    Works through pending cards oldest first, in batches of batch_size, and writes each
+    batch's decisions through CardDecisionService.bulk_update_status, so the portfolio
+    counters, audit log and card cache follow as they do for a manager's bulk decision.
+
+    Pending cards are split into `concurrency` shards by applicant (user_id modulo the
+    shard count), each read by its own thread and connection. All cards of one applicant
+    are therefore decided by one thread in order, which keeps the held-card counts the
+    rules look at exact. Within a pass each shard walks a (created_at, id) cursor, so cards
+    left for review are read once per pass. Every pass starts again from the oldest pending
+    card: an application whose transaction committed after the cursor moved past its
+    created_at, or one the rules can decide now that its applicant's cards changed, is
+    picked up by the next pass.
+    """
+
+    def __init__(self, rules, decided_by=None, batch_size=1000, concurrency=1, dry_run=False, on_batch=None):
+        self.rules = rules
+        self.decided_by = decided_by
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.dry_run = dry_run
+        self.on_batch = on_batch
+        self.cursors = [None] * concurrency
+        self._lock = threading.Lock()
+
+    def run_pass(self):
+        """ Decide every pending card the rules cover; returns the pass's Counter of outcomes """
+        self.cursors = [None] * self.concurrency
+        totals = Counter()
+        if self.concurrency == 1:
+            self._run_shard(0, totals)
+            return totals
+
+        def run(shard):
+            try:
+                self._run_shard(shard, totals)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            # list() re-raises the first error of any shard
+            list(pool.map(run, range(self.concurrency)))
+        return totals
+
+    def _run_shard(self, shard, totals):
+        while True:
+            started = time.perf_counter()
+            rows = self._claim(shard)
+            if not rows:
+                return
+            outcome = self._decide_batch(rows)
+            last = rows[-1]
+            self.cursors[shard] = (last['created_at'], last['pk'])
+            with self._lock:
+                totals.update(outcome)
+            if self.on_batch:
+                self.on_batch(shard, outcome, time.perf_counter() - started)
+            if len(rows) < self.batch_size:
+                return
+
+    def _claim(self, shard):
+        queryset = CreditCard.objects.filter(status='PENDING')
+        if self.concurrency > 1:
+            queryset = queryset.alias(shard=F('user_id') % self.concurrency).filter(shard=shard)
+        cursor = self.cursors[shard]
+        if cursor is not None:
+            created_at, pk = cursor
+            queryset = queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=pk))
+        return list(
+            queryset.order_by('created_at', 'id')
+            .values('pk', 'user_id', 'user__role', 'card_type', 'credit_limit', 'created_at')[:self.batch_size]
+        )
+
+    def _decide_batch(self, rows):
+        """
+        Decide and write a batch in rounds. An applicant's cards are decided in order up to
+        their next approval, and the cards after it wait for a later round: the approval
+        only counts towards the cards they hold once the UPDATE has actually changed it, so
+        a card skipped as a conflict never holds back the applicant's later cards.
+        """
+        held = self._held_cards({row['user_id'] for row in rows})
+        outcome = Counter(scanned=len(rows))
+        while rows:
+            decisions, approvals, waiting, later = [], {}, set(), []
+            for row in rows:
+                if row['user_id'] in waiting:
+                    later.append(row)
+                    continue
+                decision = self.rules.decide(row['card_type'], row['credit_limit'], row['user__role'],
+                                             held[row['user_id']])
+                if decision is None:
+                    outcome['review'] += 1
+                    continue
+                card_status, rejection_reason = decision
+                decisions.append({'id': row['pk'], 'status': card_status, 'rejection_reason': rejection_reason})
+                if card_status == 'APPROVED':
+                    approvals[row['pk']] = row['user_id']
+                    waiting.add(row['user_id'])
+
+            if self.dry_run:
+                updated = {decision['id'] for decision in decisions}
+            elif decisions:
+                updated, _ = CardDecisionService.bulk_update_status(decisions, self.decided_by)
+            else:
+                updated = set()
+            outcome.update(decision['status'].lower() for decision in decisions if decision['id'] in updated)
+            # Decided by someone else between the read and the locked re-read, or deleted
+            outcome['skipped'] += len(decisions) - len(updated)
+            for pk, user_id in approvals.items():
+                if pk in updated:
+                    # Later cards of the same applicant in this batch see this approval
+                    held[user_id] += 1
+            rows = later
+        return outcome
+
+    @staticmethod
+    def _held_cards(user_ids):
+        held = Counter()
+        user_ids = list(user_ids)
+        chunk_size = CardDecisionService.CHUNK_SIZE
+        for start in range(0, len(user_ids), chunk_size):
+            held.update(dict(
+                CreditCard.objects.filter(user_id__in=user_ids[start:start + chunk_size], status='APPROVED')
+                .values('user_id').annotate(cards=Count('id')).values_list('user_id', 'cards')
+            ))
+        return held
@@ -0,0 +1,131 @@
+"""
+Versioned read-through cache of card detail payloads.
+
+Invalidation deletes a card's version key once the writing transaction commits, which
+only reaches other processes through a shared cache backend; users.checks refuses
+local memory and dummy caches for the default alias under `check --deploy`.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from config.cache_steps import arun, run, versioned
+
+from .models import CreditCard
+from .serializers import CreditCardDetailSerializer
+
+# Wait used when a key is missing entirely and another request is already building it
+LOCK_WAIT_STEP = 0.05
+LOCK_WAIT_STEPS = 10
+
+LIST_GENERATION_KEY = 'cards:list:generation'
+
+
+def get_timeout():
+    return int(getattr(settings, 'CARD_CACHE_TIMEOUT', 300))
+
+
+def get_lock_timeout():
+    return int(getattr(settings, 'CARD_CACHE_LOCK_TIMEOUT', 10))
+
+
+def version_key(pk):
+    return f'cards:detail:{pk}:version'
+
+
+def get_version(pk):
+    """
+    Current cache generation of a card. Invalidation deletes it, and a fresh one is a
+    new unique value, so payloads built from data read before a write become unreachable.
+    """
+    return run(versioned(version_key(pk)))
+
+
+def load_card_payload(pk):
+    """ Build the cacheable payload for a card, or None if it does not exist """
+    try:
+        credit_card = CreditCard.objects.select_related('user', 'approved_by').get(pk=pk)
+    except CreditCard.DoesNotExist:
+        return None
+    return {'user_id': credit_card.user_id, 'data': dict(CreditCardDetailSerializer(credit_card).data)}
+
+
+async def aload_card_payload(pk):
+    """ load_card_payload through the async ORM """
+    try:
+        credit_card = await CreditCard.objects.select_related('user', 'approved_by').aget(pk=pk)
+    except CreditCard.DoesNotExist:
+        return None
+    return {'user_id': credit_card.user_id, 'data': dict(CreditCardDetailSerializer(credit_card).data)}
+
+
+def card_payload_steps(pk):
+    """ Read path shared by get_card_payload and aget_card_payload, see config.cache_steps """
+    version = yield from versioned(version_key(pk))
+    key = f'cards:detail:{pk}:{version}'
+    lock_key = f'{key}:lock'
+    timeout = get_timeout()
+
+    entry = yield ('get', key)
+    if entry is not None:
+        if entry['soft_expires'] > time.time() or not (yield ('add', lock_key, 1, get_lock_timeout())):
+            return entry['payload']
+    elif not (yield ('add', lock_key, 1, get_lock_timeout())):
+        for _ in range(LOCK_WAIT_STEPS):
+            yield ('sleep', LOCK_WAIT_STEP)
+            entry = yield ('get', key)
+            if entry is not None:
+                return entry['payload']
+        # The builder is slow or gone; serve from the database without caching
+        return (yield ('load', pk))
+
+    try:
+        payload = yield ('load', pk)
+        if payload is not None:
+            # Keep stale copies around for another half period so they can be served during a rebuild
+            entry = {'payload': payload, 'soft_expires': time.time() + timeout}
+            yield ('set', key, entry, timeout + timeout // 2)
+    except Exception:
+        yield ('delete', lock_key)
+        raise
+    yield ('delete', lock_key)
+    return payload
+
+
+def get_card_payload(pk):
+    """
+    Read-through cache for a card's serialized detail payload plus its owner id.
+
+    Entries carry a soft expiry ahead of the real timeout. The first request past it
+    takes a short lock with cache.add() and rebuilds while everyone else keeps serving
+    the stale copy, so an expiring hot key is rebuilt only once. When the key is missing
+    entirely, requests that lose the lock wait briefly for the winner's result.
+    """
+    return run(card_payload_steps(pk), load_card_payload)
+
+
+async def aget_card_payload(pk):
+    """ get_card_payload for the async views, through the async cache API and ORM """
+    return await arun(card_payload_steps(pk), aload_card_payload)
+
+
+def get_list_generation():
+    """ Changes whenever a user's email changes, since card lists embed owner and approver emails """
+    return run(versioned(LIST_GENERATION_KEY))
+
+
+async def aget_list_generation():
+    return await arun(versioned(LIST_GENERATION_KEY))
+
+
+def bump_list_generation():
+    transaction.on_commit(lambda: cache.delete(LIST_GENERATION_KEY))
+
+
+def invalidate_cards(pks):
+    """ Drop cached payloads once the current transaction commits """
+    keys = [version_key(pk) for pk in pks]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,45 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+
+def make_etag(*parts):
+    """ Weak ETag over the given validator parts; weak because the rendered format may vary """
+    digest = hashlib.md5('|'.join(str(part) for part in parts).encode(), usedforsecurity=False).hexdigest()
+    return f'W/"{digest}"'
+
+
+def page_etag(rows, *parts):
+    """
+    ETag of a list page built from the rows already fetched for it: their ids and
+    updated_at, plus the given parts. No query beyond the page itself is needed.
+
+    There is no matching Last-Modified: the newest updated_at on a page does not move
+    when a row leaves it, so If-Modified-Since would answer 304 after a delete.
+    """
+    return make_etag(*parts, *(f"{row['id']}@{row['updated_at'].isoformat()}" for row in rows))
+
+
+def set_validators(response, etag, last_modified=None):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    # Validators depend on who is asking
+    patch_vary_headers(response, ['Authorization'])
+    return response
+
+
+def conditional_response(request, etag, last_modified=None):
+    """
+    Returns the 304 (or 412) response when the request's If-None-Match / If-Modified-Since
+    headers match the given validators, otherwise None so the view renders normally.
+    """
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp()) if last_modified is not None else None,
+    )
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
@@ -0,0 +1,174 @@
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+import secrets
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import CreditCard, CardExportJob
+
+logger = logging.getLogger(__name__)
+
+# Same shape as CreditCardDetailSerializer, fetched in one joined query per chunk
+EXPORT_FIELDS = (
+    'id', 'card_number', 'card_type', 'credit_limit', 'status', 'user__email',
+    'approved_by__email', 'rejection_reason', 'created_at', 'updated_at'
+)
+EXPORT_COLUMNS = (
+    'id', 'card_number', 'card_type', 'credit_limit', 'status', 'user_email',
+    'approved_by_email', 'rejection_reason', 'created_at', 'updated_at'
+)
+
+
+def get_export_root():
+    return str(getattr(settings, 'CARD_EXPORT_ROOT', os.path.join(settings.BASE_DIR, 'exports')))
+
+
+def get_lease():
+    return int(getattr(settings, 'CARD_EXPORT_LEASE', 10 * 60))
+
+
+class CardExporter:
+    """
+    Streams the CreditCard table in primary-key chunks into a gzip file under CARD_EXPORT_ROOT.
+    That directory is not served by the web server; files get a random name and are only
+    downloaded through CardExportDownloadView.
+
+    Every chunk is written as its own gzip member, so the file is always a valid
+    multi-member archive. After each member is flushed the job records the last
+    exported id and the byte offset; a resumed run truncates anything written past
+    that offset and continues from the next id.
+
+    Every checkpoint also renews updated_at. A RUNNING job not renewed for CARD_EXPORT_LEASE
+    seconds belongs to a worker that died and can be claimed again.
+    """
+    RESUMABLE_STATUSES = ('PENDING', 'FAILED')
+
+    def __init__(self, job, chunk_size=None):
+        self.job = job
+        self.chunk_size = chunk_size or int(getattr(settings, 'CARD_EXPORT_CHUNK_SIZE', 5000))
+
+    @staticmethod
+    def extension(job):
+        return 'ndjson.gz' if job.export_format == 'NDJSON' else 'csv.gz'
+
+    @classmethod
+    def relative_path(cls, job):
+        # Unguessable, so a leaked directory listing or log line does not point at a file
+        return f'cards-{secrets.token_urlsafe(16)}.{cls.extension(job)}'
+
+    @staticmethod
+    def absolute_path(job):
+        return os.path.join(get_export_root(), job.file_path)
+
+    @classmethod
+    def resumable(cls):
+        """ Jobs a worker may pick up: never started, failed, or RUNNING past their lease """
+        stale = Q(status='RUNNING', updated_at__lt=timezone.now() - timedelta(seconds=get_lease()))
+        return CardExportJob.objects.filter(Q(status__in=cls.RESUMABLE_STATUSES) | stale)
+
+    def claim(self, force=False):
+        """ Atomically move the job to RUNNING so two workers never write the same file """
+        jobs = self.resumable()
+        if force:
+            jobs |= CardExportJob.objects.filter(status='RUNNING')
+        claimed = jobs.filter(pk=self.job.pk).update(status='RUNNING', error=None, updated_at=timezone.now())
+        self.job.refresh_from_db()
+        return bool(claimed)
+
+    def run(self, force=False):
+        job = self.job
+        if not self.claim(force=force):
+            logger.info('Export job %s is already %s, skipping', job.pk, job.status)
+            return job
+
+        try:
+            self._export()
+        except Exception as e:
+            logger.exception('Export job %s failed', job.pk)
+            job.status = 'FAILED'
+            job.error = str(e)
+            job.save(update_fields=['status', 'error', 'updated_at'])
+            raise
+
+        job.status = 'COMPLETED'
+        job.completed_at = timezone.now()
+        job.save(update_fields=['status', 'completed_at', 'updated_at'])
+        return job
+
+    def _export(self):
+        job = self.job
+        if not job.file_path:
+            job.file_path = self.relative_path(job)
+        absolute_path = self.absolute_path(job)
+        os.makedirs(os.path.dirname(absolute_path), exist_ok=True)
+
+        if not os.path.exists(absolute_path) or os.path.getsize(absolute_path) < job.file_offset:
+            # The partial file is gone or shorter than the checkpoint, so start over
+            job.last_exported_id = job.file_offset = job.exported_rows = 0
+
+        job.total_rows = job.exported_rows + CreditCard.objects.filter(pk__gt=job.last_exported_id).count()
+        job.save(update_fields=['file_path', 'last_exported_id', 'file_offset', 'exported_rows', 'total_rows', 'updated_at'])
+
+        with open(absolute_path, 'r+b' if os.path.exists(absolute_path) else 'wb') as raw:
+            raw.seek(job.file_offset)
+            raw.truncate()
+
+            while True:
+                rows = list(
+                    CreditCard.objects.filter(pk__gt=job.last_exported_id)
+                    .order_by('pk')
+                    .values_list(*EXPORT_FIELDS)[:self.chunk_size]
+                )
+                if not rows:
+                    break
+
+                with gzip.GzipFile(fileobj=raw, mode='wb') as member:
+                    member.write(self.encode(rows, include_header=job.file_offset == 0))
+                raw.flush()
+                os.fsync(raw.fileno())
+
+                job.last_exported_id = rows[-1][0]
+                job.file_offset = raw.tell()
+                job.exported_rows += len(rows)
+                job.save(update_fields=['last_exported_id', 'file_offset', 'exported_rows', 'updated_at'])
+
+    def encode(self, rows, include_header=False):
+        if self.job.export_format == 'NDJSON':
+            lines = (json.dumps(dict(zip(EXPORT_COLUMNS, row)), cls=DjangoJSONEncoder) for row in rows)
+            return ''.join(f'{line}\n' for line in lines).encode()
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if include_header:
+            writer.writerow(EXPORT_COLUMNS)
+        for row in rows:
+            writer.writerow(value.isoformat() if hasattr(value, 'isoformat') else value for value in row)
+        return buffer.getvalue().encode()
+
+
+def _run_export_job(job_id):
+    close_old_connections()
+    try:
+        CardExporter(CardExportJob.objects.get(pk=job_id)).run()
+    except Exception:
+        # Already recorded on the job; it can be resumed with `manage.py export_cards --resume`
+        pass
+    finally:
+        connection.close()
+
+
+def start_export_in_background(job):
+    """ Run the export in a daemon thread so the request returns immediately """
+    thread = threading.Thread(target=_run_export_job, args=(job.pk,), name=f'card-export-{job.pk}', daemon=True)
+    thread.start()
+    return thread
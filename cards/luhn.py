@@ -0,0 +1,79 @@
+"""
+Vectorized Luhn validation and check-digit completion for large batches of card numbers.
+
+CardNumberGenerator.calculate_luhn_checksum / is_valid_card_number remain the reference
+implementation; these functions must agree with them element by element.
+"""
+import numpy as np
+
+# ISO/IEC 7812 card numbers have at most 19 digits. The digit matrix is as wide as the
+# longest string, so anything longer is refused before it is built.
+MAX_NUMBER_LENGTH = 19
+
+# Digit sum of 2*d for d in 0..9
+DOUBLED_DIGIT_SUMS = np.array([0, 2, 4, 6, 8, 1, 3, 5, 7, 9], dtype=np.uint8)
+
+
+def _digit_matrix(numbers, max_length=MAX_NUMBER_LENGTH):
+    """
+    One row per number, left-aligned and zero padded. Returns (digits, lengths, in_number, is_numeric);
+    is_numeric is False for empty strings and anything that is not purely ASCII digits.
+    Raises ValueError for strings longer than max_length.
+    """
+    if max(map(len, numbers)) > max_length:
+        raise ValueError(f'Expected at most {max_length} characters per number')
+    try:
+        encoded = np.array(numbers, dtype=np.bytes_)
+    except UnicodeEncodeError:
+        # Non-ASCII characters become '?', which then fails the digit check
+        encoded = np.array([str(number).encode('ascii', errors='replace') for number in numbers], dtype=np.bytes_)
+    width = encoded.dtype.itemsize
+    raw = np.frombuffer(encoded.tobytes(), dtype=np.uint8).reshape(len(encoded), width)
+    lengths = np.char.str_len(encoded)
+
+    in_number = np.arange(width) < lengths[:, None]
+    # uint8 arithmetic wraps anything below '0' past 9, so one comparison finds non-digits
+    digits = raw - np.uint8(ord('0'))
+    is_digit = digits <= 9
+    is_numeric = (lengths > 0) & np.all(is_digit | ~in_number, axis=1)
+    digits[~(in_number & is_digit)] = 0
+    return digits, lengths, in_number, is_numeric
+
+
+def _luhn_totals(digits, lengths, in_number, double_rightmost):
+    """ Luhn sum per row; double_rightmost=True for payloads that still lack their check digit """
+    parity = (lengths - (1 if double_rightmost else 0)) % 2
+    doubled = (np.arange(digits.shape[1]) % 2 == parity[:, None]) & in_number
+    values = np.where(doubled, DOUBLED_DIGIT_SUMS[digits], digits)
+    return values.sum(axis=1, dtype=np.int64)
+
+
+def validate_card_numbers(numbers):
+    """ Boolean array telling which of the card number strings pass the Luhn check """
+    if not len(numbers):
+        return np.zeros(0, dtype=bool)
+    digits, lengths, in_number, is_numeric = _digit_matrix(numbers)
+    totals = _luhn_totals(digits, lengths, in_number, double_rightmost=False)
+    return is_numeric & (totals % 10 == 0)
+
+
+def calculate_check_digits(partial_numbers):
+    """
+    Check digit (0-9) for each payload, or -1 where the payload is not numeric.
+    Matches CardNumberGenerator.calculate_luhn_checksum. Payloads leave room for the check
+    digit, so they are at most MAX_NUMBER_LENGTH - 1 characters long.
+    """
+    if not len(partial_numbers):
+        return np.zeros(0, dtype=np.int8)
+    digits, lengths, in_number, is_numeric = _digit_matrix(partial_numbers, max_length=MAX_NUMBER_LENGTH - 1)
+    totals = _luhn_totals(digits, lengths, in_number, double_rightmost=True)
+    return np.where(is_numeric, (10 - totals % 10) % 10, -1).astype(np.int8)
+
+
+def complete_card_numbers(partial_numbers):
+    """ Append the Luhn check digit to every payload; non-numeric payloads become None """
+    check_digits = calculate_check_digits(partial_numbers)
+    return [
+        f"{partial}{check_digit}" if check_digit >= 0 else None
+        for partial, check_digit in zip(partial_numbers, check_digits.tolist())
+    ]
@@ -0,0 +1,83 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from cards.audit import audit_writer
+from cards.auto_decisions import AutoDecisionRules, AutoDecisionWorker
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = (
+        'Approve or reject pending card applications that CARD_AUTO_DECISION_RULES can decide, '
+        'in batches, leaving the rest for a manager. Runs one pass, or keeps polling with --loop.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Pending cards read and decided per batch')
+        parser.add_argument('--concurrency', type=int, default=1,
+                            help='Threads deciding disjoint shards of applicants (PostgreSQL; SQLite runs one)')
+        parser.add_argument('--decided-by', metavar='EMAIL',
+                            help='Account recorded as approver and in the audit log; none by default')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new applications')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds between passes with --loop')
+        parser.add_argument('--dry-run', action='store_true', help='Evaluate the rules without writing anything')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--batch-size and --concurrency must be positive')
+
+        decided_by = None
+        if options['decided_by']:
+            try:
+                decided_by = CustomUser.objects.get(email=CustomUser.objects.normalize_email(options['decided_by']))
+            except CustomUser.DoesNotExist:
+                raise CommandError(f"User {options['decided_by']} does not exist")
+
+        concurrency = options['concurrency']
+        if concurrency > 1 and connection.vendor == 'sqlite':
+            # SQLite has a single writer, so extra threads would only wait on its lock
+            self.stderr.write(self.style.WARNING('SQLite allows one writer at a time; running with --concurrency 1'))
+            concurrency = 1
+
+        worker = AutoDecisionWorker(
+            AutoDecisionRules.from_settings(),
+            decided_by=decided_by,
+            batch_size=options['batch_size'],
+            concurrency=concurrency,
+            dry_run=options['dry_run'],
+            on_batch=self.report_batch if options['verbosity'] > 1 else None,
+        )
+
+        try:
+            while True:
+                started = time.perf_counter()
+                totals = worker.run_pass()
+                # Audit events are written by a background thread; do not leave them buffered
+                audit_writer.flush()
+                if totals['scanned'] or not options['loop']:
+                    self.report_pass(totals, time.perf_counter() - started, options['dry_run'])
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            audit_writer.flush()
+
+    def report_batch(self, shard, outcome, elapsed):
+        self.stdout.write(
+            f"shard {shard}: {outcome['scanned']} cards in {elapsed * 1000:.0f} ms "
+            f"({outcome['approved']} approved, {outcome['rejected']} rejected, {outcome['review']} left for review)"
+        )
+
+    def report_pass(self, totals, elapsed, dry_run):
+        rate = totals['scanned'] / elapsed if elapsed else 0
+        prefix = 'Dry run: would have ' if dry_run else ''
+        message = (
+            f"{prefix}{'approved' if dry_run else 'Approved'} {totals['approved']}, rejected {totals['rejected']} "
+            f"and left {totals['review']} for review out of {totals['scanned']} pending cards "
+            f"in {elapsed:.2f}s ({rate:.0f} cards/s)"
+        )
+        if totals['skipped']:
+            message += f"; {totals['skipped']} were decided elsewhere first"
+        self.stdout.write(self.style.SUCCESS(message))
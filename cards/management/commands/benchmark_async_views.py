@@ -0,0 +1,205 @@
+import asyncio
+import importlib
+import io
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test.utils import override_settings
+from django.urls import clear_url_caches
+from rest_framework_simplejwt.tokens import AccessToken
+
+from cards.models import CreditCard
+from users.models import CustomUser
+
+HOST = 'localhost'
+
+# (label, handler, native async read views)
+DEPLOYMENTS = (
+    ('WSGI, sync views', 'wsgi', False),
+    ('ASGI, sync views', 'asgi', False),
+    ('ASGI, async views', 'asgi', True),
+)
+
+
+@contextmanager
+def read_views(async_views):
+    """ read_async() picks the implementation when the URLconf is imported, so re-import it """
+    with override_settings(ASYNC_READ_VIEWS=async_views, ALLOWED_HOSTS=[HOST], DEBUG=False):
+        reload_urlconf()
+        try:
+            yield
+        finally:
+            reload_urlconf()
+
+
+def reload_urlconf():
+    for module in ('cards.urls', 'users.urls', 'config.urls'):
+        importlib.reload(importlib.import_module(module))
+    clear_url_caches()
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway test database, then drive the card list/detail, user-info and user list '
+        'endpoints under concurrent load through the WSGI handler (thread pool, like a threaded WSGI '
+        'server) and the ASGI handler (one event loop, like a single ASGI worker), with and without '
+        'the native async views. Prints requests/sec and p50/p99 latency per endpoint.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per endpoint and deployment')
+        parser.add_argument('--concurrency', type=int, default=32, help='Requests in flight at once')
+        parser.add_argument('--cards', type=int, default=5000, help='Number of cards to seed')
+        parser.add_argument('--users', type=int, default=500, help='Number of card owners to seed')
+
+    def handle(self, *args, **options):
+        # Never touch real data: everything runs in a freshly created test database
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.seed(options['cards'], options['users'])
+            for label, handler, async_views in DEPLOYMENTS:
+                with read_views(async_views):
+                    self.stdout.write(self.style.SUCCESS(label))
+                    for name, path, token in self.endpoints():
+                        if handler == 'wsgi':
+                            timings, elapsed = self.run_wsgi(path, token, options['requests'], options['concurrency'])
+                        else:
+                            timings, elapsed = asyncio.run(
+                                self.run_asgi(path, token, options['requests'], options['concurrency'])
+                            )
+                        self.report(name, timings, elapsed)
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def seed(self, card_count, user_count):
+        rng = random.Random(0)
+        users = CustomUser.objects.bulk_create(
+            CustomUser(email=f'owner{i}@example.com', role='USER') for i in range(user_count)
+        )
+        self.manager = CustomUser.objects.create(email='manager@example.com', role='MANAGER')
+        self.owner = users[0]
+        card_types = [card_type for card_type, _ in CreditCard.CARD_TYPES]
+        for start in range(0, card_count, 5000):
+            CreditCard.objects.bulk_create(
+                CreditCard(
+                    user=self.owner if index % 10 == 0 else rng.choice(users),
+                    card_number=f'9{index:015d}',
+                    card_type=rng.choice(card_types),
+                    credit_limit=rng.randrange(500, 50000),
+                    status=rng.choice(['PENDING', 'APPROVED', 'REJECTED']),
+                )
+                for index in range(start, min(start + 5000, card_count))
+            )
+        self.card = CreditCard.objects.filter(user=self.owner).first()
+
+    def endpoints(self):
+        manager_token = str(AccessToken.for_user(self.manager))
+        owner_token = str(AccessToken.for_user(self.owner))
+        return [
+            ('GET /cards/ (manager)', '/cards/', manager_token),
+            ('GET /cards/ (owner)', '/cards/', owner_token),
+            ('GET /cards/<pk>/', f'/cards/{self.card.pk}/', owner_token),
+            ('GET /accounts/api/user-info/', '/accounts/api/user-info/', owner_token),
+            ('GET /accounts/api/users/', '/accounts/api/users/', manager_token),
+        ]
+
+    def run_wsgi(self, path, token, total, concurrency):
+        application = WSGIHandler()
+
+        def call():
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '', 'SCRIPT_NAME': '',
+                'SERVER_NAME': HOST, 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+                'HTTP_HOST': HOST, 'HTTP_AUTHORIZATION': f'Bearer {token}',
+                'wsgi.input': io.BytesIO(), 'wsgi.errors': io.StringIO(), 'wsgi.url_scheme': 'http',
+                'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+            }
+            statuses = []
+            started = time.perf_counter()
+            response = application(environ, lambda status, headers: statuses.append(status))
+            b''.join(response)
+            response.close()
+            elapsed = time.perf_counter() - started
+            if not statuses[0].startswith('200'):
+                raise RuntimeError(f'GET {path} returned {statuses[0]}')
+            return elapsed
+
+        def worker(count):
+            try:
+                return [call() for _ in range(count)]
+            finally:
+                connection.close()
+
+        shares = [total // concurrency + (1 if index < total % concurrency else 0) for index in range(concurrency)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            timings = [timing for result in pool.map(worker, shares) for timing in result]
+        return timings, time.perf_counter() - started
+
+    async def run_asgi(self, path, token, total, concurrency):
+        application = ASGIHandler()
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+            'headers': [(b'host', HOST.encode()), (b'authorization', f'Bearer {token}'.encode())],
+            'server': (HOST, 80), 'client': ('127.0.0.1', 50000),
+        }
+
+        async def call():
+            body_sent = False
+            disconnected = asyncio.Event()
+            statuses = []
+
+            async def receive():
+                nonlocal body_sent
+                if not body_sent:
+                    body_sent = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                # The handler listens for a disconnect while the view runs
+                await disconnected.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    statuses.append(message['status'])
+
+            started = time.perf_counter()
+            await application(dict(scope), receive, send)
+            elapsed = time.perf_counter() - started
+            disconnected.set()
+            if statuses[0] != 200:
+                raise RuntimeError(f'GET {path} returned {statuses[0]}')
+            return elapsed
+
+        queue = asyncio.Queue()
+        for _ in range(total):
+            queue.put_nowait(None)
+        timings = []
+
+        async def worker():
+            while not queue.empty():
+                queue.get_nowait()
+                timings.append(await call())
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return timings, time.perf_counter() - started
+
+    def report(self, name, timings, elapsed):
+        self.stdout.write(
+            f'  {name:<32} {len(timings) / elapsed:>8.1f} req/s   '
+            f'p50 {statistics.median(timings) * 1000:>7.2f} ms   p99 {percentile(timings, 0.99) * 1000:>7.2f} ms'
+        )
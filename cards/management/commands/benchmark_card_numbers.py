@@ -0,0 +1,70 @@
+import multiprocessing
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+def _allocate_numbers(card_type, count, block_size):
+    """ Worker entry point; imports lazily so it also works with the spawn start method """
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+    from django.conf import settings
+    from django.db import connections
+    from cards.services import CardNumberAllocator
+
+    if block_size:
+        settings.CARD_NUMBER_BLOCK_SIZE = block_size
+    try:
+        started = time.perf_counter()
+        numbers = [CardNumberAllocator.allocate(card_type) for _ in range(count)]
+        return numbers, time.perf_counter() - started
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark card number allocation under multi-process contention and verify that every '
+        'number is unique and Luhn-valid. Reserves real sequence ranges, so run it against a scratch database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4, help='Concurrent worker processes')
+        parser.add_argument('--count', type=int, default=20000, help='Numbers allocated by each process')
+        parser.add_argument('--card-type', choices=['VISA', 'MASTERCARD', 'AMEX'], default='VISA')
+        parser.add_argument('--block-size', type=int, help='Override CARD_NUMBER_BLOCK_SIZE')
+
+    def handle(self, *args, **options):
+        from django.db import connections
+        from cards.services import CardNumberGenerator
+
+        processes = options['processes']
+        if processes < 1 or options['count'] < 1:
+            raise CommandError('--processes and --count must be positive')
+
+        # Forked workers must not share the parent's database connection
+        connections.close_all()
+        start_method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+        context = multiprocessing.get_context(start_method)
+        job = (options['card_type'], options['count'], options['block_size'])
+
+        started = time.perf_counter()
+        with context.Pool(processes) as pool:
+            results = pool.starmap(_allocate_numbers, [job] * processes)
+        wall_time = time.perf_counter() - started
+
+        numbers = [number for worker_numbers, _ in results for number in worker_numbers]
+        duplicates = len(numbers) - len(set(numbers))
+        invalid = sum(not CardNumberGenerator.is_valid_card_number(number) for number in numbers)
+
+        for index, (worker_numbers, elapsed) in enumerate(results):
+            self.stdout.write(f'worker {index}: {len(worker_numbers)} numbers in {elapsed:.3f}s '
+                              f'({len(worker_numbers) / elapsed:,.0f}/s)')
+        self.stdout.write(f'total: {len(numbers)} numbers from {processes} processes in {wall_time:.3f}s '
+                          f'({len(numbers) / wall_time:,.0f}/s)')
+
+        if duplicates or invalid:
+            raise CommandError(f'{duplicates} duplicate and {invalid} Luhn-invalid numbers allocated')
+        self.stdout.write(self.style.SUCCESS('All numbers are unique and Luhn-valid'))
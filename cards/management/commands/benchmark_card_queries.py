@@ -0,0 +1,129 @@
+import random
+import re
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from cards.models import CreditCard
+from cards.services import CardSearchService
+from users.models import CustomUser
+
+# Plan fragments that mean the card table is scanned or sorted without an index.
+# An index-ordered walk ("SCAN ... USING INDEX" on SQLite) is fine because of the LIMIT.
+PLAN_WARNINGS = {
+    'sqlite': (r'SCAN cards_creditcard(?! USING)', r'USE TEMP B-TREE'),
+    'postgresql': (r'Seq Scan on cards_creditcard', r'\bSort\b'),
+}
+
+
+@contextmanager
+def explicit_created_at():
+    """ Let seeded rows carry spread-out creation dates instead of auto_now_add """
+    field = CreditCard._meta.get_field('created_at')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway test database with cards, then print EXPLAIN output and timings for '
+        'every query behind the card endpoints. Use --fail-on-scan in CI to catch index regressions.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cards', type=int, default=100000, help='Number of cards to seed')
+        parser.add_argument('--users', type=int, default=1000, help='Number of card owners to seed')
+        parser.add_argument('--repeat', type=int, default=50, help='Timed executions per query')
+        parser.add_argument('--fail-on-scan', action='store_true',
+                            help='Exit with an error if any plan scans or sorts the card table')
+
+    def handle(self, *args, **options):
+        # Never touch real data: everything runs in a freshly created test database
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.seed(options['cards'], options['users'])
+            regressions = self.run_queries(options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        if regressions and options['fail_on_scan']:
+            raise CommandError(f"Queries without a usable index: {', '.join(regressions)}")
+
+    def seed(self, card_count, user_count):
+        started = time.perf_counter()
+        rng = random.Random(0)
+        users = CustomUser.objects.bulk_create(
+            CustomUser(email=f'owner{i}@example.com', role='USER') for i in range(user_count)
+        )
+        self.manager = CustomUser.objects.create(email='manager@example.com', role='MANAGER')
+        self.owner = users[0]
+
+        now = timezone.now()
+        card_types = [card_type for card_type, _ in CreditCard.CARD_TYPES]
+        statuses = ['PENDING'] * 2 + ['APPROVED'] * 7 + ['REJECTED']
+        with explicit_created_at():
+            for start in range(0, card_count, 5000):
+                CreditCard.objects.bulk_create(
+                    CreditCard(
+                        user=rng.choice(users),
+                        card_number=f'9{index:015d}',
+                        last4=f'{index:04d}'[-4:],
+                        bin_prefix=f'9{index:015d}'[:6],
+                        card_type=rng.choice(card_types),
+                        credit_limit=rng.randrange(500, 50000),
+                        status=rng.choice(statuses),
+                        created_at=now - timedelta(minutes=card_count - index),
+                    )
+                    for index in range(start, min(start + 5000, card_count))
+                )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.stdout.write(f'Seeded {card_count} cards for {user_count} users in {time.perf_counter() - started:.1f}s\n')
+
+    def endpoint_queries(self):
+        latest = CreditCard.objects.order_by('-created_at', '-id').values_list('created_at', flat=True)[100]
+        card = CreditCard.objects.filter(user=self.owner).first()
+        page = slice(0, 100)
+        return [
+            ('GET /cards/ (admin)', CreditCard.objects.all()[page]),
+            ('GET /cards/ (admin, next page)', CreditCard.objects.filter(created_at__lt=latest)[page]),
+            ('GET /cards/ (owner)', CreditCard.objects.filter(user=self.owner)[page]),
+            ('GET /cards/?status=PENDING (manager queue)', CreditCard.objects.filter(status='PENDING')[page]),
+            ('GET /cards/?card_type=AMEX', CreditCard.objects.filter(card_type='AMEX')[page]),
+            ('GET /cards/<pk>/ (admin)', CreditCard.objects.filter(pk=card.pk)),
+            ('GET /cards/<pk>/ (owner)', CreditCard.objects.filter(pk=card.pk, user=self.owner)),
+            ('GET /cards/search/?last4=', CardSearchService.search(CreditCard.objects.all(), last4=card.last4)[page]),
+            ('GET /cards/search/?bin=', CardSearchService.search(CreditCard.objects.all(), bin_prefix=card.bin_prefix)[page]),
+            ('GET /cards/search/?email=', CardSearchService.search(CreditCard.objects.all(), email=self.owner.email)[page]),
+        ]
+
+    def run_queries(self, repeat):
+        warnings = PLAN_WARNINGS.get(connection.vendor, ())
+        regressions = []
+        for label, queryset in self.endpoint_queries():
+            plan = queryset.explain()
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - started) * 1000)
+
+            flagged = [warning for warning in warnings if re.search(warning, plan)]
+            if flagged:
+                regressions.append(label)
+            style = self.style.ERROR if flagged else self.style.SUCCESS
+            self.stdout.write(style(label))
+            self.stdout.write(f'  median {statistics.median(timings):.3f} ms, max {max(timings):.3f} ms over {repeat} runs')
+            for line in plan.splitlines():
+                self.stdout.write(f'  | {line}')
+            if flagged:
+                self.stdout.write(self.style.WARNING(f"  plan contains: {', '.join(flagged)}"))
+        return regressions
@@ -0,0 +1,71 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from cards.risk import CARD_TYPES, score_application, score_applications
+
+
+def synthetic_features(count, seed=0):
+    """ Random applications with roughly realistic feature ranges """
+    rng = np.random.default_rng(seed)
+    return {
+        'credit_limit': np.round(rng.uniform(100, 20000, count), 2),
+        'card_type': rng.integers(0, len(CARD_TYPES), count),
+        'account_age_days': rng.uniform(0, 3650, count),
+        'approved_cards': rng.integers(0, 5, count),
+        'rejected_cards': rng.integers(0, 3, count),
+        'pending_cards': rng.integers(0, 3, count),
+        'approved_limit': np.round(rng.uniform(0, 30000, count), 2),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the vectorized risk scoring against the per-row reference implementation on '
+        'synthetic applications, checking that both agree. Needs no database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=1_000_000, help='Applications scored by the vectorized path')
+        parser.add_argument('--reference-count', type=int, default=100_000,
+                            help='Applications scored row by row, and compared with the vectorized results')
+        parser.add_argument('--repeat', type=int, default=5, help='Vectorized runs; the fastest is reported')
+
+    def handle(self, *args, **options):
+        count, reference_count = options['count'], min(options['reference_count'], options['count'])
+        if count < 1 or reference_count < 1 or options['repeat'] < 1:
+            raise CommandError('--count, --reference-count and --repeat must be positive')
+
+        features = synthetic_features(count)
+        timings = []
+        for _ in range(options['repeat']):
+            started = time.perf_counter()
+            scores, suggested = score_applications(features)
+            timings.append(time.perf_counter() - started)
+        vectorized = min(timings)
+
+        rows = [
+            (features['credit_limit'][i], CARD_TYPES[features['card_type'][i]], features['account_age_days'][i],
+             features['approved_cards'][i], features['rejected_cards'][i], features['pending_cards'][i],
+             features['approved_limit'][i])
+            for i in range(reference_count)
+        ]
+        started = time.perf_counter()
+        reference = [score_application(*row) for row in rows]
+        per_row = time.perf_counter() - started
+
+        score_error = max(abs(score - expected[0]) for score, expected in zip(scores[:reference_count].tolist(), reference))
+        limit_mismatches = sum(
+            limit != expected[1] for limit, expected in zip(suggested[:reference_count].tolist(), reference)
+        )
+
+        self.stdout.write(f'vectorized: {count} applications in {vectorized:.4f}s ({count / vectorized:,.0f} scores/s)')
+        self.stdout.write(f'per row:    {reference_count} applications in {per_row:.4f}s '
+                          f'({reference_count / per_row:,.0f} scores/s)')
+        self.stdout.write(f'speedup:    {(count / vectorized) / (reference_count / per_row):.1f}x')
+
+        if score_error > 1e-9 or limit_mismatches:
+            raise CommandError(f'Implementations disagree: max score error {score_error:.2e}, '
+                               f'{limit_mismatches} different suggested limits')
+        self.stdout.write(self.style.SUCCESS('Vectorized and per-row results agree'))
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from cards.exports import CardExporter
+from cards.models import CardExportJob
+
+
+class Command(BaseCommand):
+    help = 'Export every credit card to a gzip-compressed NDJSON/CSV file, or resume an interrupted export'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=['NDJSON', 'CSV'], default='NDJSON', help='Output format of a new export')
+        parser.add_argument('--resume', type=int, metavar='JOB_ID', help='Resume an interrupted export from its checkpoint')
+        parser.add_argument('--resume-stale', action='store_true',
+                            help='Resume every failed export and every RUNNING export whose worker stopped renewing it')
+        parser.add_argument('--chunk-size', type=int, help='Rows fetched and compressed per chunk')
+
+    def handle(self, *args, **options):
+        if options['resume_stale']:
+            for job in CardExporter.resumable().exclude(status='PENDING').order_by('pk'):
+                self.export(job, options)
+            return
+
+        if options['resume']:
+            try:
+                job = CardExportJob.objects.get(pk=options['resume'])
+            except CardExportJob.DoesNotExist:
+                raise CommandError(f"Export job {options['resume']} does not exist")
+            if job.status == 'COMPLETED':
+                raise CommandError(f'Export job {job.pk} is already completed')
+        else:
+            job = CardExportJob.objects.create(export_format=options['format'])
+
+        # A RUNNING job handed to --resume belongs to a worker that died, so take it over
+        self.export(job, options, force=bool(options['resume']))
+
+    def export(self, job, options, force=False):
+        exporter = CardExporter(job, chunk_size=options['chunk_size'])
+        try:
+            job = exporter.run(force=force)
+        except Exception as e:
+            raise CommandError(f'Export job {job.pk} failed after {job.exported_rows} rows: {e}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Export job {job.pk} {job.status.lower()}: {job.exported_rows} rows written to {job.file_path}'
+        ))
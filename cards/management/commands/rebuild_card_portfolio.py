@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from cards.portfolio import as_money, compute_portfolio, read_portfolio, rebuild_portfolio
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the card portfolio counters from the card table, or verify them with --verify'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true',
+                            help='Only compare the counters with a GROUP BY over the cards; exit non-zero on drift')
+
+    def handle(self, *args, **options):
+        if not options['verify']:
+            portfolio = rebuild_portfolio()
+            self.stdout.write(self.style.SUCCESS(
+                f'Rebuilt {len(portfolio)} portfolio counters covering {sum(count for count, _ in portfolio.values())} cards'
+            ))
+            return
+
+        expected = {cell: (count, as_money(total)) for cell, (count, total) in compute_portfolio().items()}
+        actual = {cell: (count, as_money(total)) for cell, (count, total) in read_portfolio().items()}
+        drift = sorted(cell for cell in expected.keys() | actual.keys() if expected.get(cell) != actual.get(cell))
+
+        for status, card_type in drift:
+            self.stdout.write(self.style.ERROR(
+                f'{status}/{card_type}: counters say {actual.get((status, card_type), (0, 0))}, '
+                f'cards say {expected.get((status, card_type), (0, 0))}'
+            ))
+        if drift:
+            raise CommandError(f'{len(drift)} portfolio counters have drifted; run rebuild_card_portfolio to fix them')
+        self.stdout.write(self.style.SUCCESS(f'All {len(expected)} portfolio counters match the card table'))
@@ -0,0 +1,62 @@
+import csv
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cards.models import CreditCard
+from cards.risk import FEATURE_FIELDS, score_rows
+
+
+class Command(BaseCommand):
+    help = 'Score card applications in chunks and print the risk band distribution, optionally writing every score to CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--status', choices=[status for status, _ in CreditCard.STATUS_CHOICES], default='PENDING')
+        parser.add_argument('--card-type', choices=[card_type for card_type, _ in CreditCard.CARD_TYPES])
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Cards read and scored per chunk')
+        parser.add_argument('--output', metavar='PATH', help='Write id, score, band and suggested limit per card to a CSV file')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+
+        queryset = CreditCard.objects.filter(status=options['status'])
+        if options['card_type']:
+            queryset = queryset.filter(card_type=options['card_type'])
+
+        output = open(options['output'], 'w', newline='') if options['output'] else None
+        writer = None
+        bands = Counter()
+        score_total = 0.0
+        started = time.perf_counter()
+        try:
+            last_pk = 0
+            while True:
+                rows = list(queryset.filter(pk__gt=last_pk).order_by('pk').values(*FEATURE_FIELDS)[:options['chunk_size']])
+                if not rows:
+                    break
+                last_pk = rows[-1]['id']
+                results = score_rows(rows)
+                bands.update(result['risk_band'] for result in results)
+                score_total += sum(result['risk_score'] for result in results)
+                if output:
+                    if writer is None:
+                        writer = csv.DictWriter(output, fieldnames=list(results[0]))
+                        writer.writeheader()
+                    writer.writerows(results)
+        finally:
+            if output:
+                output.close()
+        elapsed = time.perf_counter() - started
+
+        scored = sum(bands.values())
+        if not scored:
+            self.stdout.write(f"No {options['status'].lower()} cards to score")
+            return
+        for band in ('LOW', 'MEDIUM', 'HIGH'):
+            self.stdout.write(f'{band:<6} {bands[band]:>10} ({bands[band] / scored:.1%})')
+        self.stdout.write(self.style.SUCCESS(
+            f'Scored {scored} cards in {elapsed:.2f}s ({scored / elapsed:,.0f}/s), mean risk {score_total / scored:.3f}'
+            + (f", written to {options['output']}" if output else '')
+        ))
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.6 on 2026-10-17 19:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0002_alter_creditcard_card_type'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='creditcard',
+            options={'ordering': ['-created_at', '-id']},
+        ),
+        migrations.AddIndex(
+            model_name='creditcard',
+            index=models.Index(fields=['status', '-created_at', '-id'], name='card_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='creditcard',
+            index=models.Index(fields=['card_type', '-created_at', '-id'], name='card_type_created_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.6 on 2026-10-17 19:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0004_cardexportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CardNumberSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bin_prefix', models.CharField(max_length=6, unique=True)),
+                ('next_value', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
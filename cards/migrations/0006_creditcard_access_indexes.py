@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-17 20:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0005_cardnumbersequence'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='creditcard',
+            index=models.Index(fields=['-created_at', '-id'], name='card_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='creditcard',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='card_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.1.6 on 2026-10-17 20:07
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def populate_counters(apps, schema_editor):
+    CreditCard = apps.get_model('cards', 'CreditCard')
+    CardPortfolioCounter = apps.get_model('cards', 'CardPortfolioCounter')
+    rows = (
+        CreditCard.objects.order_by()
+        .values('status', 'card_type')
+        .annotate(card_count=Count('id'), total_credit_limit=Sum('credit_limit'))
+    )
+    CardPortfolioCounter.objects.bulk_create(
+        CardPortfolioCounter(
+            status=row['status'],
+            card_type=row['card_type'],
+            card_count=row['card_count'],
+            total_credit_limit=row['total_credit_limit'] or 0,
+        )
+        for row in rows
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0006_creditcard_access_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CardPortfolioCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('APPROVED', 'Approved'), ('REJECTED', 'Rejected')], max_length=10)),
+                ('card_type', models.CharField(choices=[('VISA', 'Visa'), ('MASTERCARD', 'Mastercard'), ('AMEX', 'American Express')], max_length=50)),
+                ('card_count', models.BigIntegerField(default=0)),
+                ('total_credit_limit', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['status', 'card_type'],
+                'constraints': [models.UniqueConstraint(fields=('status', 'card_type'), name='portfolio_counter_cell_unique')],
+            },
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
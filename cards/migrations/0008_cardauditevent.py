@@ -0,0 +1,34 @@
+# Generated by Django 5.1.6 on 2026-10-17 20:13
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0007_cardportfoliocounter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CardAuditEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(choices=[('status', 'Status'), ('credit_limit', 'Credit limit')], max_length=20)),
+                ('old_value', models.CharField(blank=True, max_length=20, null=True)),
+                ('new_value', models.CharField(blank=True, max_length=20, null=True)),
+                ('rejection_reason', models.TextField(blank=True, null=True)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('card', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='audit_events', to='cards.creditcard')),
+                ('changed_by', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='card_audit_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-changed_at', '-id'],
+                'indexes': [models.Index(fields=['card', '-changed_at', '-id'], name='card_audit_card_idx')],
+            },
+        ),
+    ]
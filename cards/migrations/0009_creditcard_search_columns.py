@@ -0,0 +1,41 @@
+# Generated by Django 5.1.6 on 2026-10-17 20:20
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Left, Right
+
+
+def fill_number_parts(apps, schema_editor):
+    # One set-based UPDATE, run before the indexes exist so it does not maintain them row by row
+    CreditCard = apps.get_model('cards', 'CreditCard')
+    CreditCard.objects.update(last4=Right('card_number', 4), bin_prefix=Left('card_number', 6))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0008_cardauditevent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='creditcard',
+            name='bin_prefix',
+            field=models.CharField(default='', editable=False, max_length=6),
+        ),
+        migrations.AddField(
+            model_name='creditcard',
+            name='last4',
+            field=models.CharField(default='', editable=False, max_length=4),
+        ),
+        migrations.RunPython(fill_number_parts, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='creditcard',
+            index=models.Index(fields=['last4', '-created_at', '-id'], name='card_last4_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='creditcard',
+            index=models.Index(fields=['bin_prefix', '-created_at', '-id'], name='card_bin_created_idx'),
+        ),
+    ]
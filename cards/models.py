@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from rest_framework.exceptions import ValidationError
 
 
@@ -18,6 +19,9 @@ class CreditCard(models.Model):
 
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     card_number = models.CharField(max_length=16, unique=True)
+    # Copies of the card number's ends, kept in sync on save so searches can use an index
+    last4 = models.CharField(max_length=4, editable=False, default='')
+    bin_prefix = models.CharField(max_length=6, editable=False, default='')
     card_type = models.CharField(max_length=50, choices=CARD_TYPES)
     credit_limit = models.DecimalField(max_digits=10, decimal_places=2)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
@@ -32,7 +36,17 @@ class CreditCard(models.Model):
     rejection_reason = models.TextField(null=True, blank=True)
 
     class Meta:
-        ordering = ['-created_at']
+        ordering = ['-created_at', '-id']
+        # Each index matches a hot query: newest-first listing, optionally narrowed to an owner,
+        # a status (manager queue / admin filter) or a card type
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='card_created_idx'),
+            models.Index(fields=['user', '-created_at', '-id'], name='card_user_created_idx'),
+            models.Index(fields=['status', '-created_at', '-id'], name='card_status_created_idx'),
+            models.Index(fields=['card_type', '-created_at', '-id'], name='card_type_created_idx'),
+            models.Index(fields=['last4', '-created_at', '-id'], name='card_last4_created_idx'),
+            models.Index(fields=['bin_prefix', '-created_at', '-id'], name='card_bin_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.email} - {self.card_number}"
@@ -49,6 +63,11 @@ class CreditCard(models.Model):
             if not self.card_number.isdigit():
                 raise ValidationError('Card number must contain only digits')
 
+    def sync_number_parts(self):
+        """ Refresh last4/bin_prefix from card_number; bulk_create callers must call this themselves """
+        self.last4 = self.card_number[-4:]
+        self.bin_prefix = self.card_number[:6]
+
     def save(self, *args, **kwargs):
         if not self.pk:  # If this is a new card (not an update)
             from .services import CardNumberGenerator
@@ -57,5 +76,127 @@ class CreditCard(models.Model):
                 self.card_number = CardNumberGenerator.generate_unique_number(self.card_type)
 
         self.clean()  # Run validation
+        self.sync_number_parts()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'card_number' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'last4', 'bin_prefix'}
+        super().save(*args, **kwargs)
+
+
+class CardNumberSequence(models.Model):
+    """ High-water mark of the account-number sequence reserved so far for one BIN """
+    bin_prefix = models.CharField(max_length=6, unique=True)
+    next_value = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.bin_prefix} @ {self.next_value}"
+
+
+class CardPortfolioCounter(models.Model):
+    """ Running card count and credit limit total for one (status, card_type) cell """
+    status = models.CharField(max_length=10, choices=CreditCard.STATUS_CHOICES)
+    card_type = models.CharField(max_length=50, choices=CreditCard.CARD_TYPES)
+    card_count = models.BigIntegerField(default=0)
+    total_credit_limit = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['status', 'card_type']
+        constraints = [
+            models.UniqueConstraint(fields=['status', 'card_type'], name='portfolio_counter_cell_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.status}/{self.card_type}: {self.card_count} cards, {self.total_credit_limit}"
+
+
+class CardAuditEvent(models.Model):
+    """
+    One status or credit limit change of a card. Rows are only ever inserted: neither
+    card nor user deletion touches them, so the history outlives both.
+    """
+    FIELD_CHOICES = (
+        ('status', 'Status'),
+        ('credit_limit', 'Credit limit')
+    )
+
+    card = models.ForeignKey(CreditCard, on_delete=models.DO_NOTHING, db_constraint=False,
+                             related_name='audit_events')
+    field = models.CharField(max_length=20, choices=FIELD_CHOICES)
+    old_value = models.CharField(max_length=20, null=True, blank=True)
+    new_value = models.CharField(max_length=20, null=True, blank=True)
+    rejection_reason = models.TextField(null=True, blank=True)
+    changed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        related_name='card_audit_events'
+    )
+    # When the change was made; the row itself is written later by the batched writer
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-changed_at', '-id']
+        indexes = [
+            models.Index(fields=['card', '-changed_at', '-id'], name='card_audit_card_idx'),
+        ]
+
+    def __str__(self):
+        return f"Card #{self.card_id} {self.field}: {self.old_value} -> {self.new_value}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Card audit events are append-only')
         super().save(*args, **kwargs)
 
+    def delete(self, *args, **kwargs):
+        raise ValueError('Card audit events are append-only')
+
+
+class CardExportJob(models.Model):
+    FORMAT_CHOICES = (
+        ('NDJSON', 'Newline-delimited JSON'),
+        ('CSV', 'CSV')
+    )
+
+    STATUS_CHOICES = (
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('COMPLETED', 'Completed'),
+        ('FAILED', 'Failed')
+    )
+
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='card_exports'
+    )
+    export_format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default='NDJSON')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    file_path = models.CharField(max_length=255, blank=True)
+    # Checkpoint: everything up to last_exported_id is durably written up to file_offset bytes
+    last_exported_id = models.BigIntegerField(default=0)
+    file_offset = models.BigIntegerField(default=0)
+    exported_rows = models.PositiveBigIntegerField(default=0)
+    total_rows = models.PositiveBigIntegerField(default=0)
+    error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Export #{self.pk} ({self.export_format}, {self.status})"
+
+    @property
+    def progress(self):
+        if self.status == 'COMPLETED':
+            return 100.0
+        if not self.total_rows:
+            return 0.0
+        return round(min(self.exported_rows / self.total_rows, 1) * 100, 2)
@@ -0,0 +1,74 @@
+from rest_framework.pagination import CursorPagination
+
+
+class CreditCardCursorPagination(CursorPagination):
+    """
+    Keyset pagination over (created_at, id), matching the model's -created_at ordering.
+    Every page is a single indexed range query and no COUNT(*) is issued.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class CardAuditCursorPagination(CursorPagination):
+    """ Keyset pagination over a card's audit events, newest first """
+    ordering = ('-changed_at', '-id')
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class CardRiskScoreCursorPagination(CreditCardCursorPagination):
+    """ Larger pages: scoring is vectorized, so a page of thousands costs about as much as a page of ten """
+    page_size = 1000
+    max_page_size = 5000
+
+
+class _PageQuery:
+    """
+    Queryset stand-in handed to a DRF paginator. The paginators only read rows by slicing
+    (plus count() for page numbers), so slicing records the final query and returns the
+    rows fetched for it, if any.
+    """
+
+    def __init__(self, queryset, state):
+        self.queryset = queryset
+        self.state = state
+
+    @property
+    def model(self):
+        return self.queryset.model
+
+    @property
+    def ordered(self):
+        return self.queryset.ordered
+
+    def order_by(self, *fields):
+        return _PageQuery(self.queryset.order_by(*fields), self.state)
+
+    def filter(self, *args, **kwargs):
+        return _PageQuery(self.queryset.filter(*args, **kwargs), self.state)
+
+    def count(self):
+        return self.state['count']
+
+    def __getitem__(self, item):
+        self.state['query'] = self.queryset[item]
+        return self.state.get('rows', [])
+
+
+async def apaginate_queryset(paginator, queryset, request, view=None):
+    """
+    Async paginate_queryset for any DRF paginator. A dry run records the page query,
+    which is fetched with the async ORM, then the paginator runs again on those rows
+    so every link and cursor is computed by DRF itself.
+    """
+    state = {}
+    if not isinstance(paginator, CursorPagination):
+        state['count'] = await queryset.acount()
+    paginator.paginate_queryset(_PageQuery(queryset, state), request, view=view)
+    if 'query' in state:
+        state['rows'] = [row async for row in state['query']]
+    return paginator.paginate_queryset(_PageQuery(queryset, state), request, view=view)
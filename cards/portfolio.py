@@ -0,0 +1,132 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from .models import CreditCard, CardPortfolioCounter
+
+CENT = Decimal('0.01')
+
+
+def as_money(value):
+    """ Same rounding the credit_limit column applies, so counters match the stored values """
+    return Decimal(str(value)).quantize(CENT)
+
+
+class PortfolioDeltas:
+    """
+    Collects count / credit limit changes per (status, card_type) cell and applies them
+    with one UPDATE per touched cell. Call apply() inside the transaction that changes
+    the cards so the counters can never drift from the table.
+    """
+
+    def __init__(self):
+        self.cells = defaultdict(lambda: [0, Decimal('0')])
+
+    def add(self, status, card_type, credit_limit, count=1):
+        cell = self.cells[(status, card_type)]
+        cell[0] += count
+        cell[1] += as_money(credit_limit) * count
+        return self
+
+    def remove(self, status, card_type, credit_limit, count=1):
+        return self.add(status, card_type, credit_limit, -count)
+
+    def move(self, card_type, credit_limit, old_status, new_status):
+        if old_status != new_status:
+            self.remove(old_status, card_type, credit_limit)
+            self.add(new_status, card_type, credit_limit)
+        return self
+
+    def change_limit(self, status, card_type, old_limit, new_limit):
+        self.cells[(status, card_type)][1] += as_money(new_limit) - as_money(old_limit)
+        return self
+
+    def apply(self):
+        now = timezone.now()
+        with transaction.atomic():
+            for (status, card_type), (count, limit) in sorted(self.cells.items()):
+                if not count and not limit:
+                    continue
+                cell = CardPortfolioCounter.objects.filter(status=status, card_type=card_type)
+                values = {
+                    'card_count': F('card_count') + count,
+                    'total_credit_limit': F('total_credit_limit') + limit,
+                    'updated_at': now,
+                }
+                if cell.update(**values):
+                    continue
+                try:
+                    with transaction.atomic():
+                        CardPortfolioCounter.objects.create(
+                            status=status, card_type=card_type, card_count=count, total_credit_limit=limit
+                        )
+                except IntegrityError:
+                    # Another transaction created the cell first
+                    cell.update(**values)
+        self.cells.clear()
+
+
+def compute_portfolio():
+    """ Ground truth straight from the card table: {(status, card_type): (count, total)} """
+    rows = (
+        CreditCard.objects.order_by()
+        .values('status', 'card_type')
+        .annotate(card_count=Count('id'), total_credit_limit=Sum('credit_limit'))
+    )
+    return {
+        (row['status'], row['card_type']): (row['card_count'], row['total_credit_limit'] or Decimal('0'))
+        for row in rows
+    }
+
+
+def read_portfolio():
+    """ Counter rows as {(status, card_type): (count, total)}, skipping empty cells """
+    return {
+        (counter.status, counter.card_type): (counter.card_count, counter.total_credit_limit)
+        for counter in CardPortfolioCounter.objects.all()
+        if counter.card_count or counter.total_credit_limit
+    }
+
+
+@transaction.atomic
+def rebuild_portfolio():
+    """ Replace every counter with a fresh GROUP BY over the card table """
+    portfolio = compute_portfolio()
+    CardPortfolioCounter.objects.all().delete()
+    CardPortfolioCounter.objects.bulk_create(
+        CardPortfolioCounter(status=status, card_type=card_type, card_count=count, total_credit_limit=total)
+        for (status, card_type), (count, total) in portfolio.items()
+    )
+    return portfolio
+
+
+def summarize_portfolio():
+    """ Stats payload built from the counter rows only, so it costs the same for any table size """
+    def bucket():
+        return {'card_count': 0, 'total_credit_limit': Decimal('0')}
+
+    by_status = {status: bucket() for status, _ in CreditCard.STATUS_CHOICES}
+    by_card_type = {card_type: bucket() for card_type, _ in CreditCard.CARD_TYPES}
+    total = bucket()
+    cells = []
+
+    for counter in CardPortfolioCounter.objects.all():
+        for totals in (by_status.setdefault(counter.status, bucket()),
+                       by_card_type.setdefault(counter.card_type, bucket()),
+                       total):
+            totals['card_count'] += counter.card_count
+            totals['total_credit_limit'] += counter.total_credit_limit
+        cells.append({
+            'status': counter.status,
+            'card_type': counter.card_type,
+            'card_count': counter.card_count,
+            'total_credit_limit': counter.total_credit_limit,
+        })
+
+    # Money is rendered as a string, like credit_limit in the card serializers
+    for totals in [total, *by_status.values(), *by_card_type.values(), *cells]:
+        totals['total_credit_limit'] = str(as_money(totals['total_credit_limit']))
+    return {'total': total, 'by_status': by_status, 'by_card_type': by_card_type, 'cells': cells}
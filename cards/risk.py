@@ -0,0 +1,156 @@
+"""
+Vectorized risk scoring and credit limit suggestions for card applications.
+
+Scores come from a logistic model over features already stored for every card: the
+requested credit_limit relative to its card type, the applicant's account age, and the
+applicant's other cards by status. score_applications() scores whole arrays at once;
+score_application() is the scalar reference implementation it must agree with.
+"""
+import math
+
+import numpy as np
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .models import CreditCard
+
+CARD_TYPES = [card_type for card_type, _ in CreditCard.CARD_TYPES]
+
+# Typical limit per card type; requests are judged relative to it and suggestions scale with it
+REFERENCE_LIMITS = {'VISA': 5000.0, 'MASTERCARD': 5000.0, 'AMEX': 10000.0}
+REFERENCE_LIMIT_ARRAY = np.array([REFERENCE_LIMITS[card_type] for card_type in CARD_TYPES])
+
+# Logistic model: risk = 1 / (1 + exp(-z))
+INTERCEPT = -0.5
+WEIGHTS = {
+    'limit_ratio': 1.2,      # per unit of log(requested / reference)
+    'account_years': -0.8,   # per unit of log(1 + account age in years)
+    'approved_cards': -0.2,  # per approved card, up to MAX_HISTORY_CARDS
+    'rejected_cards': 0.9,   # per earlier rejection
+    'pending_cards': 0.4,    # per other application still pending
+    'exposure': 0.5,         # per unit of log(1 + approved limits / reference)
+}
+MAX_HISTORY_CARDS = 3
+
+# Suggested limit: up to twice the reference limit, shrinking with risk, in steps of LIMIT_STEP
+LIMIT_STEP = 100.0
+MIN_SUGGESTED_LIMIT = 100.0
+
+BANDS = np.array(['LOW', 'MEDIUM', 'HIGH'])
+BAND_EDGES = [0.33, 0.66]
+
+# Card rows needed by load_features()
+FEATURE_FIELDS = ('id', 'user_id', 'user__email', 'card_type', 'credit_limit', 'status', 'user__date_joined')
+
+
+def score_applications(features):
+    """
+    Risk scores in [0, 1] and suggested limits for arrays of applications.
+
+    features maps credit_limit, card_type (index into CARD_TYPES), account_age_days,
+    approved_cards, rejected_cards, pending_cards and approved_limit to equal-length arrays,
+    as returned by load_features(). Returns (scores, suggested_limits) as float64 arrays.
+    """
+    credit_limit = np.asarray(features['credit_limit'], dtype=np.float64)
+    reference = REFERENCE_LIMIT_ARRAY[np.asarray(features['card_type'], dtype=np.intp)]
+    account_years = np.maximum(np.asarray(features['account_age_days'], dtype=np.float64), 0) / 365.25
+
+    z = (
+        INTERCEPT
+        + WEIGHTS['limit_ratio'] * np.log(np.maximum(credit_limit, 1) / reference)
+        + WEIGHTS['account_years'] * np.log1p(account_years)
+        + WEIGHTS['approved_cards'] * np.minimum(features['approved_cards'], MAX_HISTORY_CARDS)
+        + WEIGHTS['rejected_cards'] * np.asarray(features['rejected_cards'], dtype=np.float64)
+        + WEIGHTS['pending_cards'] * np.asarray(features['pending_cards'], dtype=np.float64)
+        + WEIGHTS['exposure'] * np.log1p(np.asarray(features['approved_limit'], dtype=np.float64) / reference)
+    )
+    scores = 1 / (1 + np.exp(-z))
+
+    capacity = np.floor(2 * reference * (1 - scores) / LIMIT_STEP) * LIMIT_STEP
+    suggested = np.minimum(credit_limit, np.maximum(capacity, MIN_SUGGESTED_LIMIT))
+    return scores, suggested
+
+
+def score_application(credit_limit, card_type, account_age_days, approved_cards, rejected_cards, pending_cards,
+                      approved_limit):
+    """ Scalar reference for score_applications(); card_type is the type name """
+    reference = REFERENCE_LIMITS[card_type]
+    z = (
+        INTERCEPT
+        + WEIGHTS['limit_ratio'] * math.log(max(float(credit_limit), 1) / reference)
+        + WEIGHTS['account_years'] * math.log1p(max(account_age_days, 0) / 365.25)
+        + WEIGHTS['approved_cards'] * min(approved_cards, MAX_HISTORY_CARDS)
+        + WEIGHTS['rejected_cards'] * rejected_cards
+        + WEIGHTS['pending_cards'] * pending_cards
+        + WEIGHTS['exposure'] * math.log1p(float(approved_limit) / reference)
+    )
+    score = 1 / (1 + math.exp(-z))
+    capacity = math.floor(2 * reference * (1 - score) / LIMIT_STEP) * LIMIT_STEP
+    return score, min(float(credit_limit), max(capacity, MIN_SUGGESTED_LIMIT))
+
+
+def risk_bands(scores):
+    return BANDS[np.digitize(scores, BAND_EDGES)]
+
+
+def load_features(rows, now=None):
+    """
+    Feature arrays for card rows with FEATURE_FIELDS. The applicant's card history comes
+    from one GROUP BY per 500 applicants; each card's own row is left out of its history.
+    """
+    now = now or timezone.now()
+    user_ids = np.array([row['user_id'] for row in rows], dtype=np.int64)
+    statuses = np.array([row['status'] for row in rows])
+
+    applicants = np.unique(user_ids)
+    history = np.zeros((len(applicants), 4))  # approved, rejected, pending, approved limit
+    for start in range(0, len(applicants), 500):
+        chunk = applicants[start:start + 500].tolist()
+        totals = CreditCard.objects.filter(user_id__in=chunk).values('user_id').annotate(
+            approved=Count('id', filter=Q(status='APPROVED')),
+            rejected=Count('id', filter=Q(status='REJECTED')),
+            pending=Count('id', filter=Q(status='PENDING')),
+            approved_limit=Sum('credit_limit', filter=Q(status='APPROVED')),
+        ).values_list('user_id', 'approved', 'rejected', 'pending', 'approved_limit')
+        totals = np.array([(user_id, *counts, approved_limit or 0) for user_id, *counts, approved_limit in totals],
+                          dtype=np.float64).reshape(-1, 5)
+        history[np.searchsorted(applicants, totals[:, 0].astype(np.int64))] = totals[:, 1:]
+    history = history[np.searchsorted(applicants, user_ids)]
+
+    credit_limit = np.array([row['credit_limit'] for row in rows], dtype=np.float64)
+    own_approved = statuses == 'APPROVED'
+    joined = np.array([
+        (now - row['user__date_joined']).total_seconds() if row['user__date_joined'] else 0 for row in rows
+    ], dtype=np.float64)
+
+    return {
+        'credit_limit': credit_limit,
+        'card_type': np.array([CARD_TYPES.index(row['card_type']) for row in rows], dtype=np.intp),
+        'account_age_days': joined / 86400,
+        'approved_cards': history[:, 0] - own_approved,
+        'rejected_cards': history[:, 1] - (statuses == 'REJECTED'),
+        'pending_cards': history[:, 2] - (statuses == 'PENDING'),
+        'approved_limit': history[:, 3] - np.where(own_approved, credit_limit, 0),
+    }
+
+
+def score_rows(rows, now=None):
+    """ Score card rows with FEATURE_FIELDS; returns one result dict per row, in order """
+    rows = list(rows)
+    if not rows:
+        return []
+    scores, suggested = score_applications(load_features(rows, now))
+    bands = risk_bands(scores)
+    return [
+        {
+            'id': row['id'],
+            'user_email': row['user__email'],
+            'card_type': row['card_type'],
+            'credit_limit': f"{row['credit_limit']:.2f}",
+            'status': row['status'],
+            'risk_score': round(float(score), 4),
+            'risk_band': str(band),
+            'suggested_limit': f'{suggested:.2f}',
+        }
+        for row, score, band, suggested in zip(rows, scores.tolist(), bands.tolist(), suggested.tolist())
+    ]
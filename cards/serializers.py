@@ -1,5 +1,7 @@
+from django.conf import settings
+from django.urls import reverse
 from rest_framework import serializers
-from .models import CreditCard
+from .models import CreditCard, CardAuditEvent, CardExportJob
 
 
 class CreditCardApplicationSerializer(serializers.ModelSerializer):
@@ -30,6 +32,54 @@ class CreditCardDetailSerializer(serializers.ModelSerializer):
         ]
 
 
+class CreditCardListSerializer:
+    """
+    Read-optimized equivalent of CreditCardDetailSerializer(many=True) for large lists.
+
+    Rows come from `get_queryset()`, a .values() query that fetches only the needed
+    columns and joins both emails, so a page costs one query. Each row is turned into
+    a dict using the detail serializer's own field formatters, skipping DRF's
+    per-field attribute lookups. The output is identical to CreditCardDetailSerializer.
+    """
+    VALUE_FIELDS = (
+        'id', 'card_number', 'card_type', 'credit_limit', 'status', 'user__email',
+        'approved_by__email', 'rejection_reason', 'created_at', 'updated_at'
+    )
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    @classmethod
+    def get_queryset(cls, queryset):
+        return queryset.values(*cls.VALUE_FIELDS)
+
+    @property
+    def data(self):
+        fields = CreditCardDetailSerializer().fields
+        format_limit = fields['credit_limit'].to_representation
+        format_created = fields['created_at'].to_representation
+        format_updated = fields['updated_at'].to_representation
+
+        data = []
+        for row in self.rows:
+            item = {
+                'id': row['id'],
+                'card_number': row['card_number'],
+                'card_type': row['card_type'],
+                'credit_limit': format_limit(row['credit_limit']),
+                'status': row['status'],
+                'user_email': row['user__email'],
+            }
+            # DRF skips a dotted read-only source that resolves through a null FK
+            if row['approved_by__email'] is not None:
+                item['approved_by_email'] = row['approved_by__email']
+            item['rejection_reason'] = row['rejection_reason']
+            item['created_at'] = format_created(row['created_at'])
+            item['updated_at'] = format_updated(row['updated_at'])
+            data.append(item)
+        return data
+
+
 class CardApplicationActionSerializer(serializers.Serializer):
     rejection_reason = serializers.CharField(required=False, allow_blank=True)
 
@@ -57,3 +107,100 @@ class CardStatusUpdateSerializer(serializers.Serializer):
                 })
 
         return data
+
+
+class CardBulkStatusItemSerializer(CardStatusUpdateSerializer):
+    id = serializers.IntegerField(min_value=1)
+
+
+class CardSearchSerializer(serializers.Serializer):
+    last4 = serializers.RegexField(r'^[0-9]{4}$', required=False)
+    bin = serializers.RegexField(r'^[0-9]{6}$', required=False)
+    email = serializers.EmailField(required=False)
+    email_prefix = serializers.CharField(min_length=3, required=False)
+
+    def validate(self, data):
+        # An unfiltered search would just be the card list
+        if not data:
+            raise serializers.ValidationError('Provide at least one of last4, bin, email or email_prefix')
+        return data
+
+
+class CardRiskScoreQuerySerializer(serializers.Serializer):
+    status = serializers.ChoiceField(choices=CreditCard.STATUS_CHOICES, default='PENDING')
+    card_type = serializers.ChoiceField(choices=CreditCard.CARD_TYPES, required=False)
+
+
+class CardRiskScoreSerializer(serializers.Serializer):
+    """ Shape of a cards.risk.score_rows() result, for the schema """
+    id = serializers.IntegerField()
+    user_email = serializers.EmailField()
+    card_type = serializers.CharField()
+    credit_limit = serializers.DecimalField(max_digits=10, decimal_places=2)
+    status = serializers.CharField()
+    risk_score = serializers.FloatField()
+    risk_band = serializers.ChoiceField(choices=['LOW', 'MEDIUM', 'HIGH'])
+    suggested_limit = serializers.DecimalField(max_digits=10, decimal_places=2)
+
+
+class CardBulkStatusUpdateSerializer(serializers.Serializer):
+    decisions = serializers.ListField(child=serializers.JSONField(), allow_empty=False)
+
+    def validate_decisions(self, value):
+        max_size = int(getattr(settings, 'CARD_BULK_DECISION_MAX_SIZE', 5000))
+        if len(value) > max_size:
+            raise serializers.ValidationError(f'At most {max_size} decisions can be submitted at once')
+        return value
+
+
+class CardNumberFileSerializer(serializers.Serializer):
+    MODE_CHOICES = (
+        ('validate', 'Validate complete card numbers'),
+        ('complete', 'Append check digits to payloads')
+    )
+
+    file = serializers.FileField()
+    mode = serializers.ChoiceField(choices=MODE_CHOICES, default='validate')
+
+    @staticmethod
+    def get_max_upload_size():
+        # Room for CARD_VALIDATION_MAX_ROWS numbers of 19 digits with separators and CRLF
+        return int(getattr(settings, 'CARD_VALIDATION_MAX_UPLOAD_SIZE', 128 * 1024 * 1024))
+
+    def validate_file(self, value):
+        max_size = self.get_max_upload_size()
+        if value.size > max_size:
+            raise serializers.ValidationError(f'File must be at most {max_size} bytes')
+        return value
+
+
+class CardAuditEventSerializer(serializers.ModelSerializer):
+    changed_by_email = serializers.EmailField(source='changed_by.email', read_only=True)
+
+    class Meta:
+        model = CardAuditEvent
+        fields = ['id', 'field', 'old_value', 'new_value', 'rejection_reason', 'changed_by_email', 'changed_at']
+        read_only_fields = fields
+
+
+class CardExportJobSerializer(serializers.ModelSerializer):
+    requested_by_email = serializers.EmailField(source='requested_by.email', read_only=True)
+    progress = serializers.FloatField(read_only=True)
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = CardExportJob
+        fields = [
+            'id', 'export_format', 'status', 'requested_by_email', 'exported_rows',
+            'total_rows', 'progress', 'download_url', 'error', 'created_at', 'updated_at', 'completed_at'
+        ]
+        read_only_fields = [
+            'status', 'exported_rows', 'total_rows', 'error', 'created_at', 'updated_at', 'completed_at'
+        ]
+
+    def get_download_url(self, obj):
+        if obj.status != 'COMPLETED' or not obj.file_path:
+            return None
+        url = reverse('card-export-download', args=[obj.pk])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
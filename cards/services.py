@@ -1,6 +1,18 @@
-import hashlib
-import random
-from datetime import datetime
+import os
+import threading
+from collections import Counter, deque
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from .audit import audit_writer, describe_changes, record_changes
+from .cache import invalidate_cards
+from users.models import CustomUser
+from users.utils import prefix_range
+from .models import CreditCard, CardNumberSequence
+from .portfolio import PortfolioDeltas, as_money
 
 
 class CardNumberGenerator:
@@ -11,46 +23,25 @@ class CardNumberGenerator:
     }
 
     @staticmethod
-    def generate_unique_number(card_type='VISA'):
-        # Get BIN prefix based on card type
-        bin_prefix = CardNumberGenerator.BIN_RANGES.get(card_type, '400000')
-
-        # Generate timestamp-based unique identifier
-        timestamp = datetime.now().strftime('%Y%m%d%H%M%S%f')
-        random_num = str(random.randint(1000, 9999))
-
-        # Create a unique base string
-        base = f"{timestamp}{random_num}"
-
-        # Generate SHA-256 hash
-        hash_object = hashlib.sha256(base.encode())
-        hash_hex = hash_object.hexdigest()
-
-        # Convert hash to numbers only
-        numeric_hash = ''.join(c for c in hash_hex if c.isdigit())
-
-        # Calculate required length for account number
-        total_length = 15 if card_type == 'AMEX' else 16
-        account_number_length = total_length - len(bin_prefix) - 1  # -1 for checksum
+    def get_bin_prefix(card_type):
+        return CardNumberGenerator.BIN_RANGES.get(card_type, '400000')
 
-        # Take required number of digits
-        account_number = numeric_hash[:account_number_length]
-
-        # Combine BIN and account number
-        partial_number = f"{bin_prefix}{account_number}"
-
-        # Calculate and append check digit
-        check_digit = CardNumberGenerator.calculate_luhn_checksum(partial_number)
+    @staticmethod
+    def get_length(card_type):
+        return 15 if card_type == 'AMEX' else 16
 
-        return f"{partial_number}{check_digit}"
+    @staticmethod
+    def generate_unique_number(card_type='VISA'):
+        return CardNumberAllocator.allocate(card_type)
 
     @staticmethod
     def calculate_luhn_checksum(number):
+        # The check digit is appended to the right, so the payload's last digit is doubled
         digits = [int(d) for d in str(number)]
-        odd_digits = digits[-1::-2]
-        even_digits = digits[-2::-2]
-        total = sum(odd_digits)
-        for digit in even_digits:
+        doubled_digits = digits[-1::-2]
+        kept_digits = digits[-2::-2]
+        total = sum(kept_digits)
+        for digit in doubled_digits:
             total += sum(divmod(digit * 2, 10))
         return str((10 - (total % 10)) % 10)
 
@@ -59,3 +50,294 @@ class CardNumberGenerator:
         if not card_number.isdigit():
             return False
         return CardNumberGenerator.calculate_luhn_checksum(card_number[:-1]) == card_number[-1]
+
+    @staticmethod
+    def generate_unique_numbers(card_types):
+        """ Generate one number per entry of card_types, in order """
+        return CardNumberAllocator.allocate_many(card_types)
+
+
+class CardNumberAllocator:
+    """
+    Hands out Luhn-valid card numbers from account-number blocks reserved per BIN.
+
+    A block is reserved by bumping CardNumberSequence.next_value with one conditional
+    UPDATE, so two processes can never receive overlapping ranges. Numbers are then
+    served from process memory; the only other query per block filters out numbers
+    already issued by the old random generator.
+
+    Only blocks reserved in autocommit mode are kept in the process pool, since only
+    they are committed for sure. Called inside a transaction with an empty pool, the
+    allocator reserves just the numbers that call needs and keeps none of them: that
+    reservation commits or rolls back together with the caller's cards. Views therefore
+    allocate before opening their transaction.
+
+    Sequence values go through an affine permutation of the account space
+    (multiplier coprime to 10**n), which keeps them unique while not handing out
+    consecutive PANs.
+    """
+    MULTIPLIER = 7_654_321
+    OFFSET = 2_718_281
+
+    _lock = threading.Lock()
+    _pools = {}
+    _pid = None
+
+    @classmethod
+    def get_block_size(cls):
+        return int(getattr(settings, 'CARD_NUMBER_BLOCK_SIZE', 1000))
+
+    @classmethod
+    def allocate(cls, card_type='VISA'):
+        return cls.allocate_many([card_type])[0]
+
+    @classmethod
+    def allocate_many(cls, card_types):
+        keys = [
+            (CardNumberGenerator.get_bin_prefix(card_type), CardNumberGenerator.get_length(card_type))
+            for card_type in card_types
+        ]
+        remaining = Counter(keys)
+        private = {}
+        with cls._lock:
+            if cls._pid != os.getpid():
+                # Blocks reserved by a parent process must not be reused after fork
+                cls._pools = {}
+                cls._pid = os.getpid()
+
+            numbers = []
+            for key in keys:
+                pool = cls._pools.get(key)
+                if not pool and connection.in_atomic_block:
+                    pool = private.get(key)
+                    while not pool:
+                        pool = private[key] = cls._reserve_block(*key, remaining[key])
+                while not pool:
+                    pool = cls._pools[key] = cls._reserve_block(*key, cls.get_block_size())
+                numbers.append(pool.popleft())
+                remaining[key] -= 1
+            return numbers
+
+    @classmethod
+    def _reserve_block(cls, bin_prefix, length, block_size):
+        """ Numbers for the next block_size sequence values, minus any already issued """
+        account_length = length - len(bin_prefix) - 1
+        capacity = 10 ** account_length
+
+        # The UPDATE comes first so the write lock is taken before anything is read
+        with transaction.atomic():
+            sequences = CardNumberSequence.objects.filter(bin_prefix=bin_prefix)
+            if not sequences.update(next_value=F('next_value') + block_size, updated_at=timezone.now()):
+                try:
+                    with transaction.atomic():
+                        CardNumberSequence.objects.create(bin_prefix=bin_prefix, next_value=block_size)
+                except IntegrityError:
+                    sequences.update(next_value=F('next_value') + block_size, updated_at=timezone.now())
+            end = sequences.values_list('next_value', flat=True).get()
+
+        start = end - block_size
+        if start >= capacity:
+            raise RuntimeError(f'Card number space for BIN {bin_prefix} is exhausted')
+
+        candidates = [
+            cls.build_number(bin_prefix, (value * cls.MULTIPLIER + cls.OFFSET) % capacity, account_length)
+            for value in range(start, min(end, capacity))
+        ]
+        taken = set()
+        for chunk_start in range(0, len(candidates), 500):
+            chunk = candidates[chunk_start:chunk_start + 500]
+            taken.update(CreditCard.objects.filter(card_number__in=chunk).values_list('card_number', flat=True))
+        return deque(number for number in candidates if number not in taken)
+
+    @staticmethod
+    def build_number(bin_prefix, account_number, account_length):
+        partial_number = f"{bin_prefix}{account_number:0{account_length}d}"
+        return f"{partial_number}{CardNumberGenerator.calculate_luhn_checksum(partial_number)}"
+
+
+class CardTransitionConflict(Exception):
+    """ The card was no longer in the state a transition expected """
+
+    def __init__(self, current_status):
+        super().__init__(f'Card is {current_status}')
+        self.current_status = current_status
+
+
+class CardTransitionService:
+    """
+    Card state changes as a single conditional UPDATE. The WHERE clause carries the
+    status the transition requires and the credit limit the caller read, so a change made
+    by another request in between makes the UPDATE match nothing instead of being
+    overwritten. Only columns whose value actually changes are written.
+    """
+
+    @staticmethod
+    def decide(credit_card, new_status, decided_by, rejection_reason=None):
+        """ Approve or reject a pending card """
+        if new_status == 'APPROVED':
+            changes = {'status': new_status, 'approved_by': decided_by, 'rejection_reason': None}
+        else:
+            changes = {'status': new_status, 'approved_by': None, 'rejection_reason': rejection_reason}
+        deltas = PortfolioDeltas().move(credit_card.card_type, credit_card.credit_limit, 'PENDING', new_status)
+        return CardTransitionService.apply(credit_card, 'PENDING', changes, deltas, decided_by)
+
+    @staticmethod
+    def change_limit(credit_card, new_credit_limit, changed_by=None):
+        """ Change the credit limit of an approved card """
+        new_credit_limit = as_money(new_credit_limit)
+        deltas = PortfolioDeltas().change_limit('APPROVED', credit_card.card_type, credit_card.credit_limit,
+                                                new_credit_limit)
+        return CardTransitionService.apply(credit_card, 'APPROVED', {'credit_limit': new_credit_limit}, deltas,
+                                           changed_by)
+
+    @staticmethod
+    def apply(credit_card, expected_status, changes, deltas, changed_by=None):
+        """
+        Write changes if the card is still in expected_status with the credit limit it was
+        read with, then apply the portfolio deltas and record the audit events in the same
+        transaction. Raises
+        CardTransitionConflict when the card has moved on, CreditCard.DoesNotExist when it
+        is gone. The instance is updated in place and returned.
+        """
+        if credit_card.status != expected_status:
+            raise CardTransitionConflict(credit_card.status)
+
+        fields = {}
+        for name, value in changes.items():
+            field = CreditCard._meta.get_field(name)
+            current = getattr(credit_card, field.attname)
+            if field.is_relation and value is not None:
+                if current != value.pk:
+                    fields[name] = value
+            elif current != value:
+                fields[name] = value
+        if not fields:
+            return credit_card
+        fields['updated_at'] = timezone.now()
+
+        with transaction.atomic():
+            matched = CreditCard.objects.filter(
+                pk=credit_card.pk, status=expected_status, credit_limit=credit_card.credit_limit
+            ).update(**fields)
+            if not matched:
+                current_status = CreditCard.objects.filter(pk=credit_card.pk).values_list('status', flat=True).first()
+                if current_status is None:
+                    raise CreditCard.DoesNotExist
+                raise CardTransitionConflict(current_status)
+            deltas.apply()
+            old_values = {'status': credit_card.status, 'credit_limit': credit_card.credit_limit}
+            record_changes(credit_card.pk, old_values, fields, changed_by, fields.get('rejection_reason'))
+            # QuerySet.update() sends no signals, so the cached payload is dropped here
+            invalidate_cards([credit_card.pk])
+
+        for name, value in fields.items():
+            setattr(credit_card, name, value)
+        return credit_card
+
+
+class CardDecisionService:
+    # Keeps each UPDATE comfortably below the database's bound-parameter limit
+    CHUNK_SIZE = 500
+
+    @staticmethod
+    def bulk_update_status(decisions, decided_by):
+        """
+        Apply validated {'id', 'status', 'rejection_reason'} decisions with one UPDATE per
+        decision group: approvals share every value, rejections pick their reason with CASE.
+        Like CardTransitionService.decide, only pending cards are decided.
+        Returns (updated ids, {id: current status} of cards that were no longer pending);
+        ids of missing cards are in neither.
+        """
+        chunk_size = CardDecisionService.CHUNK_SIZE
+        now = timezone.now()
+
+        with transaction.atomic():
+            # Lock the rows and remember what the portfolio counters currently account them as
+            ids = [decision['id'] for decision in decisions]
+            current = {}
+            conflicts = {}
+            for start in range(0, len(ids), chunk_size):
+                rows = CreditCard.objects.select_for_update().filter(pk__in=ids[start:start + chunk_size]).values_list(
+                    'pk', 'status', 'card_type', 'credit_limit'
+                )
+                for pk, card_status, card_type, credit_limit in rows:
+                    if card_status == 'PENDING':
+                        current[pk] = (card_type, credit_limit)
+                    else:
+                        conflicts[pk] = card_status
+
+            approved = [decision['id'] for decision in decisions
+                        if decision['status'] == 'APPROVED' and decision['id'] in current]
+            rejected = {decision['id']: decision['rejection_reason'] for decision in decisions
+                        if decision['status'] == 'REJECTED' and decision['id'] in current}
+
+            for start in range(0, len(approved), chunk_size):
+                CreditCard.objects.filter(pk__in=approved[start:start + chunk_size], status='PENDING').update(
+                    status='APPROVED', approved_by=decided_by, rejection_reason=None, updated_at=now
+                )
+
+            rejected_ids = list(rejected)
+            for start in range(0, len(rejected_ids), chunk_size):
+                chunk = rejected_ids[start:start + chunk_size]
+                CreditCard.objects.filter(pk__in=chunk, status='PENDING').update(
+                    status='REJECTED',
+                    approved_by=None,
+                    rejection_reason=Case(*[When(pk=pk, then=Value(rejected[pk])) for pk in chunk]),
+                    updated_at=now
+                )
+
+            deltas = PortfolioDeltas()
+            events = []
+            for pk, new_status in [(pk, 'APPROVED') for pk in approved] + [(pk, 'REJECTED') for pk in rejected_ids]:
+                card_type, credit_limit = current[pk]
+                deltas.move(card_type, credit_limit, 'PENDING', new_status)
+                events.extend(describe_changes(pk, {'status': 'PENDING'}, {'status': new_status}, decided_by,
+                                               rejected.get(pk)))
+            deltas.apply()
+            audit_writer.record(events)
+
+            updated = set(approved) | set(rejected_ids)
+            # QuerySet.update() sends no signals, so cached payloads are dropped here
+            invalidate_cards(updated)
+
+        return updated, conflicts
+
+
+class CardSearchService:
+    """
+    Card lookups that each map onto an index: a full card number uses the unique
+    card_number index, last4 and bin_prefix have their own (column, -created_at, -id)
+    indexes, and an owner email is resolved through the unique
+    email index and then card_user_created_idx. Prefix matches on the email are turned into
+    a range (email >= 'ab' AND email < 'ac'), which a B-tree index can serve where LIKE cannot.
+    """
+
+    @staticmethod
+    def search(queryset, card_number=None, last4=None, bin_prefix=None, email=None, email_prefix=None):
+        if card_number:
+            queryset = queryset.filter(card_number=card_number)
+        if last4:
+            queryset = queryset.filter(last4=last4)
+        if bin_prefix:
+            queryset = queryset.filter(bin_prefix=bin_prefix)
+        if email:
+            queryset = queryset.filter(user__email=CustomUser.objects.normalize_email(email))
+        if email_prefix:
+            lower_bound, upper_bound = prefix_range(email_prefix)
+            queryset = queryset.filter(user__email__gte=lower_bound, user__email__lt=upper_bound)
+        return queryset
+
+    @staticmethod
+    def parse_term(term):
+        """ Map a free-text admin search term onto search() arguments """
+        term = term.strip()
+        if term.isdigit() and 13 <= len(term) <= 19:
+            # A full PAN; ISO/IEC 7812 numbers are 13 to 19 digits long
+            return {'card_number': term}
+        if term.isdigit() and len(term) == 4:
+            return {'last4': term}
+        if term.isdigit() and len(term) == 6:
+            return {'bin_prefix': term}
+        if '@' in term:
+            return {'email': term}
+        return {'email_prefix': term} if term else {}
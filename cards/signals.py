@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .cache import bump_list_generation, invalidate_cards
+from .models import CreditCard
+from .portfolio import PortfolioDeltas
+
+
+@receiver([post_save, post_delete], sender=CreditCard)
+def invalidate_card_cache(sender, instance, **kwargs):
+    invalidate_cards([instance.pk])
+
+
+@receiver(post_delete, sender=CreditCard)
+def remove_from_portfolio(sender, instance, **kwargs):
+    """
+    Every delete path, including cascades from a deleted user and admin bulk deletes, runs
+    inside the deletion's transaction, so the counters move with the rows.
+    """
+    PortfolioDeltas().remove(instance.status, instance.card_type, instance.credit_limit).apply()
+
+
+@receiver(post_init, sender=settings.AUTH_USER_MODEL)
+def remember_user_email(sender, instance, **kwargs):
+    # Read __dict__ so a deferred email is not fetched just to remember it
+    instance._loaded_email = instance.__dict__.get('email')
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_cards_on_email_change(sender, instance, created, update_fields=None, **kwargs):
+    """ Cached card payloads embed the owner's and approver's email """
+    if created or (update_fields is not None and 'email' not in update_fields):
+        return
+    if instance.email == instance._loaded_email:
+        return
+    instance._loaded_email = instance.email
+    bump_list_generation()
+    invalidate_cards(
+        CreditCard.objects.filter(Q(user=instance) | Q(approved_by=instance)).values_list('pk', flat=True)
+    )
@@ -1,3 +1,767 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import os
+import random
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from cards import cache as card_cache
+from cards.auto_decisions import AutoDecisionRules, AutoDecisionWorker
+from cards.async_views import AsyncCreditCardDetailView, AsyncCreditCardListView
+from cards.audit import CardAuditWriter, describe_changes
+from cards.exports import CardExporter
+from cards.luhn import calculate_check_digits, complete_card_numbers, validate_card_numbers
+from cards.management.commands.benchmark_risk_scoring import synthetic_features
+from cards.models import CardAuditEvent, CardExportJob, CardNumberSequence, CreditCard
+from cards.portfolio import read_portfolio
+from cards.risk import CARD_TYPES, score_application, score_applications
+from cards.serializers import CreditCardDetailSerializer, CreditCardListSerializer
+from cards.services import (
+    CardNumberAllocator, CardNumberGenerator, CardSearchService, CardTransitionConflict, CardTransitionService
+)
+from config.cache_steps import arun, run, versioned
+from users.models import CustomUser
+
+
+class VectorizedLuhnPropertyTestCase(SimpleTestCase):
+    """
+    The NumPy batch functions must agree with the scalar reference implementation
+    in CardNumberGenerator for any input.
+    """
+    iterations = 20
+    batch_size = 500
+
+    def setUp(self):
+        self.random = random.Random(20250210)
+
+    def random_numbers(self, alphabet='0123456789', max_length=19):
+        return [
+            ''.join(self.random.choice(alphabet) for _ in range(self.random.randint(1, max_length)))
+            for _ in range(self.batch_size)
+        ]
+
+    def test_validation_matches_reference(self):
+        for _ in range(self.iterations):
+            numbers = self.random_numbers()
+            expected = [CardNumberGenerator.is_valid_card_number(number) for number in numbers]
+            self.assertEqual(validate_card_numbers(numbers).tolist(), expected)
+
+    def test_check_digits_match_reference(self):
+        for _ in range(self.iterations):
+            payloads = self.random_numbers(max_length=18)
+            expected = [int(CardNumberGenerator.calculate_luhn_checksum(payload)) for payload in payloads]
+            self.assertEqual(calculate_check_digits(payloads).tolist(), expected)
+
+    def test_completed_numbers_are_valid(self):
+        payloads = self.random_numbers(max_length=18)
+        completed = complete_card_numbers(payloads)
+        self.assertTrue(all(CardNumberGenerator.is_valid_card_number(number) for number in completed))
+        self.assertTrue(validate_card_numbers(completed).all())
+
+    def test_single_digit_errors_are_detected(self):
+        completed = complete_card_numbers(self.random_numbers(max_length=18))
+        mutated = []
+        for number in completed:
+            position = self.random.randrange(len(number))
+            digit = str((int(number[position]) + self.random.randint(1, 9)) % 10)
+            mutated.append(number[:position] + digit + number[position + 1:])
+        self.assertFalse(validate_card_numbers(mutated).any())
+
+    def test_non_numeric_input_is_rejected(self):
+        numbers = self.random_numbers(alphabet='0123456789 -x')
+        expected = [CardNumberGenerator.is_valid_card_number(number) for number in numbers]
+        self.assertEqual(validate_card_numbers(numbers).tolist(), expected)
+        # str.isdigit() accepts non-ASCII digits, but only ASCII card numbers are valid
+        self.assertEqual(validate_card_numbers(['', '٤١١١١١١١١١١١١١١١']).tolist(), [False, False])
+        self.assertEqual(calculate_check_digits(['', 'abc']).tolist(), [-1, -1])
+
+    def test_known_card_numbers(self):
+        self.assertEqual(
+            validate_card_numbers(['4111111111111111', '5555555555554444', '378282246310005', '4111111111111112']).tolist(),
+            [True, True, True, False]
+        )
+
+
+class CreditCardListSerializerTestCase(APITestCase):
+    def setUp(self):
+        self.manager = CustomUser.objects.create_user(email='manager@example.com', password='pass', role='MANAGER')
+        self.user = CustomUser.objects.create_user(email='owner@example.com', password='pass')
+        CreditCard.objects.create(user=self.user, card_type='VISA', credit_limit=5000)
+        CreditCard.objects.create(user=self.user, card_type='AMEX', credit_limit='1234.5', status='APPROVED',
+                                  approved_by=self.manager)
+        CreditCard.objects.create(user=self.user, card_type='MASTERCARD', credit_limit=10, status='REJECTED',
+                                  rejection_reason='Insufficient credit history')
+
+    def test_output_matches_detail_serializer(self):
+        queryset = CreditCard.objects.all()
+        expected = JSONRenderer().render(CreditCardDetailSerializer(queryset, many=True).data)
+        actual = JSONRenderer().render(CreditCardListSerializer(CreditCardListSerializer.get_queryset(queryset)).data)
+        self.assertEqual(actual, expected)
+
+    def test_list_page_query_count_is_constant(self):
+        self.client.force_authenticate(self.manager)
+        # The ETag comes from the page, so nothing but the page is queried
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('card-list-create'))
+        self.assertEqual(len(response.data['results']), 3)
+
+    def test_status_and_card_type_filters(self):
+        other = CustomUser.objects.create_user(email='other@example.com', password='pass')
+        CreditCard.objects.create(user=other, card_type='VISA', credit_limit=100, status='APPROVED')
+        url = reverse('card-list-create')
+
+        self.client.force_authenticate(self.manager)
+        response = self.client.get(url, {'status': 'approved'})
+        self.assertEqual([(card['card_type'], card['status']) for card in response.data['results']],
+                         [('VISA', 'APPROVED'), ('AMEX', 'APPROVED')])
+        response = self.client.get(url, {'status': 'APPROVED', 'card_type': 'VISA'})
+        self.assertEqual([card['user_email'] for card in response.data['results']], ['other@example.com'])
+
+        # Filters narrow the owner's own cards, never widen them
+        self.client.force_authenticate(self.user)
+        response = self.client.get(url, {'card_type': 'VISA'})
+        self.assertEqual([card['status'] for card in response.data['results']], ['PENDING'])
+
+    def test_invalid_filter_value_is_rejected(self):
+        self.client.force_authenticate(self.manager)
+        for params in ({'status': 'CLOSED'}, {'card_type': 'DISCOVER'}):
+            response = self.client.get(reverse('card-list-create'), params)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(next(iter(params)), response.data)
+
+    def test_page_etag_follows_the_rows_on_the_page(self):
+        self.client.force_authenticate(self.manager)
+        url = reverse('card-list-create') + '?page_size=2'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # A row past the page leaves it untouched
+        oldest = CreditCard.objects.order_by('created_at').first()
+        CreditCard.objects.filter(pk=oldest.pk).update(credit_limit=1, updated_at=timezone.now())
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        newest = CreditCard.objects.order_by('-created_at').first()
+        CreditCard.objects.filter(pk=newest.pk).update(credit_limit=1, updated_at=timezone.now())
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response['ETag']
+        CreditCard.objects.create(user=self.user, card_type='VISA', credit_limit=100)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_row_leaving_the_page_is_not_answered_with_304(self):
+        self.client.force_authenticate(self.manager)
+        url = reverse('card-list-create') + '?status=PENDING'
+        response = self.client.get(url)
+        self.assertNotIn('Last-Modified', response)
+        modified_since = http_date(timezone.now().timestamp() + 60)
+
+        CreditCard.objects.filter(status='PENDING').update(status='APPROVED', updated_at=timezone.now())
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=modified_since)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [])
+
+
+class AsyncReadViewTestCase(APITestCase):
+    """ The native async views must answer exactly like the DRF views they replace under ASGI """
+
+    def setUp(self):
+        self.manager = CustomUser.objects.create_user(email='manager@example.com', password='pass', role='MANAGER')
+        self.user = CustomUser.objects.create_user(email='owner@example.com', password='pass')
+        self.other = CustomUser.objects.create_user(email='other@example.com', password='pass')
+        self.card = CreditCard.objects.create(user=self.user, card_type='VISA', credit_limit=5000)
+        CreditCard.objects.create(user=self.other, card_type='AMEX', credit_limit=100, status='APPROVED',
+                                  approved_by=self.manager)
+
+    async def assertSameResponse(self, view, path, user, **kwargs):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(user)}'} if user else {}
+        expected = await self.async_client.get(path, **headers)
+        actual = await view(AsyncRequestFactory().get(path, **headers), **kwargs)
+        self.assertEqual(actual.status_code, expected.status_code)
+        self.assertEqual(actual.content, expected.content)
+        self.assertEqual(actual.get('ETag'), expected.get('ETag'))
+
+    async def test_card_list(self):
+        view = AsyncCreditCardListView.as_view()
+        for user in (self.manager, self.user, None):
+            for query in ('', '?page_size=1', '?status=approved', '?card_type=nope'):
+                await self.assertSameResponse(view, reverse('card-list-create') + query, user)
+
+    async def test_card_detail(self):
+        view = AsyncCreditCardDetailView.as_view()
+        for user in (self.manager, self.user, self.other):
+            await self.assertSameResponse(view, reverse('card-detail', args=[self.card.pk]), user, pk=self.card.pk)
+
+
+@override_settings(CARD_AUDIT_ASYNC=False)
+class AutoDecisionWorkerTestCase(TestCase):
+    def setUp(self):
+        self.rules = AutoDecisionRules(
+            APPROVE_MAX_LIMIT={'VISA': 1000}, APPROVE_ROLES=['USER'], APPROVE_MAX_CARDS=2, REJECT_AT_CARDS=3
+        )
+        self.user = CustomUser.objects.create_user(email='owner@example.com', password='pass')
+        self.manager = CustomUser.objects.create_user(email='manager@example.com', password='pass', role='MANAGER')
+
+    def create_cards(self, user, count, **fields):
+        return [CreditCard.objects.create(user=user, **{'card_type': 'VISA', 'credit_limit': 500, **fields})
+                for _ in range(count)]
+
+    def test_rules(self):
+        self.assertEqual(self.rules.decide('VISA', 1000, 'USER', 1), ('APPROVED', None))
+        self.assertIsNone(self.rules.decide('VISA', 1000.01, 'USER', 0))
+        self.assertIsNone(self.rules.decide('AMEX', 10, 'USER', 0))
+        self.assertIsNone(self.rules.decide('VISA', 10, 'MANAGER', 0))
+        self.assertIsNone(self.rules.decide('VISA', 10, 'USER', 2))
+        self.assertEqual(self.rules.decide('VISA', 10, 'USER', 3)[0], 'REJECTED')
+
+    def test_pass_decides_in_order_and_leaves_the_rest(self):
+        self.create_cards(self.user, 1, status='APPROVED', approved_by=self.manager)
+        cards = self.create_cards(self.user, 3)
+        large = self.create_cards(self.user, 1, credit_limit=5000)[0]
+        manager_card = self.create_cards(self.manager, 1)[0]
+
+        approved_before = read_portfolio().get(('APPROVED', 'VISA'), (0, 0))[0]
+        # Audit events are handed over on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            totals = AutoDecisionWorker(self.rules, decided_by=self.manager, batch_size=2).run_pass()
+
+        self.assertEqual(totals['scanned'], 5)
+        self.assertEqual((totals['approved'], totals['rejected'], totals['review']), (1, 0, 4))
+        statuses = dict(CreditCard.objects.values_list('pk', 'status'))
+        # The first pending card brings the applicant to APPROVE_MAX_CARDS, the others wait for review
+        self.assertEqual([statuses[card.pk] for card in cards], ['APPROVED', 'PENDING', 'PENDING'])
+        self.assertEqual(statuses[large.pk], 'PENDING')
+        self.assertEqual(statuses[manager_card.pk], 'PENDING')
+        self.assertEqual(CardAuditEvent.objects.filter(card_id=cards[0].pk, changed_by=self.manager).count(), 1)
+        self.assertEqual(read_portfolio()[('APPROVED', 'VISA')][0], approved_before + 1)
+
+    def test_rejects_applicants_at_the_card_cap(self):
+        self.create_cards(self.user, 3, status='APPROVED')
+        card = self.create_cards(self.user, 1)[0]
+        totals = AutoDecisionWorker(self.rules).run_pass()
+        card.refresh_from_db()
+        self.assertEqual(totals['rejected'], 1)
+        self.assertEqual(card.status, 'REJECTED')
+        self.assertEqual(card.rejection_reason, AutoDecisionRules.DEFAULTS['REJECTION_REASON'])
+
+    def test_each_pass_rescans_from_the_oldest_pending_card(self):
+        self.create_cards(self.user, 1)
+        worker = AutoDecisionWorker(self.rules)
+        self.assertEqual(worker.run_pass()['approved'], 1)
+
+        # Committed late: created before the card the last pass ended on
+        late = self.create_cards(self.user, 1)[0]
+        CreditCard.objects.filter(pk=late.pk).update(created_at=timezone.now() - timedelta(days=1))
+        self.assertEqual(worker.run_pass()['approved'], 1)
+        late.refresh_from_db()
+        self.assertEqual(late.status, 'APPROVED')
+
+    def test_skipped_approval_does_not_count_against_the_applicant(self):
+        self.create_cards(self.user, 1, status='APPROVED')
+        first, second = self.create_cards(self.user, 2)
+        worker = AutoDecisionWorker(self.rules)
+        rows = worker._claim(0)
+        # A manager rejects the first card after the worker read it
+        CreditCard.objects.filter(pk=first.pk).update(status='REJECTED')
+
+        outcome = worker._decide_batch(rows)
+        self.assertEqual((outcome['approved'], outcome['skipped'], outcome['review']), (1, 1, 0))
+        second.refresh_from_db()
+        self.assertEqual(second.status, 'APPROVED')
+
+    def test_dry_run_writes_nothing(self):
+        self.create_cards(self.user, 2)
+        totals = AutoDecisionWorker(self.rules, dry_run=True).run_pass()
+        self.assertEqual(totals['approved'], 2)
+        self.assertFalse(CreditCard.objects.exclude(status='PENDING').exists())
+
+
+class RiskScoringTestCase(SimpleTestCase):
+    """ The vectorized scoring must agree with the scalar reference in cards.risk """
+
+    def test_matches_reference(self):
+        features = synthetic_features(2000, seed=20250210)
+        scores, suggested = score_applications(features)
+        for i in range(2000):
+            expected_score, expected_limit = score_application(
+                features['credit_limit'][i], CARD_TYPES[features['card_type'][i]], features['account_age_days'][i],
+                features['approved_cards'][i], features['rejected_cards'][i], features['pending_cards'][i],
+                features['approved_limit'][i],
+            )
+            self.assertAlmostEqual(scores[i], expected_score, places=12)
+            self.assertEqual(suggested[i], expected_limit)
+
+    def test_risk_grows_with_rejections_and_falls_with_account_age(self):
+        base = dict(credit_limit=5000, card_type='VISA', account_age_days=30, approved_cards=0, rejected_cards=0,
+                    pending_cards=0, approved_limit=0)
+        score = score_application(**base)[0]
+        self.assertGreater(score_application(**{**base, 'rejected_cards': 2})[0], score)
+        self.assertLess(score_application(**{**base, 'account_age_days': 3650})[0], score)
+        # Never more than what was asked for
+        self.assertLessEqual(score_application(**{**base, 'credit_limit': 250})[1], 250)
+
+
+class CardRiskScoreViewTestCase(APITestCase):
+    def setUp(self):
+        self.manager = CustomUser.objects.create_user(email='manager@example.com', password='pass', role='MANAGER')
+        self.user = CustomUser.objects.create_user(email='owner@example.com', password='pass')
+        self.card = CreditCard.objects.create(user=self.user, card_type='VISA', credit_limit=5000)
+        CreditCard.objects.create(user=self.user, card_type='AMEX', credit_limit=2000, status='REJECTED')
+
+    def test_scores_pending_cards_with_the_applicants_history(self):
+        self.client.force_authenticate(self.manager)
+        response = self.client.get(reverse('card-risk-scores'))
+        self.assertEqual(response.status_code, 200)
+        [result] = response.data['results']
+        score, limit = score_application(5000, 'VISA', 0, 0, 1, 0, 0)
+        self.assertEqual(result['id'], self.card.pk)
+        self.assertAlmostEqual(result['risk_score'], score, places=2)
+        self.assertEqual(result['suggested_limit'], f'{limit:.2f}')
+
+    def test_managers_only(self):
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get(reverse('card-risk-scores')).status_code, 403)
+
+
+class CardExportTestCase(APITestCase):
+    def setUp(self):
+        export_root = tempfile.TemporaryDirectory()
+        self.addCleanup(export_root.cleanup)
+        self.enterContext(override_settings(CARD_EXPORT_ROOT=export_root.name, CARD_EXPORT_LEASE=60))
+        self.admin = CustomUser.objects.create_user(email='admin@example.com', password='pass', role='ADMIN')
+        self.manager = CustomUser.objects.create_user(email='manager@example.com', password='pass', role='MANAGER')
+        self.card = CreditCard.objects.create(user=self.manager, card_type='VISA', credit_limit=5000)
+
+    def export(self):
+        return CardExporter(CardExportJob.objects.create(export_format='NDJSON')).run()
+
+    def test_written_outside_media_root_under_a_random_name(self):
+        job = self.export()
+        path = CardExporter.absolute_path(job)
+        self.assertTrue(path.startswith(settings.CARD_EXPORT_ROOT))
+        self.assertFalse(path.startswith(str(settings.MEDIA_ROOT)))
+        self.assertNotEqual(os.path.basename(path), f'cards-{job.pk}.ndjson.gz')
+        self.assertNotEqual(CardExporter.relative_path(job), CardExporter.relative_path(job))
+
+    def test_admins_download_through_the_view(self):
+        job = self.export()
+        url = reverse('card-export-download', args=[job.pk])
+        self.client.force_authenticate(self.admin)
+        detail = self.client.get(reverse('card-export-detail', args=[job.pk]))
+        self.assertTrue(detail.data['download_url'].endswith(url))
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        rows = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+        self.assertEqual([json.loads(row)['id'] for row in rows], [self.card.pk])
+
+        self.client.force_authenticate(self.manager)
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+    def test_unfinished_exports_cannot_be_downloaded(self):
+        job = CardExportJob.objects.create(export_format='CSV', status='RUNNING', file_path='cards-partial.csv.gz')
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.get(reverse('card-export-download', args=[job.pk])).status_code, 404)
+
+    def test_running_jobs_past_their_lease_are_resumable(self):
+        live = CardExportJob.objects.create(status='RUNNING')
+        stale = CardExportJob.objects.create(status='RUNNING')
+        CardExportJob.objects.filter(pk=stale.pk).update(updated_at=timezone.now() - timedelta(minutes=5))
+
+        self.assertFalse(CardExporter(live).claim())
+        self.assertEqual(CardExporter(stale).run().status, 'COMPLETED')
+        call_command('export_cards', resume_stale=True, stdout=io.StringIO())
+        live.refresh_from_db()
+        self.assertEqual(live.status, 'RUNNING')
+
+
+@override_settings(CARD_AUDIT_ASYNC=False)
+class PortfolioCounterTestCase(APITestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(email='admin@example.com', password='pass', role='ADMIN')
+        self.owner = CustomUser.objects.create_user(email='owner@example.com', password='pass')
+        self.card = CreditCard.objects.create(user=self.owner, card_type='VISA', credit_limit=500)
+        CreditCard.objects.create(user=self.owner, card_type='AMEX', credit_limit=100, status='APPROVED',
+                                  approved_by=self.admin)
+        CreditCard.objects.create(user=self.admin, card_type='VISA', credit_limit=250)
+        call_command('rebuild_card_portfolio', stdout=io.StringIO())
+
+    def test_deleting_a_user_removes_their_cards_from_the_counters(self):
+        self.owner.delete()
+        call_command('rebuild_card_portfolio', verify=True, stdout=io.StringIO())
+        self.assertEqual(read_portfolio(), {('PENDING', 'VISA'): (1, Decimal('250.00'))})
+
+    def test_deleting_a_card_through_the_api(self):
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.delete(reverse('card-detail', args=[self.card.pk])).status_code, 204)
+        call_command('rebuild_card_portfolio', verify=True, stdout=io.StringIO())
+
+
+class CardSearchServiceTestCase(TestCase):
+    def test_parse_term(self):
+        cases = {
+            '4111111111111': {'card_number': '4111111111111'},
+            ' 4111111111111111 ': {'card_number': '4111111111111111'},
+            '4111111111111111111': {'card_number': '4111111111111111111'},
+            '1234': {'last4': '1234'},
+            '411111': {'bin_prefix': '411111'},
+            'Owner@Example.com': {'email': 'Owner@Example.com'},
+            'own': {'email_prefix': 'own'},
+            # Digits of no card number length fall back to an email prefix
+            '12345': {'email_prefix': '12345'},
+            '41111111111111111111': {'email_prefix': '41111111111111111111'},
+            '   ': {},
+        }
+        for term, expected in cases.items():
+            with self.subTest(term=term):
+                self.assertEqual(CardSearchService.parse_term(term), expected)
+
+    def test_full_card_number_is_an_exact_lookup(self):
+        user = CustomUser.objects.create_user(email='owner@example.com', password='pass')
+        card = CreditCard.objects.create(user=user, card_type='VISA', credit_limit=500)
+        CreditCard.objects.create(user=user, card_type='VISA', credit_limit=500)
+        criteria = CardSearchService.parse_term(card.card_number)
+        self.assertEqual(list(CardSearchService.search(CreditCard.objects.all(), **criteria)), [card])
+
+
+class CardNumberValidationViewTestCase(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(
+            CustomUser.objects.create_user(email='admin@example.com', password='pass', role='ADMIN')
+        )
+
+    def upload(self, content, mode='validate'):
+        upload = SimpleUploadedFile('numbers.txt', content.encode(), content_type='text/plain')
+        return self.client.post(reverse('card-number-validation'), {'file': upload, 'mode': mode}, format='multipart')
+
+    def test_validates_numbers(self):
+        response = self.upload('4111 1111 1111 1111\n4111-1111-1111-1112\n')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['valid'], response.data['invalid']), (1, 1))
+
+    def test_lines_longer_than_a_card_number_are_refused(self):
+        for mode, length in (('validate', 20), ('complete', 19)):
+            response = self.upload('4111111111111111\n' + '4' * length + '\n', mode=mode)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('Line 2', response.data['error'])
+        self.assertEqual(self.upload('4' * 18 + '\n', mode='complete').status_code, 200)
+        with self.assertRaises(ValueError):
+            validate_card_numbers(['4' * 20])
+        with self.assertRaises(ValueError):
+            complete_card_numbers(['4' * 19])
+
+    def test_upload_size_is_capped(self):
+        with override_settings(CARD_VALIDATION_MAX_UPLOAD_SIZE=16):
+            response = self.upload('4111111111111111\n')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('file', response.data)
+
+
+@override_settings(CARD_NUMBER_BLOCK_SIZE=5)
+class CardNumberAllocatorTestCase(TransactionTestCase):
+    def setUp(self):
+        CardNumberAllocator._pools = {}
+        self.addCleanup(setattr, CardNumberAllocator, '_pools', {})
+
+    def sequence(self, bin_prefix='400000'):
+        return CardNumberSequence.objects.filter(bin_prefix=bin_prefix).values_list('next_value', flat=True).first()
+
+    def test_numbers_are_unique_and_valid_across_calls(self):
+        card_types = ['VISA', 'AMEX', 'MASTERCARD'] * 7
+        numbers = CardNumberAllocator.allocate_many(card_types) + CardNumberAllocator.allocate_many(card_types)
+        self.assertEqual(len(set(numbers)), len(numbers))
+        self.assertTrue(validate_card_numbers(numbers).all())
+        self.assertEqual([len(number) for number in numbers[:3]], [16, 15, 16])
+        # Fourteen VISA numbers need three blocks of five
+        self.assertEqual(self.sequence(), 15)
+
+    def test_numbers_issued_by_the_old_generator_are_skipped(self):
+        allocator = CardNumberAllocator
+        first, second = [
+            allocator.build_number('400000', (value * allocator.MULTIPLIER + allocator.OFFSET) % 10 ** 9, 9)
+            for value in (0, 1)
+        ]
+        user = CustomUser.objects.create_user(email='owner@example.com', password='pass')
+        CreditCard.objects.create(user=user, card_type='VISA', credit_limit=500, card_number=first)
+        self.assertEqual(CardNumberAllocator.allocate('VISA'), second)
+
+    def test_reservation_rolls_back_with_the_callers_transaction(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            numbers = CardNumberAllocator.allocate_many(['VISA', 'VISA'])
+            # Only what the call needs is reserved, and nothing is pooled
+            self.assertEqual(self.sequence(), 2)
+            raise IntegrityError
+        self.assertIsNone(self.sequence())
+        self.assertEqual(CardNumberAllocator._pools, {})
+        # The rolled back range is handed out again, and no other process got it in between
+        self.assertEqual(CardNumberAllocator.allocate_many(['VISA', 'VISA']), numbers)
+        self.assertEqual(self.sequence(), 5)
+
+
+class CardCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = CustomUser.objects.create_user(email='owner@example.com', password='pass')
+        self.card = CreditCard.objects.create(user=user, card_type='VISA', credit_limit=500)
+
+    def key(self):
+        return f'cards:detail:{self.card.pk}:{card_cache.get_version(self.card.pk)}'
+
+    def test_invalidation_moves_to_a_new_version(self):
+        self.assertEqual(card_cache.get_card_payload(self.card.pk)['data']['credit_limit'], '500.00')
+        version = card_cache.get_version(self.card.pk)
+        CreditCard.objects.filter(pk=self.card.pk).update(credit_limit=750)
+        with self.assertNumQueries(0):
+            self.assertEqual(card_cache.get_card_payload(self.card.pk)['data']['credit_limit'], '500.00')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            card_cache.invalidate_cards([self.card.pk])
+        self.assertNotEqual(card_cache.get_version(self.card.pk), version)
+        self.assertEqual(card_cache.get_card_payload(self.card.pk)['data']['credit_limit'], '750.00')
+
+    def test_stale_entry_is_served_while_another_request_rebuilds(self):
+        card_cache.get_card_payload(self.card.pk)
+        cache.set(self.key(), {**cache.get(self.key()), 'soft_expires': 0})
+        CreditCard.objects.filter(pk=self.card.pk).update(credit_limit=750)
+
+        cache.add(f'{self.key()}:lock', 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(card_cache.get_card_payload(self.card.pk)['data']['credit_limit'], '500.00')
+
+        # The first request past the soft expiry takes the lock, rebuilds once and releases it
+        cache.delete(f'{self.key()}:lock')
+        self.assertEqual(card_cache.get_card_payload(self.card.pk)['data']['credit_limit'], '750.00')
+        self.assertIsNone(cache.get(f'{self.key()}:lock'))
+        with self.assertNumQueries(0):
+            card_cache.get_card_payload(self.card.pk)
+
+    def test_failed_rebuild_releases_the_lock(self):
+        def fail(pk):
+            raise RuntimeError('database unavailable')
+
+        with self.assertRaises(RuntimeError):
+            run(card_cache.card_payload_steps(self.card.pk), fail)
+        self.assertIsNone(cache.get(f'{self.key()}:lock'))
+
+    async def test_async_read_path_shares_the_cache(self):
+        payload = await card_cache.aget_card_payload(self.card.pk)
+        self.assertEqual(payload['data']['id'], self.card.pk)
+        version = await arun(versioned(card_cache.version_key(self.card.pk)))
+        entry = await cache.aget(f'cards:detail:{self.card.pk}:{version}')
+        self.assertEqual(entry['payload'], payload)
+
+    @mock.patch('cards.cache.LOCK_WAIT_STEP', 0)
+    def test_missing_entry_waits_for_the_lock_holder_then_reads_through(self):
+        cache.add(f'{self.key()}:lock', 1)
+        with self.assertNumQueries(1):
+            self.assertEqual(card_cache.get_card_payload(self.card.pk)['data']['id'], self.card.pk)
+        # Only the lock holder fills the cache
+        self.assertIsNone(cache.get(self.key()))
+
+
+@override_settings(CARD_AUDIT_ASYNC=False)
+class CardDecisionConflictTestCase(APITestCase):
+    def setUp(self):
+        self.manager = CustomUser.objects.create_user(email='manager@example.com', password='pass', role='MANAGER')
+        owner = CustomUser.objects.create_user(email='owner@example.com', password='pass')
+        self.card = CreditCard.objects.create(user=owner, card_type='VISA', credit_limit=500)
+        call_command('rebuild_card_portfolio', stdout=io.StringIO())
+        self.client.force_authenticate(self.manager)
+
+    def decide(self, decision):
+        return self.client.post(reverse('card-status-update', args=[self.card.pk]), decision, format='json')
+
+    def test_second_decision_is_a_conflict(self):
+        self.assertEqual(self.decide({'status': 'APPROVED'}).status_code, 200)
+        portfolio = read_portfolio()
+        events = CardAuditEvent.objects.count()
+
+        response = self.decide({'status': 'REJECTED', 'rejection_reason': 'Changed our mind entirely'})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['current_status'], 'APPROVED')
+        self.assertEqual(read_portfolio(), portfolio)
+        self.assertEqual(CardAuditEvent.objects.count(), events)
+        call_command('rebuild_card_portfolio', verify=True, stdout=io.StringIO())
+
+    def test_decision_racing_with_another_one_changes_nothing(self):
+        # Read as PENDING before another request approved it
+        stale = CreditCard.objects.get(pk=self.card.pk)
+        CardTransitionService.decide(CreditCard.objects.get(pk=self.card.pk), 'APPROVED', self.manager)
+        portfolio = read_portfolio()
+
+        with self.assertRaises(CardTransitionConflict) as conflict:
+            CardTransitionService.decide(stale, 'REJECTED', self.manager, 'Changed our mind entirely')
+        self.assertEqual(conflict.exception.current_status, 'APPROVED')
+        self.assertEqual(read_portfolio(), portfolio)
+        self.assertEqual(CreditCard.objects.get(pk=self.card.pk).status, 'APPROVED')
+
+
+class CardBatchApplicationTestCase(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='owner@example.com', password='pass')
+        self.client.force_authenticate(self.user)
+
+    def apply(self, applications):
+        return self.client.post(reverse('card-batch-create'), {'applications': applications}, format='json')
+
+    def test_errors_are_reported_per_item(self):
+        response = self.apply([
+            {'card_type': 'VISA', 'credit_limit': 500},
+            {'card_type': 'NOPE', 'credit_limit': 500},
+            {'card_type': 'AMEX'},
+        ])
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([result['success'] for result in response.data['results']], [True, False, False])
+        self.assertIn('card_type', response.data['results'][1]['errors'])
+        self.assertIn('credit_limit', response.data['results'][2]['errors'])
+        self.assertEqual(list(CreditCard.objects.values_list('card_type', flat=True)), ['VISA'])
+
+        response = self.apply([{'card_type': 'NOPE', 'credit_limit': 500}, {'card_type': 'VISA'}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['created'], 0)
+        self.assertEqual(CreditCard.objects.count(), 1)
+
+    @override_settings(CARD_BATCH_MAX_SIZE=2)
+    def test_batch_size_is_capped(self):
+        self.assertEqual(self.apply([{'card_type': 'VISA', 'credit_limit': 500}] * 3).status_code, 400)
+        self.assertFalse(CreditCard.objects.exists())
+        self.assertEqual(self.apply([{'card_type': 'VISA', 'credit_limit': 500}] * 2).status_code, 201)
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        # The first batch creates the card number sequence and portfolio counter rows
+        self.apply([{'card_type': 'VISA', 'credit_limit': 500}])
+        with CaptureQueriesContext(connection) as small:
+            self.apply([{'card_type': 'VISA', 'credit_limit': 500}] * 2)
+        with CaptureQueriesContext(connection) as large:
+            self.assertEqual(self.apply([{'card_type': 'VISA', 'credit_limit': 500}] * 20).status_code, 201)
+        self.assertEqual(len(small), len(large))
+
+
+@override_settings(CARD_AUDIT_ASYNC=False)
+class CardBulkStatusUpdateTestCase(APITestCase):
+    def setUp(self):
+        self.manager = CustomUser.objects.create_user(email='manager@example.com', password='pass', role='MANAGER')
+        self.cards = CreditCard.objects.bulk_create(
+            CreditCard(user=self.manager, card_type='VISA', credit_limit=500, card_number=number)
+            for number in CardNumberGenerator.generate_unique_numbers(['VISA'] * 23)
+        )
+        call_command('rebuild_card_portfolio', stdout=io.StringIO())
+        self.client.force_authenticate(self.manager)
+
+    def decide(self, decisions):
+        return self.client.post(reverse('card-bulk-status-update'), {'decisions': decisions}, format='json')
+
+    def test_errors_are_reported_per_item(self):
+        response = self.decide([
+            {'id': self.cards[0].pk, 'status': 'APPROVED'},
+            {'id': self.cards[1].pk, 'status': 'REJECTED'},
+            {'id': 0, 'status': 'APPROVED'},
+        ])
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([result['success'] for result in response.data['results']], [True, False, False])
+        self.assertIn('rejection_reason', response.data['results'][1]['errors'])
+        self.assertEqual(list(CreditCard.objects.exclude(status='PENDING').values_list('pk', flat=True)),
+                         [self.cards[0].pk])
+
+        response = self.decide([{'id': self.cards[1].pk, 'status': 'CLOSED'}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(CreditCard.objects.exclude(status='PENDING').count(), 1)
+        call_command('rebuild_card_portfolio', verify=True, stdout=io.StringIO())
+
+    @override_settings(CARD_BULK_DECISION_MAX_SIZE=2)
+    def test_batch_size_is_capped(self):
+        response = self.decide([{'id': card.pk, 'status': 'APPROVED'} for card in self.cards[:3]])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(CreditCard.objects.exclude(status='PENDING').exists())
+
+    def test_duplicate_ids_are_refused(self):
+        card = self.cards[0]
+        response = self.decide([{'id': card.pk, 'status': 'APPROVED'},
+                                {'id': card.pk, 'status': 'REJECTED', 'rejection_reason': 'Second thoughts here'}])
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.data['results'][1]['errors'], {'id': ['Duplicate decision for this card']})
+        card.refresh_from_db()
+        self.assertEqual(card.status, 'APPROVED')
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        # The first approval creates the APPROVED portfolio counter row
+        self.decide([{'id': self.cards[0].pk, 'status': 'APPROVED'}])
+        with CaptureQueriesContext(connection) as small:
+            self.decide([{'id': card.pk, 'status': 'APPROVED'} for card in self.cards[1:3]])
+        with CaptureQueriesContext(connection) as large:
+            response = self.decide([{'id': card.pk, 'status': 'APPROVED'} for card in self.cards[3:]])
+        self.assertEqual(response.data['updated'], 20)
+        self.assertEqual(len(small), len(large))
+
+
+@override_settings(CARD_AUDIT_ASYNC=False)
+class CardAuditTestCase(APITestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_superuser(email='admin@example.com', password='pass')
+        owner = CustomUser.objects.create_user(email='owner@example.com', password='pass')
+        self.card = CreditCard.objects.create(user=owner, card_type='VISA', credit_limit=500)
+
+    def events(self):
+        return list(CardAuditEvent.objects.filter(card_id=self.card.pk, changed_by=self.admin)
+                    .order_by('id').values_list('field', 'old_value', 'new_value'))
+
+    def test_api_status_and_limit_changes_are_audited(self):
+        self.client.force_authenticate(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('card-status-update', args=[self.card.pk]),
+                                        {'status': 'APPROVED'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(reverse('card-limit-update', args=[self.card.pk]),
+                                         {'credit_limit': 750}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.events(), [('status', 'PENDING', 'APPROVED'), ('credit_limit', '500.00', '750.00')])
+
+    def test_admin_change_is_audited(self):
+        self.client.force_login(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('admin:cards_creditcard_change', args=[self.card.pk]), {
+                'user': self.card.user_id, 'card_type': 'VISA', 'credit_limit': '900.00',
+                'status': 'REJECTED', 'rejection_reason': 'Income could not be verified', 'approved_by': self.admin.pk,
+            })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.events(), [('status', 'PENDING', 'REJECTED'), ('credit_limit', '500.00', '900.00')])
+        self.assertEqual(CardAuditEvent.objects.get(field='status').rejection_reason, 'Income could not be verified')
+
+
+class CardAuditWriterTestCase(TransactionTestCase):
+    """ The writer thread uses its own connection, so the events have to be committed for real """
+
+    @override_settings(CARD_AUDIT_ASYNC=True, CARD_AUDIT_FLUSH_INTERVAL=60)
+    def test_close_writes_buffered_events(self):
+        user = CustomUser.objects.create_user(email='owner@example.com', password='pass')
+        card = CreditCard.objects.create(user=user, card_type='VISA', credit_limit=500)
+        writer = CardAuditWriter()
+        writer.record(describe_changes(card.pk, {'status': 'PENDING'}, {'status': 'APPROVED'}, user))
+        self.assertTrue(writer._thread.is_alive())
+        self.assertFalse(CardAuditEvent.objects.exists())
+
+        writer.close()
+        self.assertFalse(writer._thread.is_alive())
+        self.assertEqual(list(CardAuditEvent.objects.values_list('field', 'old_value', 'new_value')),
+                         [('status', 'PENDING', 'APPROVED')])
@@ -1,12 +1,26 @@
 from django.urls import path
+from .async_api import read_async
+from .async_views import AsyncCreditCardDetailView, AsyncCreditCardListView
 from .views import (
-    CreditCardListCreateView,
+    CreditCardListCreateView, CreditCardBatchApplicationView, CreditCardSearchView,
     CreditCardDetailView, CreditCardStatusUpdateView, CreditCardLimitUpdateView,
+    CreditCardBulkStatusUpdateView, CardAuditLogView, CardPortfolioStatsView, CardRiskScoreView,
+    CardNumberValidationView, CardExportListCreateView, CardExportDetailView, CardExportDownloadView,
 )
 
 urlpatterns = [
-    path('', CreditCardListCreateView.as_view(), name='card-list-create'),
-    path('<int:pk>/', CreditCardDetailView.as_view(), name='card-detail'),
+    path('', read_async(AsyncCreditCardListView.as_view(), CreditCardListCreateView.as_view()), name='card-list-create'),
+    path('batch/', CreditCardBatchApplicationView.as_view(), name='card-batch-create'),
+    path('search/', CreditCardSearchView.as_view(), name='card-search'),
+    path('bulk-update-status/', CreditCardBulkStatusUpdateView.as_view(), name='card-bulk-status-update'),
+    path('stats/', CardPortfolioStatsView.as_view(), name='card-portfolio-stats'),
+    path('risk-scores/', CardRiskScoreView.as_view(), name='card-risk-scores'),
+    path('validate-numbers/', CardNumberValidationView.as_view(), name='card-number-validation'),
+    path('<int:pk>/', read_async(AsyncCreditCardDetailView.as_view(), CreditCardDetailView.as_view()), name='card-detail'),
     path('<int:pk>/update-status/', CreditCardStatusUpdateView.as_view(), name='card-status-update'),
     path('<int:pk>/update-limit/', CreditCardLimitUpdateView.as_view(), name='card-limit-update'),
+    path('<int:pk>/audit/', CardAuditLogView.as_view(), name='card-audit-log'),
+    path('exports/', CardExportListCreateView.as_view(), name='card-export-list-create'),
+    path('exports/<int:pk>/', CardExportDetailView.as_view(), name='card-export-detail'),
+    path('exports/<int:pk>/download/', CardExportDownloadView.as_view(), name='card-export-download'),
 ]
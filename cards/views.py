@@ -1,17 +1,41 @@
-from django.http import Http404
+from django.conf import settings
+from django.db import transaction
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.dateparse import parse_datetime
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.parsers import JSONParser, MultiPartParser
-from drf_spectacular.utils import extend_schema, OpenApiResponse, OpenApiExample
-from .models import CreditCard
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema, OpenApiResponse, OpenApiExample, OpenApiParameter
+from .cache import get_card_payload, get_list_generation
+from .conditional import conditional_response, make_etag, page_etag, set_validators
+from .exports import CardExporter, start_export_in_background
+from .luhn import MAX_NUMBER_LENGTH, complete_card_numbers, validate_card_numbers
+from .portfolio import PortfolioDeltas, summarize_portfolio
+from .risk import FEATURE_FIELDS, score_rows
+from .services import (
+    CardNumberGenerator, CardDecisionService, CardSearchService, CardTransitionConflict, CardTransitionService
+)
+from .models import CreditCard, CardAuditEvent, CardExportJob
 from .serializers import (
     CreditCardApplicationSerializer,
     CreditCardDetailSerializer,
-    CardStatusUpdateSerializer
+    CreditCardListSerializer,
+    CardStatusUpdateSerializer,
+    CardBulkStatusItemSerializer,
+    CardBulkStatusUpdateSerializer,
+    CardSearchSerializer,
+    CardRiskScoreQuerySerializer,
+    CardRiskScoreSerializer,
+    CardNumberFileSerializer,
+    CardAuditEventSerializer,
+    CardExportJobSerializer
 )
-from .permissions import IsAdminOrManager, IsAdminOrManagerOrOwner
+from .pagination import CardAuditCursorPagination, CardRiskScoreCursorPagination, CreditCardCursorPagination
+from .permissions import IsAdmin, IsAdminOrManager, IsAdminOrManagerOrOwner
 
 
 class CreditCardListCreateView(APIView):
@@ -21,12 +45,35 @@ class CreditCardListCreateView(APIView):
     """
     permission_classes = [IsAuthenticated, IsAdminOrManagerOrOwner]
     parser_classes = (MultiPartParser, JSONParser,)
+    pagination_class = CreditCardCursorPagination
+
+    def filter_queryset(self, queryset, request):
+        """ Apply the optional status/card_type filters, both served by an index """
+        filters = {}
+        for param, choices in (('status', CreditCard.STATUS_CHOICES), ('card_type', CreditCard.CARD_TYPES)):
+            value = request.query_params.get(param)
+            if value is None:
+                continue
+            value = value.upper()
+            if value not in dict(choices):
+                raise ValidationError({param: f'Invalid {param} "{value}"'})
+            filters[param] = value
+        return queryset.filter(**filters)
+
     @extend_schema(
         tags=['Credit Cards'],
         summary='List all credit cards',
-        description='List all credit cards (Admin/Manager) or only user\'s cards',
+        description='List all credit cards (Admin/Manager) or only user\'s cards, cursor paginated by creation date',
+        parameters=[
+            OpenApiParameter('status', str, enum=[choice for choice, _ in CreditCard.STATUS_CHOICES]),
+            OpenApiParameter('card_type', str, enum=[choice for choice, _ in CreditCard.CARD_TYPES]),
+            OpenApiParameter('cursor', str, description='Opaque cursor taken from the next/previous links'),
+            OpenApiParameter('page_size', int, description='Number of cards per page (max 500)'),
+        ],
         responses={
             200: CreditCardDetailSerializer(many=True),
+            304: OpenApiResponse(description='Not modified - If-None-Match matched'),
+            400: OpenApiResponse(description='Bad request - Invalid filter value'),
             401: OpenApiResponse(description='Authentication credentials were not provided'),
             403: OpenApiResponse(description='Permission denied - Not an Admin or Manager'),
         },
@@ -43,8 +90,24 @@ class CreditCardListCreateView(APIView):
         """ List all credit cards (Admin/Manager) or only user's cards """
         user = request.user
         queryset = CreditCard.objects.all() if user.role in ['ADMIN', 'MANAGER'] else CreditCard.objects.filter(user=user)
-        serializer = CreditCardDetailSerializer(queryset, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        queryset = self.filter_queryset(queryset, request)
+
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(CreditCardListSerializer.get_queryset(queryset), request, view=self)
+
+        # The ETag comes from the fetched page, so a 304 skips serializing and rendering without any
+        # further query. Inserts, deletes and writes within the page change its ids or updated_at, and the
+        # links change when the page boundaries move. No Last-Modified is sent: it cannot see a row leaving.
+        etag = page_etag(
+            page, 'cards', 'all' if user.role in ['ADMIN', 'MANAGER'] else user.id, request.get_full_path(),
+            paginator.get_next_link(), paginator.get_previous_link(), get_list_generation()
+        )
+        not_modified = conditional_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+
+        serializer = CreditCardListSerializer(page)
+        return set_validators(paginator.get_paginated_response(serializer.data), etag)
 
     @extend_schema(
         tags=['Credit Cards'],
@@ -75,13 +138,18 @@ class CreditCardListCreateView(APIView):
         serializer.is_valid(raise_exception=True)
 
         try:
+            card_type = serializer.validated_data.get('card_type', 'VISA')
             credit_card = CreditCard(
                 user=request.user,
-                card_type=serializer.validated_data.get('card_type', 'VISA'),
+                # Allocated before the transaction, so the number comes from a committed block
+                card_number=CardNumberGenerator.generate_unique_number(card_type),
+                card_type=card_type,
                 credit_limit=serializer.validated_data.get('credit_limit'),
                 status='PENDING'
             )
-            credit_card.save()
+            with transaction.atomic():
+                credit_card.save()
+                PortfolioDeltas().add(credit_card.status, credit_card.card_type, credit_card.credit_limit).apply()
 
             return Response(CreditCardDetailSerializer(credit_card).data, status=status.HTTP_201_CREATED)
 
@@ -89,6 +157,162 @@ class CreditCardListCreateView(APIView):
             return Response({'error': f'An unexpected error occurred: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class CreditCardSearchView(APIView):
+    """
+    Finds cards by last four digits, BIN or owner email, newest first.
+    (Admin/Manager only)
+    """
+    permission_classes = [IsAuthenticated, IsAdminOrManager]
+    pagination_class = CreditCardCursorPagination
+
+    @extend_schema(
+        tags=['Credit Cards'],
+        summary='Search credit cards',
+        description='Search cards by exact last four digits, exact BIN, exact owner email or owner email prefix '
+                    '(Admin/Manager only). Every lookup is served from an index and results are cursor paginated.',
+        parameters=[
+            OpenApiParameter('last4', str, description='Last four digits of the card number'),
+            OpenApiParameter('bin', str, description='First six digits of the card number'),
+            OpenApiParameter('email', str, description='Owner email, exact match'),
+            OpenApiParameter('email_prefix', str, description='Start of the owner email, at least 3 characters'),
+            OpenApiParameter('cursor', str, description='Opaque cursor taken from the next/previous links'),
+            OpenApiParameter('page_size', int, description='Number of cards per page (max 500)'),
+        ],
+        responses={
+            200: CreditCardDetailSerializer(many=True),
+            400: OpenApiResponse(description='Bad request - Invalid or missing search parameters'),
+            403: OpenApiResponse(description='Permission denied - Not an Admin or Manager'),
+        }
+    )
+    def get(self, request):
+        """ Search credit cards (Admin/Manager Only) """
+        serializer = CardSearchSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+
+        queryset = CardSearchService.search(
+            CreditCard.objects.all(),
+            last4=params.get('last4'),
+            bin_prefix=params.get('bin'),
+            email=params.get('email'),
+            email_prefix=params.get('email_prefix'),
+        )
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(CreditCardListSerializer.get_queryset(queryset), request, view=self)
+        return paginator.get_paginated_response(CreditCardListSerializer(page).data)
+
+
+class CreditCardBatchApplicationView(APIView):
+    """
+    Handles submitting many credit card applications in one request.
+    Valid applications are inserted with a single bulk INSERT.
+    """
+    permission_classes = [IsAuthenticated]
+    parser_classes = (JSONParser,)
+
+    @staticmethod
+    def get_max_batch_size():
+        return int(getattr(settings, 'CARD_BATCH_MAX_SIZE', 100))
+
+    @extend_schema(
+        tags=['Credit Cards'],
+        summary='Submit a batch of credit card applications',
+        description='Submit up to CARD_BATCH_MAX_SIZE applications at once. '
+                    'Every item is validated independently and reported in `results` in request order.',
+        request=CreditCardApplicationSerializer(many=True),
+        responses={
+            201: OpenApiResponse(description='All applications were created'),
+            207: OpenApiResponse(description='Some applications were created, see per-item results'),
+            400: OpenApiResponse(description='Bad request - No application was valid or the batch is malformed'),
+            401: OpenApiResponse(description='Authentication credentials were not provided'),
+        },
+        examples=[
+            OpenApiExample(
+                'Batch Application',
+                summary='Submit two applications',
+                value={'applications': [
+                    {'card_type': 'VISA', 'credit_limit': 5000},
+                    {'card_type': 'AMEX', 'credit_limit': 12000}
+                ]},
+                request_only=True,
+            ),
+        ]
+    )
+    def post(self, request):
+        """ Submit a batch of credit card applications """
+        applications = request.data.get('applications') if isinstance(request.data, dict) else None
+        if not isinstance(applications, list) or not applications:
+            return Response({'error': 'applications must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+        max_batch_size = self.get_max_batch_size()
+        if len(applications) > max_batch_size:
+            return Response({'error': f'A batch may contain at most {max_batch_size} applications'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = CreditCardApplicationSerializer(data=applications, many=True)
+        if serializer.is_valid():
+            item_errors = [{}] * len(applications)
+            validated_items = serializer.validated_data
+        else:
+            # ListSerializer drops all validated data once any item fails, so only the
+            # items without errors are validated again to recover their values
+            item_errors = serializer.errors
+            validated_items = [
+                None if errors else serializer.child.run_validation(item)
+                for item, errors in zip(applications, item_errors)
+            ]
+
+        results = [None] * len(applications)
+        pending = []
+        for index, (item, errors) in enumerate(zip(validated_items, item_errors)):
+            if errors:
+                results[index] = {'index': index, 'success': False, 'errors': errors}
+            else:
+                pending.append((index, item))
+
+        if pending:
+            try:
+                cards = self.create_cards(request.user, [item for _, item in pending])
+            except Exception as e:
+                return Response({'error': f'An unexpected error occurred: {str(e)}'},
+                                status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            for (index, _), card in zip(pending, cards):
+                results[index] = {'index': index, 'success': True, 'data': CreditCardDetailSerializer(card).data}
+
+        created = len(pending)
+        if created == len(applications):
+            response_status = status.HTTP_201_CREATED
+        elif created:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response({'created': created, 'failed': len(applications) - created, 'results': results},
+                        status=response_status)
+
+    def create_cards(self, user, items):
+        """ Assign card numbers in one pass and insert every card with a single bulk_create """
+        numbers = CardNumberGenerator.generate_unique_numbers([item['card_type'] for item in items])
+        cards = [
+            CreditCard(
+                user=user,
+                card_number=number,
+                card_type=item['card_type'],
+                credit_limit=item['credit_limit'],
+                status='PENDING'
+            )
+            for item, number in zip(items, numbers)
+        ]
+        for card in cards:
+            card.clean()
+            card.sync_number_parts()
+        deltas = PortfolioDeltas()
+        for card in cards:
+            deltas.add(card.status, card.card_type, card.credit_limit)
+        with transaction.atomic():
+            cards = CreditCard.objects.bulk_create(cards)
+            deltas.apply()
+        return cards
+
+
 class CreditCardDetailView(APIView):
     """
     Handles retrieving, updating, and deleting a specific credit card.
@@ -117,9 +341,10 @@ class CreditCardDetailView(APIView):
     def get_object(self, pk, user):
         """ Fetch card instance or raise 404 """
         try:
+            queryset = CreditCard.objects.select_related('user', 'approved_by')
             if user.role in ['ADMIN', 'MANAGER']:
-                return CreditCard.objects.get(pk=pk)
-            return CreditCard.objects.get(pk=pk, user=user)
+                return queryset.get(pk=pk)
+            return queryset.get(pk=pk, user=user)
         except CreditCard.DoesNotExist:
             raise Http404
 
@@ -129,26 +354,26 @@ class CreditCardDetailView(APIView):
         description='Retrieve credit card details (Admin/Manager) or user\'s card',
         responses={
             200: CreditCardDetailSerializer,
+            304: OpenApiResponse(description='Not modified - If-None-Match/If-Modified-Since matched'),
             401: OpenApiResponse(description='Authentication credentials were not provided'),
             403: OpenApiResponse(description='Permission denied - Not an Admin or Manager'),
             404: OpenApiResponse(description='Card not found'),
         }
     )
     def get(self, request, pk):
-        """ Retrieve credit card details """
-        try:
-            if request.user.role in ['ADMIN', 'MANAGER']:
-                credit_card = self.get_object(pk, request.user)
-                serializer = CreditCardDetailSerializer(credit_card)
-                return Response(serializer.data, status=status.HTTP_200_OK)
-            else:
-                credit_card = self.get_object(pk, request.user)
-                serializer = CreditCardDetailSerializer(credit_card)
-                return Response(serializer.data, status=status.HTTP_200_OK)
-
-        except Http404:
+        """ Retrieve credit card details, served from the per-card cache """
+        payload = get_card_payload(pk)
+        if payload is None or (request.user.role not in ['ADMIN', 'MANAGER'] and payload['user_id'] != request.user.id):
             return Response({'error': 'Card not found'}, status=status.HTTP_404_NOT_FOUND)
 
+        data = payload['data']
+        last_modified = parse_datetime(data['updated_at'])
+        etag = make_etag('card', pk, data['updated_at'], data['user_email'], data.get('approved_by_email'))
+        not_modified = conditional_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+        return set_validators(Response(data, status=status.HTTP_200_OK), etag, last_modified)
+
     @extend_schema(
         tags=['Credit Cards'],
         summary='Delete credit card application',
@@ -180,6 +405,7 @@ class CreditCardDetailView(APIView):
             return Response({'error': 'Only admin can delete applications'}, status=status.HTTP_403_FORBIDDEN)
 
         credit_card = self.get_object(pk, request.user)
+        # The post_delete receiver takes the card out of the portfolio counters
         credit_card.delete()
         return Response({'message': 'Card deleted successfully'}, status=status.HTTP_204_NO_CONTENT)
 
@@ -195,7 +421,7 @@ class CreditCardStatusUpdateView(APIView):
     def get_object(self, pk):
         """ Fetch credit card instance or raise 404 """
         try:
-            return CreditCard.objects.get(pk=pk)
+            return CreditCard.objects.select_related('user', 'approved_by').get(pk=pk)
         except CreditCard.DoesNotExist:
             raise Http404
 
@@ -206,9 +432,10 @@ class CreditCardStatusUpdateView(APIView):
         request=CardStatusUpdateSerializer,
         responses={
             200: CreditCardDetailSerializer,
-            400: OpenApiResponse(description='Bad request - Invalid data or card not in pending status'),
+            400: OpenApiResponse(description='Bad request - Invalid data'),
             403: OpenApiResponse(description='Permission denied - Not an Admin or Manager'),
             404: OpenApiResponse(description='Card not found'),
+            409: OpenApiResponse(description='Conflict - Card is no longer pending'),
         },
         examples=[
             OpenApiExample('Approve Application', summary='Approve a card application', value={'status': 'APPROVED'}, request_only=True),
@@ -221,25 +448,200 @@ class CreditCardStatusUpdateView(APIView):
         serializer = CardStatusUpdateSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        # if credit_card.status != 'PENDING':
-        #     return Response({'error': 'Only pending applications can be updated', 'current_status': credit_card.status},
-        #                     status=status.HTTP_400_BAD_REQUEST)
-
-        credit_card.status = serializer.validated_data['status']
-
-        if credit_card.status == 'APPROVED':
-            credit_card.approved_by = request.user
-            credit_card.rejection_reason = None
-        elif credit_card.status == 'REJECTED':
-            credit_card.approved_by = None
-            credit_card.rejection_reason = serializer.validated_data.get('rejection_reason')
-
-        credit_card.save()
+        try:
+            CardTransitionService.decide(credit_card, serializer.validated_data['status'], request.user,
+                                         serializer.validated_data.get('rejection_reason'))
+        except CreditCard.DoesNotExist:
+            raise Http404
+        except CardTransitionConflict as conflict:
+            error = ('Card was changed by another request' if conflict.current_status == 'PENDING'
+                     else 'Only pending applications can be updated')
+            return Response({'error': error, 'current_status': conflict.current_status}, status=status.HTTP_409_CONFLICT)
 
         action = 'approved' if credit_card.status == 'APPROVED' else 'rejected'
         return Response({'message': f'Card successfully {action}', 'data': CreditCardDetailSerializer(credit_card).data},
                         status=status.HTTP_200_OK)
 
+
+class CreditCardBulkStatusUpdateView(APIView):
+    """
+    Handles approving or rejecting many credit card applications at once.
+    (Admin/Manager only)
+    """
+    permission_classes = [IsAuthenticated, IsAdminOrManager]
+    parser_classes = (JSONParser,)
+
+    @extend_schema(
+        tags=['Credit Cards'],
+        summary='Bulk approve/reject credit card applications',
+        description='Apply APPROVED/REJECTED decisions to many cards (Admin/Manager only). '
+                    'Each decision follows the same rules as update-status and is reported per id.',
+        request=CardBulkStatusUpdateSerializer,
+        responses={
+            200: OpenApiResponse(description='Every decision was applied'),
+            207: OpenApiResponse(description='Some decisions were applied, see per-id results'),
+            400: OpenApiResponse(description='Bad request - No decision was valid'),
+            403: OpenApiResponse(description='Permission denied - Not an Admin or Manager'),
+        },
+        examples=[
+            OpenApiExample(
+                'Bulk Decisions',
+                summary='Approve one card and reject another',
+                value={'decisions': [
+                    {'id': 1, 'status': 'APPROVED'},
+                    {'id': 2, 'status': 'REJECTED', 'rejection_reason': 'Insufficient credit history'}
+                ]},
+                request_only=True,
+            ),
+        ]
+    )
+    def post(self, request):
+        """ Bulk update credit card statuses (Admin/Manager Only) """
+        serializer = CardBulkStatusUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        results = []
+        decisions = []
+        seen = set()
+        for item in serializer.validated_data['decisions']:
+            decision = CardBulkStatusItemSerializer(data=item)
+            if not decision.is_valid():
+                results.append({'id': item.get('id') if isinstance(item, dict) else None, 'success': False,
+                                'errors': decision.errors})
+            elif decision.validated_data['id'] in seen:
+                results.append({'id': decision.validated_data['id'], 'success': False,
+                                'errors': {'id': ['Duplicate decision for this card']}})
+            else:
+                seen.add(decision.validated_data['id'])
+                decisions.append(decision.validated_data)
+                results.append(None)
+
+        updated, conflicts = CardDecisionService.bulk_update_status(decisions, request.user)
+
+        decision_iter = iter(decisions)
+        for index, result in enumerate(results):
+            if result is not None:
+                continue
+            decision = next(decision_iter)
+            if decision['id'] in updated:
+                results[index] = {'id': decision['id'], 'success': True, 'status': decision['status']}
+            elif decision['id'] in conflicts:
+                results[index] = {'id': decision['id'], 'success': False, 'current_status': conflicts[decision['id']],
+                                  'errors': {'status': ['Only pending applications can be updated']}}
+            else:
+                results[index] = {'id': decision['id'], 'success': False, 'errors': {'id': ['Card not found']}}
+
+        if len(updated) == len(results):
+            response_status = status.HTTP_200_OK
+        elif updated:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response({'updated': len(updated), 'failed': len(results) - len(updated), 'results': results},
+                        status=response_status)
+
+
+class CardAuditLogView(APIView):
+    """
+    Lists the recorded status and credit limit changes of a card, newest first.
+    (Admin/Manager only)
+    """
+    permission_classes = [IsAuthenticated, IsAdminOrManager]
+    pagination_class = CardAuditCursorPagination
+
+    @extend_schema(
+        tags=['Credit Cards'],
+        summary='Credit card change history',
+        description='Status and credit limit changes of a card with who made them and when (Admin/Manager only). '
+                    'Events are written in batches, so the latest change can take about a second to appear. '
+                    'History is kept after the card is deleted.',
+        parameters=[
+            OpenApiParameter('field', str, enum=[choice for choice, _ in CardAuditEvent.FIELD_CHOICES]),
+            OpenApiParameter('cursor', str, description='Opaque cursor taken from the next/previous links'),
+            OpenApiParameter('page_size', int, description='Number of events per page (max 500)'),
+        ],
+        responses={
+            200: CardAuditEventSerializer(many=True),
+            400: OpenApiResponse(description='Bad request - Invalid filter value'),
+            403: OpenApiResponse(description='Permission denied - Not an Admin or Manager'),
+        }
+    )
+    def get(self, request, pk):
+        """ Change history of a credit card (Admin/Manager Only) """
+        queryset = CardAuditEvent.objects.filter(card_id=pk).select_related('changed_by')
+        field = request.query_params.get('field')
+        if field is not None:
+            if field not in dict(CardAuditEvent.FIELD_CHOICES):
+                raise ValidationError({'field': f'Invalid field "{field}"'})
+            queryset = queryset.filter(field=field)
+
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        return paginator.get_paginated_response(CardAuditEventSerializer(page, many=True).data)
+
+
+class CardPortfolioStatsView(APIView):
+    """
+    Portfolio totals by status and card type, read from the incrementally maintained counters.
+    (Admin/Manager only)
+    """
+    permission_classes = [IsAuthenticated, IsAdminOrManager]
+
+    @extend_schema(
+        tags=['Credit Cards'],
+        summary='Card portfolio statistics',
+        description='Card counts and credit limit totals by status and card type (Admin/Manager only)',
+        responses={
+            200: OpenApiResponse(description='Portfolio totals'),
+            403: OpenApiResponse(description='Permission denied - Not an Admin or Manager'),
+        }
+    )
+    def get(self, request):
+        """ Portfolio statistics (Admin/Manager Only) """
+        return Response(summarize_portfolio(), status=status.HTTP_200_OK)
+
+
+class CardRiskScoreView(APIView):
+    """
+    Risk scores and suggested credit limits for cards, scored a page at a time.
+    (Admin/Manager only)
+    """
+    permission_classes = [IsAuthenticated, IsAdminOrManager]
+    pagination_class = CardRiskScoreCursorPagination
+
+    @extend_schema(
+        tags=['Credit Cards'],
+        summary='Card risk scores',
+        description='Risk score (0-1), risk band and suggested credit limit for each card, computed from the requested '
+                    'limit, card type, account age and the applicant\'s other cards (Admin/Manager only). '
+                    'Pending applications by default, newest first, cursor paginated.',
+        parameters=[
+            OpenApiParameter('status', str, description='Card status to score (default PENDING)'),
+            OpenApiParameter('card_type', str, description='Only score cards of this type'),
+            OpenApiParameter('cursor', str, description='Opaque cursor taken from the next/previous links'),
+            OpenApiParameter('page_size', int, description='Number of cards per page (max 5000)'),
+        ],
+        responses={
+            200: CardRiskScoreSerializer(many=True),
+            400: OpenApiResponse(description='Bad request - Invalid status or card type'),
+            403: OpenApiResponse(description='Permission denied - Not an Admin or Manager'),
+        }
+    )
+    def get(self, request):
+        """ Score credit cards (Admin/Manager Only) """
+        serializer = CardRiskScoreQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+
+        queryset = CreditCard.objects.filter(status=params['status'])
+        if 'card_type' in params:
+            queryset = queryset.filter(card_type=params['card_type'])
+        paginator = self.pagination_class()
+        # created_at is read by the paginator to build the cursor
+        page = paginator.paginate_queryset(queryset.values(*FEATURE_FIELDS, 'created_at'), request, view=self)
+        return paginator.get_paginated_response(score_rows(page))
+
+
 class CreditCardLimitUpdateView(APIView):
     """
     Handles updating the credit limit of an approved credit card.
@@ -251,7 +653,7 @@ class CreditCardLimitUpdateView(APIView):
     def get_object(self, pk):
         """ Fetch credit card instance or raise 404 """
         try:
-            return CreditCard.objects.get(pk=pk)
+            return CreditCard.objects.select_related('user', 'approved_by').get(pk=pk)
         except CreditCard.DoesNotExist:
             raise Http404
 
@@ -262,9 +664,10 @@ class CreditCardLimitUpdateView(APIView):
         request=CardStatusUpdateSerializer,
         responses={
             200: CreditCardDetailSerializer,
-            400: OpenApiResponse(description='Bad request - Invalid data or card not approved'),
+            400: OpenApiResponse(description='Bad request - Invalid credit limit'),
             403: OpenApiResponse(description='Permission denied - Not an Admin or Manager'),
             404: OpenApiResponse(description='Card not found'),
+            409: OpenApiResponse(description='Conflict - Card is not approved or was changed by another request'),
         },
         examples=[
             OpenApiExample('Increase Credit Limit', summary='Update credit limit', value={'credit_limit': 10000}, request_only=True),
@@ -278,14 +681,199 @@ class CreditCardLimitUpdateView(APIView):
         if not isinstance(new_credit_limit, (int, float)) or new_credit_limit <= 0:
             return Response({'error': 'Invalid credit limit value'}, status=status.HTTP_400_BAD_REQUEST)
 
-        if credit_card.status != 'APPROVED':
-            return Response({'error': 'Only approved cards can have their limit changed', 'current_status': credit_card.status},
+        try:
+            CardTransitionService.change_limit(credit_card, new_credit_limit, request.user)
+        except CreditCard.DoesNotExist:
+            raise Http404
+        except CardTransitionConflict as conflict:
+            error = ('Credit limit was changed by another request' if conflict.current_status == 'APPROVED'
+                     else 'Only approved cards can have their limit changed')
+            return Response({'error': error, 'current_status': conflict.current_status}, status=status.HTTP_409_CONFLICT)
+
+        return Response({'message': 'Credit limit updated successfully', 'data': CreditCardDetailSerializer(credit_card).data},
+                        status=status.HTTP_200_OK)
+
+
+class CardNumberValidationView(APIView):
+    """
+    Validates, or completes with check digits, an uploaded file of card numbers in one vectorized pass.
+    (Admin only)
+    """
+    permission_classes = [IsAuthenticated, IsAdmin]
+    parser_classes = (MultiPartParser,)
+    max_reported_lines = 1000
+
+    @staticmethod
+    def get_max_rows():
+        return int(getattr(settings, 'CARD_VALIDATION_MAX_ROWS', 5_000_000))
+
+    @extend_schema(
+        tags=['Credit Cards'],
+        summary='Bulk validate card numbers',
+        description='Upload a text file with one card number per line (spaces and dashes are ignored). '
+                    'mode=validate reports Luhn failures by line; mode=complete returns the file with check digits appended. '
+                    '(Admin only)',
+        request={'multipart/form-data': CardNumberFileSerializer},
+        responses={
+            200: OpenApiResponse(description='Validation summary, or the completed numbers as text/plain'),
+            400: OpenApiResponse(description='Bad request - Missing, unreadable or oversized file'),
+            403: OpenApiResponse(description='Permission denied - Not an Admin'),
+        }
+    )
+    def post(self, request):
+        """ Validate or complete an uploaded file of card numbers (Admin only) """
+        serializer = CardNumberFileSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            content = serializer.validated_data['file'].read().decode('utf-8-sig')
+        except UnicodeDecodeError:
+            return Response({'error': 'File must be UTF-8 text'}, status=status.HTTP_400_BAD_REQUEST)
+
+        entries = [
+            (line_number, line.replace(' ', '').replace('-', ''))
+            for line_number, line in enumerate(content.splitlines(), start=1)
+            if line.strip()
+        ]
+        max_rows = self.get_max_rows()
+        if len(entries) > max_rows:
+            return Response({'error': f'A file may contain at most {max_rows} card numbers'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        # Payloads to complete still need room for their check digit
+        completing = serializer.validated_data['mode'] == 'complete'
+        max_length = MAX_NUMBER_LENGTH - 1 if completing else MAX_NUMBER_LENGTH
+        too_long = next((line_number for line_number, number in entries if len(number) > max_length), None)
+        if too_long is not None:
+            return Response({'error': f'Line {too_long} is longer than {max_length} digits'},
                             status=status.HTTP_400_BAD_REQUEST)
+        numbers = [number for _, number in entries]
 
-        credit_card.credit_limit = new_credit_limit
-        credit_card.save()
+        if completing:
+            completed = complete_card_numbers(numbers)
+            body = ''.join(f"{number if number is not None else ''}\n" for number in completed)
+            response = HttpResponse(body, content_type='text/plain; charset=utf-8')
+            response['Content-Disposition'] = 'attachment; filename="completed-card-numbers.txt"'
+            return response
 
-        return Response({'message': 'Credit limit updated successfully', 'data': CreditCardDetailSerializer(credit_card).data},
+        valid = validate_card_numbers(numbers)
+        invalid_positions = (~valid).nonzero()[0]
+        invalid_lines = [
+            # Only the last four digits are echoed back
+            {'line': entries[position][0], 'last4': entries[position][1][-4:]}
+            for position in invalid_positions[:self.max_reported_lines].tolist()
+        ]
+        return Response({
+            'total': len(numbers),
+            'valid': len(numbers) - len(invalid_positions),
+            'invalid': len(invalid_positions),
+            'invalid_lines': invalid_lines,
+            'invalid_lines_truncated': len(invalid_positions) > self.max_reported_lines,
+        }, status=status.HTTP_200_OK)
+
+
+class CardExportListCreateView(APIView):
+    """
+    Starts a background export of all credit cards and lists previous exports.
+    (Admin only)
+    """
+    permission_classes = [IsAuthenticated, IsAdmin]
+    parser_classes = (JSONParser, MultiPartParser,)
+
+    @extend_schema(
+        tags=['Card Exports'],
+        summary='List card exports',
+        description='List card export jobs, newest first (Admin only)',
+        responses={
+            200: CardExportJobSerializer(many=True),
+            403: OpenApiResponse(description='Permission denied - Not an Admin'),
+        }
+    )
+    def get(self, request):
+        """ List export jobs (Admin only) """
+        jobs = CardExportJob.objects.select_related('requested_by')[:50]
+        return Response(CardExportJobSerializer(jobs, many=True, context={'request': request}).data,
                         status=status.HTTP_200_OK)
 
+    @extend_schema(
+        tags=['Card Exports'],
+        summary='Start a card export',
+        description='Start a background export of every credit card to a gzip-compressed NDJSON or CSV file (Admin only)',
+        request=CardExportJobSerializer,
+        responses={
+            202: CardExportJobSerializer,
+            400: OpenApiResponse(description='Bad request - Invalid export format'),
+            403: OpenApiResponse(description='Permission denied - Not an Admin'),
+        },
+        examples=[
+            OpenApiExample('NDJSON Export', summary='Export cards as NDJSON', value={'export_format': 'NDJSON'}, request_only=True),
+            OpenApiExample('CSV Export', summary='Export cards as CSV', value={'export_format': 'CSV'}, request_only=True),
+        ]
+    )
+    def post(self, request):
+        """ Start a new export job (Admin only) """
+        serializer = CardExportJobSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job = serializer.save(requested_by=request.user)
+
+        transaction.on_commit(lambda: start_export_in_background(job))
+        return Response(CardExportJobSerializer(job, context={'request': request}).data,
+                        status=status.HTTP_202_ACCEPTED)
+
+
+class CardExportDetailView(APIView):
+    """
+    Reports the progress of a card export job.
+    (Admin only)
+    """
+    permission_classes = [IsAuthenticated, IsAdmin]
+
+    @extend_schema(
+        tags=['Card Exports'],
+        summary='Get card export progress',
+        description='Get the status, progress and download link of a card export job (Admin only)',
+        responses={
+            200: CardExportJobSerializer,
+            403: OpenApiResponse(description='Permission denied - Not an Admin'),
+            404: OpenApiResponse(description='Export not found'),
+        }
+    )
+    def get(self, request, pk):
+        """ Poll export progress (Admin only) """
+        try:
+            job = CardExportJob.objects.select_related('requested_by').get(pk=pk)
+        except CardExportJob.DoesNotExist:
+            return Response({'error': 'Export not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(CardExportJobSerializer(job, context={'request': request}).data, status=status.HTTP_200_OK)
+
+
+class CardExportDownloadView(APIView):
+    """
+    Streams the file of a completed card export.
+    (Admin only)
+    """
+    permission_classes = [IsAuthenticated, IsAdmin]
 
+    @extend_schema(
+        tags=['Card Exports'],
+        summary='Download a card export',
+        description='Download the gzip-compressed file of a completed card export (Admin only)',
+        responses={
+            (200, 'application/gzip'): OpenApiTypes.BINARY,
+            403: OpenApiResponse(description='Permission denied - Not an Admin'),
+            404: OpenApiResponse(description='Export not found or not completed'),
+        }
+    )
+    def get(self, request, pk):
+        """ Download a completed export (Admin only) """
+        job = CardExportJob.objects.filter(pk=pk, status='COMPLETED').exclude(file_path='').first()
+        if job is None:
+            return Response({'error': 'Export not found'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            export_file = open(CardExporter.absolute_path(job), 'rb')
+        except FileNotFoundError:
+            return Response({'error': 'Export file no longer exists'}, status=status.HTTP_404_NOT_FOUND)
+        # FileResponse streams the file in blocks and closes it when the response is done
+        return FileResponse(
+            export_file, as_attachment=True, filename=f'cards-{job.pk}.{CardExporter.extension(job)}',
+            content_type='application/gzip'
+        )
@@ -0,0 +1,68 @@
+"""
+Cache read paths written once and run by both the sync and the async views.
+
+A read path is a generator that yields the operations it needs as tuples and receives
+their results back:
+
+    ('get', key), ('add', key, value, timeout), ('set', key, value, timeout), ('delete', key)
+        cache calls, run as cache.get() ... or through the async API as cache.aget() ...
+    ('load', *args)
+        the database read, done by the load function handed to run() / arun()
+    ('sleep', seconds)
+        time.sleep() or asyncio.sleep()
+
+Exceptions raised by an operation are thrown back into the generator at the same point.
+"""
+import asyncio
+import time
+
+from django.core.cache import cache
+
+
+def versioned(key):
+    """ Read path of a version key: its value, created as a new unique value when missing """
+    version = yield ('get', key)
+    if version is None:
+        yield ('add', key, time.time_ns(), None)
+        version = yield ('get', key)
+    return version
+
+
+def run(steps, load=None):
+    """ Run a read path with the synchronous cache API """
+    result, error = None, None
+    while True:
+        try:
+            operation, *args = steps.throw(error) if error is not None else steps.send(result)
+        except StopIteration as stop:
+            return stop.value
+        result, error = None, None
+        try:
+            if operation == 'load':
+                result = load(*args)
+            elif operation == 'sleep':
+                time.sleep(*args)
+            else:
+                result = getattr(cache, operation)(*args)
+        except Exception as e:
+            error = e
+
+
+async def arun(steps, aload=None):
+    """ Run a read path with the async cache API and an async load function """
+    result, error = None, None
+    while True:
+        try:
+            operation, *args = steps.throw(error) if error is not None else steps.send(result)
+        except StopIteration as stop:
+            return stop.value
+        result, error = None, None
+        try:
+            if operation == 'load':
+                result = await aload(*args)
+            elif operation == 'sleep':
+                await asyncio.sleep(*args)
+            else:
+                result = await getattr(cache, f'a{operation}')(*args)
+        except Exception as e:
+            error = e
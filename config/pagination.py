@@ -0,0 +1,43 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Admin changelist paginator that never runs an unbounded COUNT(*).
+
+    The count is exact up to exact_count_limit rows, counted over a LIMITed subquery. Past
+    that an unfiltered table is sized from the planner statistics (PostgreSQL) or the
+    highest primary key (SQLite), so the first page of a large changelist costs no scan;
+    filtered results past the limit fall back to the real count, which the filter's index serves.
+    """
+    exact_count_limit = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        bounded = queryset.order_by()[:self.exact_count_limit + 1].count()
+        if bounded <= self.exact_count_limit:
+            return bounded
+        if not queryset.query.where:
+            estimate = estimate_table_rows(queryset)
+            if estimate is not None:
+                return max(estimate, bounded)
+        return queryset.count()
+
+
+def estimate_table_rows(queryset):
+    """ Approximate row count of the queryset's table without scanning it, or None """
+    model = queryset.model
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [model._meta.db_table])
+            row = cursor.fetchone()
+        # reltuples is -1 until the table has been vacuumed or analyzed
+        return int(row[0]) if row and row[0] >= 0 else None
+    if connection.vendor == 'sqlite' and model._meta.pk.get_internal_type() in ('AutoField', 'BigAutoField'):
+        # Reads the last entry of the rowid B-tree; overcounts by the number of deleted rows
+        return model._default_manager.using(queryset.db).order_by('-pk').values_list('pk', flat=True).first()
+    return None
@@ -34,6 +34,7 @@ INSTALLED_APPS = [
     'rest_framework',
     'drf_spectacular',
     'rest_framework_simplejwt',
+    'rest_framework_simplejwt.token_blacklist',
 
 
     'users',
@@ -42,7 +43,7 @@ INSTALLED_APPS = [
 # REST framework configuration
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "users.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
@@ -59,8 +60,16 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(days=15),
     "ROTATE_REFRESH_TOKENS": True,
     "BLACKLIST_AFTER_ROTATION": True,
+    "TOKEN_REFRESH_SERIALIZER": "users.serializers.TokenRefreshSerializer",
 }
 
+# Bloom filter of blacklisted refresh tokens kept by every process (users/blacklist.py):
+# sized for this many tokens blacklisted within REFRESH_TOKEN_LIFETIME at this false positive rate
+TOKEN_BLACKLIST_FILTER_CAPACITY = int(os.getenv('TOKEN_BLACKLIST_FILTER_CAPACITY', 1000000))
+TOKEN_BLACKLIST_FILTER_ERROR_RATE = float(os.getenv('TOKEN_BLACKLIST_FILTER_ERROR_RATE', 0.001))
+# How often every process adds tokens blacklisted by rotations elsewhere to its filter
+TOKEN_BLACKLIST_SYNC_INTERVAL = float(os.getenv('TOKEN_BLACKLIST_SYNC_INTERVAL', 30))
+
 # DRF Spectacular configuration
 SPECTACULAR_SETTINGS = {
     "TITLE": "Credit Card Backend API",
@@ -123,9 +132,68 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Local memory by default; point CACHE_BACKEND/CACHE_LOCATION at a shared cache (e.g. Redis) in production
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'cred-backend'),
+    },
+    # Email verification codes. Entries must survive until they expire, so nothing else is stored here;
+    # in production point it at a shared cache that does not evict (e.g. Redis with maxmemory-policy noeviction)
+    'otp': {
+        'BACKEND': os.getenv('OTP_CACHE_BACKEND', os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache')),
+        'LOCATION': os.getenv('OTP_CACHE_LOCATION', 'cred-backend-otp'),
+    },
+}
+if CACHES['otp']['BACKEND'].endswith('.LocMemCache'):
+    # Local memory culls a third of its entries once it holds MAX_ENTRIES (300 by default)
+    CACHES['otp']['OPTIONS'] = {'MAX_ENTRIES': 10_000_000}
+OTP_CACHE_ALIAS = 'otp'
+CARD_CACHE_TIMEOUT = int(os.getenv('CARD_CACHE_TIMEOUT', 300))
+
+# Users resolved from JWTs: shared cache entry lifetime, plus a per-process LRU whose TTL
+# bounds how long another process may keep using a user after it changed
+AUTH_USER_CACHE_TIMEOUT = int(os.getenv('AUTH_USER_CACHE_TIMEOUT', 300))
+AUTH_USER_LOCAL_CACHE_TTL = float(os.getenv('AUTH_USER_LOCAL_CACHE_TTL', 5))
+AUTH_USER_LOCAL_CACHE_SIZE = int(os.getenv('AUTH_USER_LOCAL_CACHE_SIZE', 10000))
+
+# Serve the read endpoints with native async views; config/asgi.py turns this on for ASGI deployments
+ASYNC_READ_VIEWS = os.getenv('ASYNC_READ_VIEWS', 'False').lower() == 'true'
+
+# Card audit events are buffered per process and written in batches by a background thread
+# and at interpreter exit; a killed worker loses up to CARD_AUDIT_FLUSH_INTERVAL seconds of them
+CARD_AUDIT_ASYNC = os.getenv('CARD_AUDIT_ASYNC', 'True').lower() == 'true'
+CARD_AUDIT_BATCH_SIZE = int(os.getenv('CARD_AUDIT_BATCH_SIZE', 500))
+CARD_AUDIT_FLUSH_INTERVAL = float(os.getenv('CARD_AUDIT_FLUSH_INTERVAL', 1.0))
+
+# Rules applied by the auto_decide_cards worker; anything they do not cover waits for a manager
+CARD_AUTO_DECISION_RULES = {
+    # Highest credit limit approved without review, per card type
+    'APPROVE_MAX_LIMIT': {'VISA': 5000, 'MASTERCARD': 5000, 'AMEX': 3000},
+    # Applicant roles eligible for automatic approval
+    'APPROVE_ROLES': ['USER', 'EMPLOYEE'],
+    # Approve only while the applicant holds fewer approved cards than this
+    'APPROVE_MAX_CARDS': 2,
+    # Reject once the applicant holds this many approved cards; None never rejects automatically
+    'REJECT_AT_CARDS': 5,
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
+# Passwords are checked and hashed in a process pool (users/hashing.py) instead of on request threads
+AUTHENTICATION_BACKENDS = ['users.backends.HashingModelBackend']
+
+# Worker processes per web process (0 hashes inline), jobs admitted at once, and seconds a
+# request waits for its job; past the last two limits login and registration answer 503
+PASSWORD_HASHING_WORKERS = int(os.getenv('PASSWORD_HASHING_WORKERS', min(4, os.cpu_count() or 1)))
+PASSWORD_HASHING_MAX_PENDING = int(os.getenv('PASSWORD_HASHING_MAX_PENDING', 8 * max(PASSWORD_HASHING_WORKERS, 1)))
+PASSWORD_HASHING_TIMEOUT = float(os.getenv('PASSWORD_HASHING_TIMEOUT', 5))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -162,17 +230,40 @@ MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 STATIC_ROOT = BASE_DIR / "staticfiles"
 
+# Card exports are written here, outside MEDIA_ROOT, and only downloaded through the admin-only export view.
+# A RUNNING export whose worker has not checkpointed for CARD_EXPORT_LEASE seconds can be resumed.
+CARD_EXPORT_ROOT = os.getenv("CARD_EXPORT_ROOT", BASE_DIR / "exports")
+CARD_EXPORT_LEASE = int(os.getenv("CARD_EXPORT_LEASE", 10 * 60))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 ACCOUNT_EMAIL_VERIFICATION = "mandatory"
 OTP_EXPIRATION_TIME = 5
+# Wrong codes after which an OTP is discarded, and resends allowed per cooldown window (seconds)
+OTP_MAX_ATTEMPTS = 5
+OTP_RESEND_LIMIT = 3
+OTP_RESEND_COOLDOWN = 2 * 60 * 60
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Email configuration
-EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+# Persistent SMTP sessions shared per process; set EMAIL_BACKEND to django.core.mail.backends.smtp.EmailBackend to connect per send
+EMAIL_BACKEND = os.getenv("EMAIL_BACKEND", "users.smtp_pool.PooledSMTPBackend")
 EMAIL_HOST = os.getenv("EMAIL_HOST", "smtp.gmail.com")
 EMAIL_PORT = int(os.getenv("EMAIL_PORT", 587))
 EMAIL_USE_TLS = os.getenv("EMAIL_USE_TLS", "True").lower() == "true"
 EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER")
 EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD")
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
+
+# Account emails are queued in the users.OutboundEmail outbox and delivered by `manage.py dispatch_emails`
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', 5))
+# Seconds before the first retry; doubles with every failed attempt
+EMAIL_OUTBOX_RETRY_DELAY = float(os.getenv('EMAIL_OUTBOX_RETRY_DELAY', 30))
+# Seconds a dispatcher may hold a claimed message before another dispatcher picks it up
+EMAIL_OUTBOX_LEASE = float(os.getenv('EMAIL_OUTBOX_LEASE', 300))
+# PooledSMTPBackend: open sessions per process, seconds to wait for a free one, seconds an idle session
+# is kept, and messages sent over one session before it is renewed
+EMAIL_POOL_SIZE = int(os.getenv('EMAIL_POOL_SIZE', 4))
+EMAIL_POOL_TIMEOUT = float(os.getenv('EMAIL_POOL_TIMEOUT', 30))
+EMAIL_POOL_MAX_IDLE = float(os.getenv('EMAIL_POOL_MAX_IDLE', 60))
+EMAIL_POOL_MAX_MESSAGES = int(os.getenv('EMAIL_POOL_MAX_MESSAGES', 100))
@@ -1,16 +1,49 @@
+from config.pagination import EstimatedCountPaginator
 from django.contrib import admin
-
-from users.models import CustomUser
+from users.models import CustomUser, OutboundEmail
+from users.utils import prefix_range
 
 admin.site.site_header = "Credit Card Admin"
 admin.site.site_title = "Credit Card Admin"
 admin.site.index_title = "Welcome to Credit Card Admin"
 
+
 # Register your models here.
 @admin.register(CustomUser)
 class CustomUserAdmin(admin.ModelAdmin):
     list_display = ['email', 'role']
-    list_filter = ['role', 'email']
+    # An 'email' filter would list every user in the sidebar; search covers it
+    list_filter = ['role', 'is_active']
     list_editable = ['role']
+    # Deterministic order from the unique email index, also used by the autocomplete endpoint
+    ordering = ['email']
+    # Routed to indexed lookups by get_search_results; also backs the card admin's user autocomplete
     search_fields = ['email', 'role']
+    search_help_text = 'Email, the start of an email, or a role'
     readonly_fields = ['date_joined', 'last_login']
+    # Served by user_date_joined_idx
+    date_hierarchy = 'date_joined'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+
+    def get_search_results(self, request, queryset, search_term):
+        # The default search is LIKE '%term%' on email and role, which no index can serve
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        if term.upper() in dict(CustomUser.ROLES):
+            return queryset.filter(role=term.upper()), False
+        if '@' in term:
+            return queryset.filter(email=CustomUser.objects.normalize_email(term)), False
+        lower_bound, upper_bound = prefix_range(term)
+        return queryset.filter(email__gte=lower_bound, email__lt=upper_bound), False
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'recipients', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at']
+    list_filter = ['status']
+    readonly_fields = ['attempts', 'claim_token', 'last_error', 'created_at', 'sent_at']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
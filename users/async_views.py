@@ -0,0 +1,44 @@
+from django.contrib.auth import get_user_model
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.permissions import IsAuthenticated
+
+from cards.async_api import AsyncAPIView, render
+from cards.conditional import conditional_response, make_etag, set_validators
+from cards.pagination import apaginate_queryset
+from cards.permissions import IsAdminOrManager
+from .serializers import UserListSerializer
+
+User = get_user_model()
+
+
+class AsyncUserInfoView(AsyncAPIView):
+    """ Native async implementation of UserInfoFromTokenAPI.get """
+
+    async def get(self, request):
+        user = request.user
+        etag = make_etag('user-info', user.id, user.first_name, user.last_name, user.email,
+                         user.profile_picture.name, user.role)
+        not_modified = conditional_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+
+        user_data = {
+            "id": user.id,
+            "first_name": user.first_name,
+            "last_name": user.last_name,
+            "email": user.email,
+            "dp": user.profile_picture.url if user.profile_picture else None,
+            'role': user.role
+        }
+        return set_validators(render(user_data), etag)
+
+
+class AsyncUserListView(AsyncAPIView):
+    """ Native async implementation of UserList.get """
+    permission_classes = [IsAuthenticated, IsAdminOrManager]
+    pagination_class = PageNumberPagination
+
+    async def get(self, request):
+        paginator = self.pagination_class()
+        page = await apaginate_queryset(paginator, User.objects.all().order_by('pk'), request, view=self)
+        return render(paginator.get_paginated_response(UserListSerializer(page, many=True).data).data)
@@ -0,0 +1,33 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from . import hashing
+
+
+class HashingModelBackend(ModelBackend):
+    """
+    ModelBackend that checks passwords in the hashing executor, so logins queue for the
+    process pool instead of holding a request thread (and the GIL) for the whole hash.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Hash anyway, so unknown emails take as long as wrong passwords (Django #20760)
+            hashing.make_password(password)
+            return None
+
+        is_correct, must_update = hashing.check_password(password, user.password)
+        if not is_correct or not self.user_can_authenticate(user):
+            return None
+        if must_update:
+            # Stored with an outdated hasher or work factor; upgrade it now that the raw password is known
+            hashing.set_password(user, password)
+            user.save(update_fields=['password'])
+        return user
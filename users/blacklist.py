@@ -0,0 +1,216 @@
+"""
+Refresh token blacklist with a Bloom filter in front of the BlacklistedToken table.
+
+Every refresh request has to prove its token was not rotated away already. Almost all
+tokens presented are live ones, so each process keeps a Bloom filter of the jtis
+blacklisted within the refresh lifetime: a miss means "not blacklisted" and skips the
+database; only hits (real or false positive) run the exists() query.
+
+Filters resync from the rows blacklisted since their last sync every
+TOKEN_BLACKLIST_SYNC_INTERVAL seconds. Rotation does not need them to be current: the
+unique blacklist row of the old token makes a second rotation of it fail. Blacklistings
+made any other way (admin, scripts) bump a generation counter in the shared cache on
+commit, and every process resyncs on its next check.
+"""
+import hashlib
+import math
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+GENERATION_KEY = 'users:blacklist:generation'
+
+# Rows blacklisted this long before a sync are read again by the next one, so a
+# transaction that committed late is never skipped
+SYNC_OVERLAP = timedelta(minutes=1)
+
+
+def get_capacity():
+    return int(getattr(settings, 'TOKEN_BLACKLIST_FILTER_CAPACITY', 1000000))
+
+
+def get_error_rate():
+    return float(getattr(settings, 'TOKEN_BLACKLIST_FILTER_ERROR_RATE', 0.001))
+
+
+def get_sync_interval():
+    return float(getattr(settings, 'TOKEN_BLACKLIST_SYNC_INTERVAL', 30))
+
+
+class BloomFilter:
+    """ Set membership without false negatives, sized for `capacity` items at `error_rate` """
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def positions(self, item):
+        # Double hashing: two 64-bit halves of one digest give every position
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(first + index * second) % self.size for index in range(self.hashes)]
+
+    def add(self, item):
+        """ Set the item's bits; returns whether any was unset, i.e. whether the item is new """
+        added = False
+        for position in self.positions(item):
+            mask = 1 << (position & 7)
+            if not self.bits[position >> 3] & mask:
+                self.bits[position >> 3] |= mask
+                added = True
+        # Only new items count towards the capacity; re-adding rows read by an overlapping sync does not
+        self.count += added
+        return added
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.positions(item))
+
+
+class BlacklistFilter:
+    """
+    Per-process Bloom filter of blacklisted jtis, kept in step with the database.
+
+    A full rebuild (the first one, or once the filter reached its capacity) reads every
+    unexpired row, so it runs without holding the lock: meanwhile other requests keep
+    using the old filter, or the database while there is none yet, and the new filter is
+    swapped in when it is complete.
+    """
+
+    def __init__(self):
+        self.bloom = None
+        self.generation = None
+        self.synced_at = None
+        self.next_sync = 0.0
+        self.rebuilding = False
+        self._lock = threading.Lock()
+
+    def might_contain(self, jti):
+        self.sync()
+        bloom = self.bloom
+        # No filter until the first build completes, so every token is checked in the database
+        return bloom is None or jti in bloom
+
+    def add(self, jti):
+        with self._lock:
+            if self.bloom is not None:
+                self.bloom.add(jti)
+
+    def is_current(self, generation):
+        return self.bloom is not None and generation == self.generation and time.monotonic() < self.next_sync
+
+    def sync(self):
+        generation = cache.get(GENERATION_KEY)
+        if self.is_current(generation):
+            return
+        with self._lock:
+            if self.is_current(generation):
+                return
+            rebuild = not self.rebuilding and (self.bloom is None or self.bloom.count >= self.bloom.capacity)
+            if rebuild:
+                self.rebuilding = True
+            elif self.bloom is not None:
+                now = timezone.now()
+                rows = BlacklistedToken.objects.filter(blacklisted_at__gte=self.synced_at - SYNC_OVERLAP)
+                for jti in rows.values_list('token__jti', flat=True).iterator(chunk_size=10000):
+                    self.bloom.add(jti)
+                self.synced(generation, now)
+        if rebuild:
+            self.rebuild(generation)
+
+    def rebuild(self, generation):
+        """ Build a filter of the unexpired rows only, since Bloom filters cannot forget, and swap it in """
+        try:
+            now = timezone.now()
+            bloom = BloomFilter(get_capacity(), get_error_rate())
+            rows = BlacklistedToken.objects.filter(token__expires_at__gt=now)
+            for jti in rows.values_list('token__jti', flat=True).iterator(chunk_size=10000):
+                bloom.add(jti)
+        finally:
+            with self._lock:
+                self.rebuilding = False
+        with self._lock:
+            # Rows blacklisted during the build are read by the next incremental sync, which starts at `now`
+            self.bloom = bloom
+            self.synced(generation, now)
+
+    def synced(self, generation, synced_at):
+        self.generation = generation
+        self.synced_at = synced_at
+        self.next_sync = time.monotonic() + get_sync_interval()
+
+    def clear(self):
+        with self._lock:
+            self.bloom = None
+
+
+blacklist_filter = BlacklistFilter()
+
+
+def bump_generation():
+    """ Make every process resync its filter; called once a blacklisting outside rotation has committed """
+    cache.add(GENERATION_KEY, 0, timeout=None)
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        # Evicted in between; a missing generation also differs from every process's copy
+        pass
+
+
+class RotatingRefreshToken(RefreshToken):
+    """ RefreshToken checked against blacklist_filter and rotated with a fixed number of statements """
+
+    def check_blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        if blacklist_filter.might_contain(jti) and BlacklistedToken.objects.filter(token__jti=jti).exists():
+            raise TokenError(_("Token is blacklisted"))
+
+    def outstanding(self):
+        """ Unsaved OutstandingToken row for this token """
+        return OutstandingToken(
+            user_id=self.payload.get(api_settings.USER_ID_CLAIM),
+            jti=self.payload[api_settings.JTI_CLAIM],
+            token=str(self),
+            created_at=self.current_time,
+            expires_at=datetime_from_epoch(self.payload['exp']),
+        )
+
+    def rotate(self, blacklist=True):
+        """
+        Turn this token into its replacement, blacklisting the old jti first if asked.
+        The outstanding rows of both tokens go in with one bulk INSERT (the old one is
+        usually there already from login), then the blacklist row. If another request
+        rotated the same token first, its blacklist row exists and this fails with TokenError.
+        """
+        old = self.outstanding()
+        self.set_jti()
+        self.set_exp()
+        self.set_iat()
+
+        with transaction.atomic():
+            OutstandingToken.objects.bulk_create([old, self.outstanding()] if blacklist else [self.outstanding()],
+                                                 ignore_conflicts=True)
+            if blacklist:
+                token_id = OutstandingToken.objects.filter(jti=old.jti).values_list('id', flat=True).get()
+                try:
+                    with transaction.atomic():
+                        # bulk_create sends no post_save, so rotations do not make every process resync
+                        BlacklistedToken.objects.bulk_create([BlacklistedToken(token_id=token_id)])
+                except IntegrityError:
+                    raise TokenError(_("Token is blacklisted"))
+        if blacklist:
+            blacklist_filter.add(old.jti)
+        return self
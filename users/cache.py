@@ -0,0 +1,134 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework_simplejwt.settings import api_settings
+
+from config.cache_steps import arun, run, versioned
+
+
+def get_timeout():
+    return int(getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 300))
+
+
+def get_local_ttl():
+    return float(getattr(settings, 'AUTH_USER_LOCAL_CACHE_TTL', 5))
+
+
+def get_local_size():
+    return int(getattr(settings, 'AUTH_USER_LOCAL_CACHE_SIZE', 10000))
+
+
+def version_key(user_id):
+    return f'users:auth:{user_id}:version'
+
+
+def get_version(user_id):
+    """ Cache generation of a user; invalidation deletes it, so entries built before a write become unreachable """
+    return run(versioned(version_key(user_id)))
+
+
+class LocalUserCache:
+    """
+    Per-process LRU of authenticated users, each entry kept for AUTH_USER_LOCAL_CACHE_TTL
+    seconds. Every discard() bumps an epoch, and an entry loaded before the latest discard
+    is not stored, so a load racing with an invalidation cannot bring the old row back.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.epoch = 0
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return entry[1]
+
+    def set(self, user_id, user, epoch):
+        with self._lock:
+            if epoch != self.epoch:
+                return
+            self._entries[user_id] = (time.monotonic() + get_local_ttl(), user)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > get_local_size():
+                self._entries.popitem(last=False)
+
+    def discard(self, user_id):
+        with self._lock:
+            self.epoch += 1
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self.epoch += 1
+            self._entries.clear()
+
+
+local_users = LocalUserCache()
+
+
+def load_user(user_id):
+    return get_user_model().objects.get(**{api_settings.USER_ID_FIELD: user_id})
+
+
+async def aload_user(user_id):
+    return await get_user_model().objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+
+
+def auth_user_steps(user_id):
+    """ Read path shared by get_auth_user and aget_auth_user, see config.cache_steps """
+    user = local_users.get(user_id)
+    if user is None:
+        # Taken before any database read, so an invalidation racing with the load wins
+        epoch = local_users.epoch
+        version = yield from versioned(version_key(user_id))
+        key = f'users:auth:{user_id}:{version}'
+        user = yield ('get', key)
+        if user is None:
+            user = yield ('load', user_id)
+            yield ('set', key, user, get_timeout())
+        local_users.set(user_id, user, epoch)
+    return copy.copy(user)
+
+
+def get_auth_user(user_id):
+    """
+    Read-through cache for the user a token's USER_ID_CLAIM names: the process-local LRU
+    first, then the shared cache, then the database. Raises DoesNotExist like .get().
+
+    Other processes may keep serving a changed user from their local LRU for up to
+    AUTH_USER_LOCAL_CACHE_TTL seconds; the shared entry is invalidated on commit.
+    Each caller gets its own copy, so changes a view makes to request.user stay local.
+    """
+    return run(auth_user_steps(user_id), load_user)
+
+
+async def aget_auth_user(user_id):
+    """ get_auth_user for the async views, through the async cache API and ORM """
+    return await arun(auth_user_steps(user_id), aload_user)
+
+
+def invalidate_user(user_id):
+    """
+    Drop the cached user now in this process and everywhere once the transaction commits.
+    user_id is the value of SIMPLE_JWT's USER_ID_FIELD; call it after QuerySet.update() on users.
+    """
+    local_users.discard(user_id)
+
+    def drop():
+        cache.delete(version_key(user_id))
+        local_users.discard(user_id)
+
+    transaction.on_commit(drop)
@@ -0,0 +1,66 @@
+"""
+System checks for the caches that hold state other processes depend on.
+
+Local memory and dummy caches are fine for one development server, but with several
+worker processes OTPs stored by one would never verify in another, and the card, user
+and blacklist invalidations one process makes would never reach the others.
+`manage.py check --deploy` refuses them; a deployment that really runs a single process
+can add the check id to SILENCED_SYSTEM_CHECKS.
+"""
+from django.conf import settings
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Error, Tags, register
+from django.utils.module_loading import import_string
+
+
+def shared_cache_aliases():
+    """ (alias, what breaks if it is not shared) for every cache that must be shared between processes """
+    aliases = [(
+        'default',
+        'Cached cards and JWT users invalidated by one process stay cached in the others, '
+        'and token blacklist generations are not shared.'
+    )]
+    if getattr(settings, 'ACCOUNT_EMAIL_VERIFICATION', None) == 'mandatory':
+        aliases.append((getattr(settings, 'OTP_CACHE_ALIAS', 'default'),
+                        'OTPs issued by one process cannot be verified by another.'))
+    return aliases
+
+
+def backend_class(alias):
+    try:
+        return import_string(settings.CACHES[alias]['BACKEND'])
+    except (KeyError, ImportError):
+        # Reported by Django's own cache checks
+        return None
+
+
+@register(Tags.caches)
+def check_otp_cache(app_configs, **kwargs):
+    if getattr(settings, 'ACCOUNT_EMAIL_VERIFICATION', None) != 'mandatory':
+        return []
+    alias = getattr(settings, 'OTP_CACHE_ALIAS', 'default')
+    if alias not in settings.CACHES:
+        return [Error(f"OTP_CACHE_ALIAS '{alias}' is not configured in CACHES.", id='users.E001')]
+    backend = backend_class(alias)
+    if backend is not None and issubclass(backend, DummyCache):
+        return [Error(
+            f"The '{alias}' cache holds OTPs but uses DummyCache, so no account can verify its email.",
+            hint='Configure a real cache backend or turn off mandatory ACCOUNT_EMAIL_VERIFICATION.',
+            id='users.E002',
+        )]
+    return []
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_caches(app_configs, **kwargs):
+    errors = []
+    for alias, consequence in shared_cache_aliases():
+        backend = backend_class(alias)
+        if backend is not None and issubclass(backend, (LocMemCache, DummyCache)):
+            errors.append(Error(
+                f"The '{alias}' cache uses {backend.__name__}, which is not shared between processes. {consequence}",
+                hint='Use a shared cache such as Redis, or silence users.E003 if only one process serves requests.',
+                id='users.E003',
+            ))
+    return errors
@@ -0,0 +1,162 @@
+"""
+Password hashing off the request threads.
+
+PBKDF2 and the other password hashers are pure CPU work that holds the GIL, so during a
+login spike a few hashes occupy every thread of a worker. PasswordHashingExecutor runs
+them in a small process pool instead. It admits at most PASSWORD_HASHING_MAX_PENDING
+jobs at a time and waits PASSWORD_HASHING_TIMEOUT seconds for each; past either limit
+the request fails fast with 503 instead of queueing behind the spike.
+
+Hasher instances are resolved in the calling process and shipped with each job, so
+workers need no Django settings and always follow the caller's PASSWORD_HASHERS.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher, identify_hasher, is_password_usable
+from django.contrib.auth.hashers import make_password as make_password_inline
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+def get_workers():
+    return int(getattr(settings, 'PASSWORD_HASHING_WORKERS', min(4, os.cpu_count() or 1)))
+
+
+def get_max_pending():
+    return int(getattr(settings, 'PASSWORD_HASHING_MAX_PENDING', 8 * max(get_workers(), 1)))
+
+
+def get_timeout():
+    return float(getattr(settings, 'PASSWORD_HASHING_TIMEOUT', 5))
+
+
+class HashingUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _('Too many sign-ins at the moment, please try again shortly.')
+    default_code = 'hashing_unavailable'
+
+
+def encode(password, hasher):
+    return hasher.encode(password, hasher.salt())
+
+
+def verify(password, encoded, hasher, preferred):
+    """ django.contrib.auth.hashers.verify_password with the hashers already resolved """
+    hasher_changed = hasher.algorithm != preferred.algorithm
+    must_update = hasher_changed or preferred.must_update(encoded)
+    is_correct = hasher.verify(password, encoded)
+    if not is_correct and not hasher_changed and must_update:
+        hasher.harden_runtime(password, encoded)
+    return is_correct, must_update
+
+
+class PasswordHashingExecutor:
+    """
+    Bounded process pool for encode() and verify(). With PASSWORD_HASHING_WORKERS = 0 the
+    jobs run inline on the calling thread, as Django does by default.
+    """
+
+    def __init__(self, workers, max_pending):
+        self.workers = workers
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def pool(self):
+        with self._lock:
+            if self._pool is None:
+                # spawn, not fork: forking a process that runs threads can copy held locks
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+            return self._pool
+
+    def run(self, function, *args):
+        if not self.workers:
+            return function(*args)
+        if not self._slots.acquire(blocking=False):
+            raise HashingUnavailable()
+        try:
+            future = self.pool.submit(function, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # The slot is held until the job finishes, so abandoned jobs still count as pending
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=get_timeout())
+        except TimeoutError:
+            future.cancel()
+            raise HashingUnavailable()
+        except BrokenProcessPool:
+            # A worker died; start a fresh pool for the next job
+            self.shutdown(wait=False)
+            raise HashingUnavailable()
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=True)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_executor_pid = None
+
+
+def get_executor():
+    """ The process-wide executor, created on first use from the current settings """
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            # A pool inherited through fork belongs to the parent process
+            _executor = PasswordHashingExecutor(get_workers(), get_max_pending())
+            _executor_pid = os.getpid()
+        return _executor
+
+
+@receiver(setting_changed)
+def reset_executor(setting=None, **kwargs):
+    """ Shut the executor down; the next call builds one from the current settings """
+    global _executor
+    if setting is not None and not setting.startswith('PASSWORD_HASHING_'):
+        return
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None and _executor_pid == os.getpid():
+        executor.shutdown()
+
+
+def make_password(password):
+    """ django.contrib.auth.hashers.make_password for the default hasher, run in the pool """
+    if password is None:
+        return make_password_inline(None)
+    if not isinstance(password, (bytes, str)):
+        raise TypeError(f'Password must be a string or bytes, got {type(password).__qualname__}.')
+    return get_executor().run(encode, password, get_hasher())
+
+
+def check_password(password, encoded):
+    """ (is_correct, must_update) for a raw password against its stored hash, checked in the pool """
+    if password is None or not encoded or not is_password_usable(encoded):
+        return False, False
+    try:
+        hasher = identify_hasher(encoded)
+    except ValueError:
+        return False, False
+    return get_executor().run(verify, password, encoded, hasher, get_hasher())
+
+
+def set_password(user, raw_password):
+    """ user.set_password() with the hash computed in the pool """
+    user.password = make_password(raw_password)
+    user._password = raw_password
+
@@ -0,0 +1,178 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.mail import EmailMultiAlternatives
+from django.core.mail.backends.smtp import EmailBackend as SMTPBackend
+from django.core.management.base import BaseCommand, CommandError
+from django.template.loader import render_to_string
+from django.test.utils import override_settings
+from django.urls import NoReverseMatch
+from django.utils import timezone
+
+from users.smtp_pool import PooledSMTPBackend, get_pool
+
+
+class StandInSMTPServer:
+    """
+    Minimal SMTP sink in the style of aiosmtpd's Sink handler: accepts every message and
+    counts sessions and messages. Runs its own event loop in a background thread.
+    handshake_delay is spent before the greeting of every session, standing in for the
+    TCP/TLS setup and EHLO round trips of a remote server; reply_delay before every reply.
+    """
+
+    def __init__(self, handshake_delay=0.0, reply_delay=0.0):
+        self.handshake_delay = handshake_delay
+        self.reply_delay = reply_delay
+        self.sessions = 0
+        self.messages = 0
+        self.port = None
+        self._loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._run, name='smtp-stand-in', daemon=True).start()
+        self._ready.wait()
+        return self
+
+    def stop(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        server = self._loop.run_until_complete(asyncio.start_server(self.handle, '127.0.0.1', 0))
+        self.port = server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+
+    async def reply(self, writer, line):
+        if self.reply_delay:
+            await asyncio.sleep(self.reply_delay)
+        writer.write(line)
+        await writer.drain()
+
+    async def handle(self, reader, writer):
+        self.sessions += 1
+        if self.handshake_delay:
+            await asyncio.sleep(self.handshake_delay)
+        writer.write(b'220 localhost stand-in SMTP\r\n')
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line[:4].upper()
+                if command == b'EHLO':
+                    await self.reply(writer, b'250-localhost\r\n250-8BITMIME\r\n250 SIZE 10485760\r\n')
+                elif command in (b'HELO', b'MAIL', b'RCPT', b'RSET', b'NOOP'):
+                    await self.reply(writer, b'250 OK\r\n')
+                elif command == b'DATA':
+                    await self.reply(writer, b'354 End data with <CR><LF>.<CR><LF>\r\n')
+                    while (await reader.readline()) not in (b'.\r\n', b''):
+                        pass
+                    self.messages += 1
+                    await self.reply(writer, b'250 OK queued\r\n')
+                elif command == b'QUIT':
+                    await self.reply(writer, b'221 Bye\r\n')
+                    break
+                else:
+                    await self.reply(writer, b'502 Command not implemented\r\n')
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+def build_messages(template, count):
+    """ count messages rendered from one of the account email templates """
+    date = timezone.now().strftime('%d %b, %Y')
+    messages = []
+    for index in range(count):
+        email = f'user{index}@example.com'
+        context = {'user': {'email': email, 'first_name': f'User {index}'}, 'otp': f'{index % 1000000:06d}',
+                   'date': date, 'domain': 'example.com', 'uid': 'MQ', 'token': 'set-password-token'}
+        body = render_to_string(template, context)
+        if template.startswith('accounts/otp'):
+            message = EmailMultiAlternatives('Your OTP Code', '', 'noreply@example.com', [email])
+            message.attach_alternative(body, 'text/html')
+        else:
+            message = EmailMultiAlternatives('Account email', body, 'noreply@example.com', [email])
+        messages.append(message)
+    return messages
+
+
+class Command(BaseCommand):
+    help = (
+        'Start a local stand-in SMTP server and compare a new SMTP connection per message (plain send_mail) '
+        'with PooledSMTPBackend, for the OTP, password reset and activation templates. Prints messages/sec.'
+    )
+
+    TEMPLATES = (
+        ('OTP', 'accounts/otp_email_template.html'),
+        ('password reset', 'accounts/password_reset_email.html'),
+        ('activation', 'accounts/activation_email.html'),
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=500, help='Messages per template and mode')
+        parser.add_argument('--concurrency', type=int, default=4, help='Sending threads')
+        parser.add_argument('--pool-size', type=int, default=4, help='EMAIL_POOL_SIZE for the pooled backend')
+        parser.add_argument('--batch-size', type=int, default=100, help='Messages sent per pooled session checkout')
+        parser.add_argument('--handshake-delay', type=float, default=0.05,
+                            help='Seconds the server spends on each new session (connect, TLS, EHLO)')
+        parser.add_argument('--reply-delay', type=float, default=0.001, help='Seconds before each server reply')
+
+    def handle(self, *args, **options):
+        if min(options['messages'], options['concurrency'], options['pool_size'], options['batch_size']) < 1:
+            raise CommandError('--messages, --concurrency, --pool-size and --batch-size must be positive')
+
+        server = StandInSMTPServer(options['handshake_delay'], options['reply_delay']).start()
+        connection_kwargs = {'host': '127.0.0.1', 'port': server.port, 'username': '', 'password': '',
+                             'use_tls': False, 'use_ssl': False, 'timeout': 10}
+        try:
+            with override_settings(EMAIL_POOL_SIZE=options['pool_size']):
+                for label, template in self.TEMPLATES:
+                    try:
+                        messages = build_messages(template, options['messages'])
+                    except NoReverseMatch as e:
+                        self.stdout.write(self.style.WARNING(f'{label}: skipped, {template} does not render ({e})'))
+                        continue
+                    self.stdout.write(self.style.SUCCESS(label))
+                    for mode, send in (('connection per message', self.send_unpooled),
+                                       ('pooled', self.send_pooled)):
+                        sessions, received = server.sessions, server.messages
+                        elapsed = self.run(send, messages, connection_kwargs, options)
+                        received = server.messages - received
+                        if received != len(messages):
+                            raise CommandError(f'{mode}: server received {received} of {len(messages)} messages')
+                        self.stdout.write(f'  {mode:<24} {len(messages) / elapsed:>9,.0f} msg/s   '
+                                          f'{server.sessions - sessions:>5} SMTP sessions')
+        finally:
+            get_pool(**connection_kwargs).close_all()
+            server.stop()
+
+    @staticmethod
+    def run(send, messages, connection_kwargs, options):
+        concurrency = options['concurrency']
+        shares = [messages[index::concurrency] for index in range(concurrency)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(lambda share: send(share, connection_kwargs, options['batch_size']), shares))
+        return time.perf_counter() - started
+
+    @staticmethod
+    def send_unpooled(messages, connection_kwargs, batch_size):
+        # What send_mail does: connect, EHLO, send one message, QUIT
+        for message in messages:
+            SMTPBackend(**connection_kwargs).send_messages([message])
+
+    @staticmethod
+    def send_pooled(messages, connection_kwargs, batch_size):
+        backend = PooledSMTPBackend(**connection_kwargs)
+        for start in range(0, len(messages), batch_size):
+            backend.open()
+            try:
+                backend.send_messages(messages[start:start + batch_size])
+            finally:
+                backend.close()
@@ -0,0 +1,123 @@
+import io
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import get_hasher, make_password
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import override_settings
+
+from cards.management.commands.benchmark_async_views import HOST, percentile
+from users.hashing import get_executor
+from users.models import CustomUser
+
+PASSWORD = 'benchmark-password'
+
+DEFAULT_HASHERS = (
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed users in a throwaway test database and drive POST /accounts/api/login/ through the WSGI handler '
+        'from a thread pool (like a threaded WSGI server), for every combination of password hasher and '
+        'PASSWORD_HASHING_WORKERS (0 hashes on the request threads). Prints logins/sec and p50/p99 latency.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=200, help='Logins per hasher and pool size')
+        parser.add_argument('--concurrency', type=int, default=16, help='Logins in flight at once')
+        parser.add_argument('--pool-sizes', default='0,1,2,4',
+                            help='Comma separated PASSWORD_HASHING_WORKERS values to compare')
+        parser.add_argument('--hashers', default=','.join(DEFAULT_HASHERS),
+                            help='Comma separated password hasher classes to compare')
+        parser.add_argument('--users', type=int, default=100, help='Number of accounts logging in')
+
+    def handle(self, *args, **options):
+        try:
+            pool_sizes = [int(size) for size in options['pool_sizes'].split(',')]
+        except ValueError:
+            raise CommandError('--pool-sizes must be comma separated integers')
+        if min(options['logins'], options['concurrency'], options['users']) < 1 or min(pool_sizes) < 0:
+            raise CommandError('--logins, --concurrency and --users must be positive, pool sizes not negative')
+        hashers = [hasher.strip() for hasher in options['hashers'].split(',') if hasher.strip()]
+
+        # Never touch real data: everything runs in a freshly created test database
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            emails = self.seed(options['users'])
+            for hasher in hashers:
+                with override_settings(PASSWORD_HASHERS=[hasher], ALLOWED_HOSTS=[HOST], DEBUG=False):
+                    # One hash shared by every account: each login still verifies it in full
+                    CustomUser.objects.update(password=make_password(PASSWORD))
+                    self.stdout.write(self.style.SUCCESS(get_hasher().algorithm))
+                    for workers in pool_sizes:
+                        pool_settings = {'PASSWORD_HASHING_WORKERS': workers,
+                                         'PASSWORD_HASHING_MAX_PENDING': options['concurrency']}
+                        with override_settings(**pool_settings):
+                            # Start the worker processes before timing anything
+                            get_executor().run(len, '')
+                            self.report(workers, *self.run(emails, options['logins'], options['concurrency']))
+        finally:
+            get_executor().shutdown()
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    @staticmethod
+    def seed(user_count):
+        users = CustomUser.objects.bulk_create(
+            CustomUser(email=f'user{index}@example.com') for index in range(user_count)
+        )
+        return [user.email for user in users]
+
+    @staticmethod
+    def run(emails, total, concurrency):
+        application = WSGIHandler()
+
+        def call(email):
+            body = json.dumps({'email': email, 'password': PASSWORD}).encode()
+            environ = {
+                'REQUEST_METHOD': 'POST', 'PATH_INFO': '/accounts/api/login/', 'QUERY_STRING': '', 'SCRIPT_NAME': '',
+                'SERVER_NAME': HOST, 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1', 'HTTP_HOST': HOST,
+                'CONTENT_TYPE': 'application/json', 'CONTENT_LENGTH': str(len(body)),
+                'wsgi.input': io.BytesIO(body), 'wsgi.errors': io.StringIO(), 'wsgi.url_scheme': 'http',
+                'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+            }
+            statuses = []
+            started = time.perf_counter()
+            response = application(environ, lambda status, headers: statuses.append(status))
+            b''.join(response)
+            response.close()
+            elapsed = time.perf_counter() - started
+            if not statuses[0].startswith(('200', '503')):
+                raise RuntimeError(f'Login of {email} returned {statuses[0]}')
+            return elapsed, statuses[0].startswith('503')
+
+        def worker(index):
+            try:
+                return [call(emails[(index + step * concurrency) % len(emails)])
+                        for step in range(total // concurrency + (1 if index < total % concurrency else 0))]
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = [result for results in pool.map(worker, range(concurrency)) for result in results]
+        return results, time.perf_counter() - started
+
+    def report(self, workers, results, elapsed):
+        timings = [timing for timing, rejected in results if not rejected]
+        rejected = len(results) - len(timings)
+        label = 'request threads' if not workers else f'{workers} worker process{"es" if workers > 1 else ""}'
+        line = f'  {label:<20} {len(timings) / elapsed:>8.1f} logins/s'
+        if timings:
+            line += (f'   p50 {statistics.median(timings) * 1000:>8.1f} ms'
+                     f'   p99 {percentile(timings, 0.99) * 1000:>8.1f} ms')
+        if rejected:
+            line += f'   {rejected} rejected with 503'
+        self.stdout.write(line)
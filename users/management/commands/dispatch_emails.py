@@ -0,0 +1,64 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from users.outbox import EmailDispatcher
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued outbound emails through EMAIL_BACKEND with retries. Runs until the outbox is drained, or keeps polling with --loop.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Messages claimed and sent per batch')
+        parser.add_argument('--concurrency', type=int, default=1,
+                            help='Dispatchers running side by side, each sending over its own pooled SMTP session')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new messages')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds between polls with --loop')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--batch-size and --concurrency must be positive')
+
+        dispatcher = EmailDispatcher(batch_size=options['batch_size'])
+
+        try:
+            while True:
+                try:
+                    sent, failed = self.dispatch(dispatcher, options['concurrency'])
+                except Exception:
+                    if not options['loop']:
+                        raise
+                    # A database outage must not end the poller; claimed rows come back after their lease
+                    logger.exception('Dispatching outbound emails failed, retrying in %s seconds', options['interval'])
+                    connection.close()
+                    time.sleep(options['interval'])
+                    continue
+                if sent or failed or not options['loop']:
+                    self.stdout.write(self.style.SUCCESS(f'Sent {sent} emails, {failed} delivery attempts failed'))
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+
+    @staticmethod
+    def dispatch(dispatcher, concurrency):
+        """ (sent, failed attempts) of draining the outbox with `concurrency` dispatchers """
+        if concurrency == 1:
+            return dispatcher.dispatch()
+
+        def dispatch(_):
+            try:
+                return dispatcher.dispatch()
+            finally:
+                connection.close()
+
+        # Claim tokens keep the dispatchers from sending the same message
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(dispatch, range(concurrency)))
+        return sum(result[0] for result in results), sum(result[1] for result in results)
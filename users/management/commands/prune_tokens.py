@@ -0,0 +1,59 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete expired outstanding refresh tokens and their blacklist rows in chunks, so neither table '
+        'grows past one REFRESH_TOKEN_LIFETIME of tokens. Runs one pass, or keeps pruning with --loop.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Tokens deleted per transaction')
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help='Seconds to sleep between chunks, leaving room for other writers')
+        parser.add_argument('--loop', action='store_true', help='Keep pruning as tokens expire')
+        parser.add_argument('--interval', type=float, default=3600.0, help='Seconds between passes with --loop')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+        try:
+            while True:
+                started = time.perf_counter()
+                deleted = self.prune(options['chunk_size'], options['pause'], options['verbosity'] > 1)
+                if deleted or not options['loop']:
+                    self.stdout.write(self.style.SUCCESS(
+                        f'Deleted {deleted} expired tokens in {time.perf_counter() - started:.2f}s'
+                    ))
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+
+    def prune(self, chunk_size, pause, verbose=False):
+        """
+        Walks the primary key instead of sorting on the unindexed expires_at: tokens are
+        created in id order with a fixed lifetime, so the expired ones come first and every
+        chunk starts where the previous one stopped.
+        """
+        now = timezone.now()
+        last_id = 0
+        deleted = 0
+        while True:
+            ids = list(OutstandingToken.objects.filter(id__gt=last_id, expires_at__lte=now)
+                       .order_by('id').values_list('id', flat=True)[:chunk_size])
+            if not ids:
+                return deleted
+            # Blacklist rows go first through the cascade, in the same transaction
+            OutstandingToken.objects.filter(id__in=ids).delete()
+            deleted += len(ids)
+            last_id = ids[-1]
+            if verbose:
+                self.stdout.write(f'{deleted} deleted, up to token {last_id}')
+            if pause:
+                time.sleep(pause)
@@ -1,5 +1,7 @@
 from django.contrib.auth.models import BaseUserManager
 
+from users import hashing
+
 
 class CustomUserManager(BaseUserManager):
     def create_user(self, email, password=None, **extra_fields):
@@ -7,7 +9,8 @@ class CustomUserManager(BaseUserManager):
             raise ValueError('The Email field must be set')
         email = self.normalize_email(email)
         user = self.model(email=email, **extra_fields)
-        user.set_password(password)
+        # Hashed in the process pool; registration would otherwise hold a request thread for the whole hash
+        hashing.set_password(user, password)
         user.save(using=self._db)
         return user
 
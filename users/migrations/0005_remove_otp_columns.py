@@ -0,0 +1,33 @@
+# Generated by Django 5.1.6 on 2026-10-17 20:48
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_outboundemail'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='customuser',
+            name='otp',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='otp_expiration',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='otp_resend_attempts',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='otp_resend_cooldown_period',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='otp_resend_last_attempt',
+        ),
+    ]
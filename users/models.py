@@ -24,18 +24,51 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     is_email_verified = models.BooleanField(default=False)
     date_joined = models.DateTimeField(auto_now_add=True, blank=True, null=True)
 
-    otp = models.CharField(max_length=6, blank=True, null=True)
-    otp_expiration = models.DateTimeField(blank=True, null=True)
-    otp_resend_attempts = models.PositiveIntegerField(default=0)
-    otp_resend_last_attempt = models.DateTimeField(blank=True, null=True)
-    otp_resend_cooldown_period = models.DurationField(
-        default=timezone.timedelta(hours=2)
-    )
-
     objects = CustomUserManager()
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = []
 
+    class Meta:
+        indexes = [
+            # Admin date hierarchy and newest-first user listings
+            models.Index(fields=['date_joined'], name='user_date_joined_idx'),
+        ]
+
     def __str__(self):
         return self.email
+
+
+class OutboundEmail(models.Model):
+    """
+    Transactional outbox row: written in the same transaction as the change that
+    triggers the email and delivered later by the dispatch_emails command.
+    """
+    STATUS_CHOICES = (
+        ('PENDING', 'Pending'),
+        ('SENT', 'Sent'),
+        ('FAILED', 'Failed')
+    )
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField(blank=True)
+    html_body = models.TextField(null=True, blank=True)
+    from_email = models.CharField(max_length=255, null=True, blank=True)
+    recipients = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveIntegerField(default=0)
+    # Due time of the next delivery attempt; a dispatcher claiming the row pushes it forward as a lease
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claim_token = models.CharField(max_length=32, blank=True, default='')
+    last_error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbound_email_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} to {', '.join(self.recipients)} ({self.status})"
@@ -0,0 +1,136 @@
+"""
+One-time passwords for email verification, kept in the cache with native expiry.
+
+Nothing about an OTP is written to the users table: issuing, resending and failed
+attempts are cache operations, and only a successful verification touches the
+database, with one UPDATE that activates the account.
+
+A code is stored under a key derived from (email, code) with an HMAC, so checking a
+submitted code is a key lookup and raw codes never sit in the cache. The value is
+the user's primary key times CONSUME_STEP: the verifying incr() both returns it and
+marks the code used, so exactly one request gets the remainder 1 and activates the
+account. Failed attempts are counted per email; at OTP_MAX_ATTEMPTS the current code
+is deleted and a new one has to be requested.
+
+Everything lives in the OTP_CACHE_ALIAS cache. It has to be shared by every process
+and must not evict entries before they expire (a culled code simply stops verifying),
+so it is a cache of its own rather than the one absorbing card and user traffic;
+users.checks refuses per-process and dummy backends for it.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.crypto import salted_hmac
+
+from .cache import invalidate_user
+from .utils import generate_otp
+
+# Large enough that the number of incr() calls on one code never reaches it
+CONSUME_STEP = 1000000
+
+
+def get_cache():
+    return caches[getattr(settings, 'OTP_CACHE_ALIAS', 'default')]
+
+
+def get_timeout():
+    return int(getattr(settings, 'OTP_EXPIRATION_TIME', 5)) * 60
+
+
+def get_max_attempts():
+    return int(getattr(settings, 'OTP_MAX_ATTEMPTS', 5))
+
+
+def get_resend_limit():
+    return int(getattr(settings, 'OTP_RESEND_LIMIT', 3))
+
+
+def get_resend_cooldown():
+    return int(getattr(settings, 'OTP_RESEND_COOLDOWN', 2 * 60 * 60))
+
+
+def normalize_email(email):
+    return get_user_model().objects.normalize_email(email)
+
+
+def email_key(email, kind):
+    return f"users:otp:{kind}:{salted_hmac('users.otp.email', email).hexdigest()}"
+
+
+def code_key(email, code):
+    return f"users:otp:code:{salted_hmac('users.otp.code', f'{email}:{code}').hexdigest()}"
+
+
+def issue(user):
+    """
+    Return a new OTP for the user. It replaces the current one when the transaction
+    commits, so an OTP whose email or user row was rolled back never becomes valid.
+    """
+    email = normalize_email(user.email)
+    otp = generate_otp()
+    key = code_key(email, otp)
+
+    def store():
+        cache = get_cache()
+        current_key = email_key(email, 'current')
+        previous = cache.get(current_key)
+        cache.set_many({
+            key: user.pk * CONSUME_STEP,
+            current_key: key,
+            email_key(email, 'attempts'): 0,
+        }, timeout=get_timeout())
+        if previous and previous != key:
+            cache.delete(previous)
+
+    transaction.on_commit(store)
+    return otp
+
+
+def consume(email, otp):
+    """
+    The primary key of the user the OTP was issued to if it is current, unexpired and
+    used for the first time, otherwise None (and the attempt counts against the email).
+    """
+    email = normalize_email(email)
+    cache = get_cache()
+    try:
+        value = cache.incr(code_key(email, otp))
+    except ValueError:
+        value = None
+    if value is not None and value % CONSUME_STEP == 1:
+        return value // CONSUME_STEP
+
+    attempts_key = email_key(email, 'attempts')
+    try:
+        attempts = cache.incr(attempts_key)
+    except ValueError:
+        # No OTP outstanding for this email
+        return None
+    if attempts >= get_max_attempts():
+        current_key = email_key(email, 'current')
+        cache.delete_many([key for key in (cache.get(current_key), current_key, attempts_key) if key])
+    return None
+
+
+def verify(email, otp):
+    """ Activate the account the OTP belongs to; returns whether it did """
+    pk = consume(email, otp)
+    if pk is None:
+        return False
+    get_user_model().objects.filter(pk=pk).update(is_email_verified=True, is_active=True)
+    # update() sends no post_save; tokens identify users by primary key
+    invalidate_user(pk)
+    return True
+
+
+def allow_resend(email):
+    """ Count a resend; False once OTP_RESEND_LIMIT were sent within OTP_RESEND_COOLDOWN seconds """
+    key = email_key(normalize_email(email), 'resends')
+    cache = get_cache()
+    cache.add(key, 0, timeout=get_resend_cooldown())
+    try:
+        return cache.incr(key) <= get_resend_limit()
+    except ValueError:
+        # Expired in between, so the cooldown is over
+        return True
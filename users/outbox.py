@@ -0,0 +1,131 @@
+import logging
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db.models import F
+from django.utils import timezone
+
+from users.models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+
+def get_max_attempts():
+    return int(getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 5))
+
+
+def get_retry_delay():
+    return float(getattr(settings, 'EMAIL_OUTBOX_RETRY_DELAY', 30))
+
+
+def get_lease():
+    return float(getattr(settings, 'EMAIL_OUTBOX_LEASE', 300))
+
+
+def queue_mail(subject, message, from_email, recipient_list, html_message=None):
+    """
+    Same arguments as django.core.mail.send_mail, but only inserts an outbox row. Call it
+    inside the transaction of the change the email is about: the email is sent if and
+    only if that change commits, and the request never waits on the mail server.
+    """
+    return OutboundEmail.objects.create(
+        subject=subject,
+        body=message,
+        html_body=html_message,
+        from_email=from_email,
+        recipients=list(recipient_list),
+    )
+
+
+class EmailDispatcher:
+    """
+    Delivers due outbox rows through the configured EMAIL_BACKEND.
+
+    A batch is claimed with one UPDATE that stamps a claim token on due rows and pushes
+    next_attempt_at EMAIL_OUTBOX_LEASE seconds ahead, so concurrent dispatchers never send
+    the same row and a dispatcher that dies mid-batch only delays its rows. Sent rows are
+    marked with one UPDATE per batch; a failed row is retried with exponential backoff
+    (EMAIL_OUTBOX_RETRY_DELAY * 2 ** (attempts - 1)) until EMAIL_OUTBOX_MAX_ATTEMPTS.
+    When the connection cannot be opened, every row of the batch counts a failed attempt.
+    """
+
+    def __init__(self, batch_size=100, connection=None):
+        self.batch_size = batch_size
+        self.connection = connection
+
+    def dispatch(self):
+        """ Deliver due messages until none are left; returns (sent, failed attempts) """
+        # Messages that fail during this run are due again after it started, so they wait for the next run
+        started = timezone.now()
+        sent = failed = 0
+        while True:
+            messages = self.claim(started)
+            if not messages:
+                return sent, failed
+            batch_sent, batch_failed = self.deliver(messages)
+            sent += batch_sent
+            failed += batch_failed
+
+    def claim(self, due_by=None):
+        now = timezone.now()
+        token = uuid.uuid4().hex
+        due = OutboundEmail.objects.filter(status='PENDING', next_attempt_at__lte=due_by or now)
+        ids = list(due.order_by('next_attempt_at', 'id').values_list('id', flat=True)[:self.batch_size])
+        if not ids:
+            return []
+        # Re-checking the due condition makes the UPDATE skip rows another dispatcher claimed meanwhile
+        due.filter(id__in=ids).update(claim_token=token, next_attempt_at=now + timedelta(seconds=get_lease()))
+        return list(OutboundEmail.objects.filter(claim_token=token, status='PENDING').order_by('id'))
+
+    def deliver(self, messages):
+        connection = self.connection or get_connection()
+        sent_ids = []
+        failed = 0
+        try:
+            connection.open()
+        except Exception as e:
+            # Nothing in the batch can be sent; each message spends an attempt and backs off
+            logger.warning('Opening the email connection failed: %s', e)
+            for message in messages:
+                self.mark_failed(message, e)
+            return 0, len(messages)
+        try:
+            for message in messages:
+                try:
+                    self.build(message, connection).send()
+                except Exception as e:
+                    logger.warning('Delivering outbound email %s failed: %s', message.pk, e)
+                    self.mark_failed(message, e)
+                    failed += 1
+                    # The connection may be broken; the next send reopens it
+                    connection.close()
+                else:
+                    sent_ids.append(message.pk)
+        finally:
+            connection.close()
+            if sent_ids:
+                OutboundEmail.objects.filter(pk__in=sent_ids).update(
+                    status='SENT', sent_at=timezone.now(), attempts=F('attempts') + 1, claim_token='', last_error=None
+                )
+        return len(sent_ids), failed
+
+    @staticmethod
+    def build(message, connection):
+        email = EmailMultiAlternatives(
+            message.subject, message.body, message.from_email, message.recipients, connection=connection
+        )
+        if message.html_body:
+            email.attach_alternative(message.html_body, 'text/html')
+        return email
+
+    @staticmethod
+    def mark_failed(message, error):
+        attempts = message.attempts + 1
+        changes = {'attempts': attempts, 'claim_token': '', 'last_error': str(error) or type(error).__name__}
+        if attempts >= get_max_attempts():
+            changes['status'] = 'FAILED'
+        else:
+            changes['next_attempt_at'] = timezone.now() + timedelta(seconds=get_retry_delay() * 2 ** (attempts - 1))
+        OutboundEmail.objects.filter(pk=message.pk, claim_token=message.claim_token).update(**changes)
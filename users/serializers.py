@@ -1,17 +1,23 @@
-from django.shortcuts import get_object_or_404
 from django.http import Http404
 from django.utils import timezone
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from django.core.mail import send_mail
 from django.conf import settings
+from django.db import transaction
 from django.utils.http import urlsafe_base64_encode
 from django.utils.encoding import force_bytes
 from django.template.loader import render_to_string
 from django.contrib.sites.shortcuts import get_current_site
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer as BaseTokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from users.blacklist import RotatingRefreshToken
+from users.cache import get_auth_user
 from users.models import CustomUser
+from users.outbox import queue_mail
 from users.tokens import account_activation_token
-from users.utils import set_otp
+from users import otp as otp_store
+from users.utils import save_changes
 
 
 User = get_user_model()
@@ -27,29 +33,31 @@ class CustomUserSerializer(serializers.ModelSerializer):
         }
 
     def create(self, validated_data):
-        user = User.objects.create_user(**validated_data)
-
         is_email_verification_mandatory = getattr(settings, 'ACCOUNT_EMAIL_VERIFICATION', 'optional')
-
         if is_email_verification_mandatory == "mandatory":
-            user.is_active = False
-            otp = set_otp(user)
-            current_site = get_current_site(self.context['request'])
-            mail_subject = 'Your OTP Code'
-            date = timezone.now().strftime('%d %b, %Y')
-            message = render_to_string('accounts/otp_email_template.html', {
-                'user': user,
-                'otp': otp,
-                'date': date,
-            })
-            send_mail(
-                mail_subject,
-                '',
-                settings.DEFAULT_FROM_EMAIL,
-                [user.email],
-                html_message=message
-            )
-        user.save()
+            # Inactive from the INSERT on, so no second write of the whole row is needed
+            validated_data['is_active'] = False
+
+        # The OTP email is queued in the same transaction as the user row; dispatch_emails delivers it
+        with transaction.atomic():
+            user = User.objects.create_user(**validated_data)
+
+            if is_email_verification_mandatory == "mandatory":
+                otp = otp_store.issue(user)
+                mail_subject = 'Your OTP Code'
+                date = timezone.now().strftime('%d %b, %Y')
+                message = render_to_string('accounts/otp_email_template.html', {
+                    'user': user,
+                    'otp': otp,
+                    'date': date,
+                })
+                queue_mail(
+                    mail_subject,
+                    '',
+                    settings.DEFAULT_FROM_EMAIL,
+                    [user.email],
+                    html_message=message
+                )
         return user
 
 
@@ -57,27 +65,10 @@ class VerifyOTPSerializer(serializers.Serializer):
     email = serializers.EmailField()
     otp = serializers.CharField(max_length=6)
 
-    def validate(self, data):
-        email = data.get('email')
-        otp = data.get('otp')
-        user = get_object_or_404(CustomUser, email=email)
-
-        if user.otp != otp:
-            raise serializers.ValidationError('Invalid OTP.')
-        if user.otp_expiration < timezone.now():
-            raise serializers.ValidationError('OTP has expired.')
-
-        return data
-
     def save(self):
-        email = self.validated_data['email']
-        user = get_object_or_404(User, email=email)
-        user.is_email_verified = True
-        user.is_active = True
-        user.otp = None
-        user.otp_expiration = None
-        user.save()
-        return user
+        """ One cache operation to check and use up the OTP, one UPDATE to activate the account """
+        if not otp_store.verify(self.validated_data['email'], self.validated_data['otp']):
+            raise serializers.ValidationError('Invalid or expired OTP.')
 
 
 class ResendOTPSerializer(serializers.Serializer):
@@ -89,12 +80,7 @@ class ResendOTPSerializer(serializers.Serializer):
             if user:
                 if user.is_email_verified:
                     raise serializers.ValidationError('Email is already verified.')
-                now = timezone.now()
-                if user.otp_resend_attempts >= 3:
-                    if user.otp_resend_last_attempt:
-                        cooldown_end = user.otp_resend_last_attempt + user.otp_resend_cooldown_period
-                        if now < cooldown_end:
-                            raise serializers.ValidationError('Too many requests. Try again later.')
+                self.user = user
         except User.DoesNotExist:
             raise Http404(
                 f"No user found matching the given email. Email: {value}"
@@ -103,32 +89,27 @@ class ResendOTPSerializer(serializers.Serializer):
         return value
 
     def save(self):
-        email = self.validated_data['email']
-        user = get_object_or_404(User, email=email)
-        now = timezone.now()
-        if user.otp_resend_attempts >= 3 and user.otp_resend_last_attempt:
-            cooldown_end = user.otp_resend_last_attempt + user.otp_resend_cooldown_period
-            if now < cooldown_end:
-                raise serializers.ValidationError('Too many requests. Try again later.')
-
-        # Reset OTP and resend it
-        user.otp_resend_attempts += 1
-        user.otp_resend_last_attempt = now
-        otp = set_otp(user)
-        date = timezone.now().strftime('%d %b, %Y')
-        mail_subject = 'Your New OTP Code'
-        message = render_to_string('accounts/otp_resend_email_template.html', {
-            'user': user,
-            'otp': otp,
-            'date': date,
-        })
-        send_mail(
-            mail_subject,
-            '',
-            settings.DEFAULT_FROM_EMAIL,
-            [user.email],
-            html_message=message
-        )
+        user = self.user
+        if not otp_store.allow_resend(user.email):
+            raise serializers.ValidationError('Too many requests. Try again later.')
+
+        # Reset OTP and resend it; the new OTP replaces the old one once the email is queued
+        with transaction.atomic():
+            otp = otp_store.issue(user)
+            date = timezone.now().strftime('%d %b, %Y')
+            mail_subject = 'Your New OTP Code'
+            message = render_to_string('accounts/otp_resend_email_template.html', {
+                'user': user,
+                'otp': otp,
+                'date': date,
+            })
+            queue_mail(
+                mail_subject,
+                '',
+                settings.DEFAULT_FROM_EMAIL,
+                [user.email],
+                html_message=message
+            )
         return user
 
 
@@ -161,7 +142,7 @@ class ResendActivationEmailSerializer(serializers.Serializer):
                 'uid': uid,
                 'token': token,
             })
-            send_mail(mail_subject, message, settings.DEFAULT_FROM_EMAIL, [user.email])
+            queue_mail(mail_subject, message, settings.DEFAULT_FROM_EMAIL, [user.email])
 
 
 class UserListSerializer(serializers.ModelSerializer):
@@ -215,7 +196,7 @@ class PasswordResetSerializer(serializers.Serializer):
                 'uid': uid,
                 'token': token,
             })
-            send_mail(mail_subject, message, settings.DEFAULT_FROM_EMAIL, [user.email])
+            queue_mail(mail_subject, message, settings.DEFAULT_FROM_EMAIL, [user.email])
 
 
 class AccessTokenSerializer(serializers.Serializer):
@@ -234,11 +215,12 @@ class UpdateUserSerializer(serializers.ModelSerializer):
 
     def update(self, instance, validated_data):
         # Only update fields that were actually passed in the request
+        changes = {}
         if 'first_name' in validated_data:
-            instance.first_name = validated_data['first_name']
+            changes['first_name'] = validated_data['first_name']
 
         if 'last_name' in validated_data:
-            instance.last_name = validated_data['last_name']
+            changes['last_name'] = validated_data['last_name']
 
         if 'profile_picture' in validated_data:
             # If a new profile picture is provided, delete the old one first
@@ -247,9 +229,9 @@ class UpdateUserSerializer(serializers.ModelSerializer):
                     instance.profile_picture.delete(save=False)
                 except Exception:
                     pass
-            instance.profile_picture = validated_data['profile_picture']
+            changes['profile_picture'] = validated_data['profile_picture']
 
-        instance.save()
+        save_changes(instance, **changes)
         return instance
 
 
@@ -261,3 +243,28 @@ class PasswordChangeSerializer(serializers.Serializer):
 class AuthSerializer(serializers.Serializer):
     code = serializers.CharField(required=False)
     error = serializers.CharField(required=False)
+
+
+class TokenRefreshSerializer(BaseTokenRefreshSerializer):
+    """
+    simplejwt's refresh serializer with the blacklist check going through the Bloom filter,
+    the user read through the auth user cache, and the rotated token recorded as outstanding.
+    """
+    token_class = RotatingRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+
+        user_id = refresh.payload.get(api_settings.USER_ID_CLAIM)
+        if user_id:
+            try:
+                user = get_auth_user(user_id)
+            except CustomUser.DoesNotExist:
+                user = None
+            if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+                raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+
+        data = {'access': str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            data['refresh'] = str(refresh.rotate(blacklist=api_settings.BLACKLIST_AFTER_ROTATION))
+        return data
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from .blacklist import bump_generation
+from .cache import invalidate_user
+
+
+@receiver([post_save, post_delete], sender=settings.AUTH_USER_MODEL)
+def invalidate_auth_user(sender, instance, **kwargs):
+    """
+    The cached user becomes request.user, so every save counts, not only changes to
+    role, is_active or password. New users are included because a reused primary key
+    (SQLite, or a restored database) must not pick up an old entry.
+    Bulk QuerySet.update() calls on users bypass this and call invalidate_user() themselves.
+    """
+    invalidate_user(getattr(instance, api_settings.USER_ID_FIELD))
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def resync_blacklist_filters(sender, instance, created, **kwargs):
+    """ Tokens blacklisted from the admin or a script, which other processes' filters cannot know yet """
+    if created:
+        transaction.on_commit(bump_generation)
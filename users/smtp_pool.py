@@ -0,0 +1,198 @@
+import os
+import smtplib
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.mail.backends.smtp import EmailBackend as SMTPBackend
+
+# Errors after which the SMTP session is unusable and has to be reopened
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+
+def get_pool_size():
+    return int(getattr(settings, 'EMAIL_POOL_SIZE', 4))
+
+
+def get_acquire_timeout():
+    return float(getattr(settings, 'EMAIL_POOL_TIMEOUT', 30))
+
+
+def get_max_idle():
+    return float(getattr(settings, 'EMAIL_POOL_MAX_IDLE', 60))
+
+
+def get_max_messages():
+    return int(getattr(settings, 'EMAIL_POOL_MAX_MESSAGES', 100))
+
+
+class PooledConnection:
+    """ An open Django SMTP backend plus what the pool needs to know to reuse it """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.sent = 0
+        self.released_at = time.monotonic()
+
+    def send(self, message):
+        """ Send one message; a dropped session is reopened and the message sent once more """
+        try:
+            sent = self.backend.send_messages([message])
+        except CONNECTION_ERRORS:
+            self.reconnect()
+            sent = self.backend.send_messages([message])
+        self.sent += 1
+        if self.sent >= get_max_messages():
+            # Many servers cap the messages per session; start a fresh one before hitting the cap
+            self.reconnect()
+        return sent
+
+    def reconnect(self):
+        self.close()
+        self.backend.open()
+        self.sent = 0
+
+    def close(self):
+        try:
+            self.backend.close()
+        except (OSError, smtplib.SMTPException):
+            # QUIT on a session the server already dropped; the backend has let go of it either way
+            pass
+
+
+class SMTPConnectionPool:
+    """
+    Bounded pool of persistent SMTP sessions for one server. At most `size` sessions
+    exist at a time; acquire() waits up to EMAIL_POOL_TIMEOUT seconds for a free one.
+    Idle sessions older than EMAIL_POOL_MAX_IDLE are replaced, since servers drop them.
+    """
+
+    def __init__(self, size, backend_kwargs):
+        self.backend_kwargs = backend_kwargs
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self._slots.acquire(timeout=get_acquire_timeout()):
+            raise TimeoutError('No SMTP connection became free in time')
+        try:
+            with self._lock:
+                connection = self._idle.pop() if self._idle else None
+            if connection is not None and time.monotonic() - connection.released_at > get_max_idle():
+                connection.close()
+                connection = None
+            if connection is None:
+                backend = SMTPBackend(fail_silently=False, **self.backend_kwargs)
+                backend.open()
+                connection = PooledConnection(backend)
+            return connection
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, connection, broken=False):
+        if broken:
+            connection.close()
+        else:
+            connection.released_at = time.monotonic()
+            with self._lock:
+                self._idle.append(connection)
+        self._slots.release()
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for connection in idle:
+            connection.close()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+_pools_pid = None
+
+
+def get_pool(**backend_kwargs):
+    """ The process-wide pool for these connection settings """
+    global _pools, _pools_pid
+    key = tuple(sorted(backend_kwargs.items()))
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            # Sessions opened by a parent process share its sockets and must not be reused after fork
+            _pools = {}
+            _pools_pid = os.getpid()
+        if key not in _pools:
+            _pools[key] = SMTPConnectionPool(get_pool_size(), backend_kwargs)
+        return _pools[key]
+
+
+class PooledSMTPBackend(BaseEmailBackend):
+    """
+    SMTP email backend that borrows persistent sessions from a process-wide pool instead
+    of connecting, negotiating TLS and logging in for every send_mail call.
+
+    Follows the connection protocol of Django's SMTP backend: open() holds one pooled
+    session until close() hands it back, so a batch sent between them shares a session;
+    send_messages() without open() borrows a session for that call only.
+    """
+
+    def __init__(self, host=None, port=None, username=None, password=None, use_tls=None, use_ssl=None,
+                 timeout=None, fail_silently=False, **kwargs):
+        super().__init__(fail_silently=fail_silently)
+        self.backend_kwargs = {
+            'host': host or settings.EMAIL_HOST,
+            'port': port or settings.EMAIL_PORT,
+            'username': settings.EMAIL_HOST_USER if username is None else username,
+            'password': settings.EMAIL_HOST_PASSWORD if password is None else password,
+            'use_tls': settings.EMAIL_USE_TLS if use_tls is None else use_tls,
+            'use_ssl': settings.EMAIL_USE_SSL if use_ssl is None else use_ssl,
+            'timeout': settings.EMAIL_TIMEOUT if timeout is None else timeout,
+        }
+        self.connection = None
+
+    @property
+    def pool(self):
+        return get_pool(**self.backend_kwargs)
+
+    def open(self):
+        if self.connection is not None:
+            return False
+        try:
+            self.connection = self.pool.acquire()
+        except Exception:
+            if not self.fail_silently:
+                raise
+            return False
+        return True
+
+    def close(self, broken=False):
+        if self.connection is not None:
+            connection, self.connection = self.connection, None
+            self.pool.release(connection, broken=broken)
+
+    def send_messages(self, email_messages):
+        if not email_messages:
+            return 0
+        borrowed = self.open()
+        if self.connection is None:
+            return 0
+        sent = 0
+        broken = False
+        try:
+            for message in email_messages:
+                if self.connection.send(message):
+                    sent += 1
+        except CONNECTION_ERRORS:
+            # Also failed right after reconnecting; do not hand this session to anyone else
+            broken = True
+            if not self.fail_silently:
+                raise
+        except Exception:
+            if not self.fail_silently:
+                raise
+        finally:
+            if borrowed or broken:
+                self.close(broken=broken)
+        return sent
@@ -1,3 +1,533 @@
-from django.test import TestCase
+import io
+import os
+import re
+import socket
+from contextlib import contextmanager
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.hashers import make_password
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.mail import EmailMessage
+from django.core.mail.backends.locmem import EmailBackend
+from django.db import OperationalError, connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from cards.models import CreditCard
+from users.management.commands.benchmark_email_delivery import StandInSMTPServer
+from users.blacklist import BloomFilter, blacklist_filter
+from users.cache import local_users
+from users.checks import check_otp_cache, check_shared_caches
+from users.hashing import get_executor
+from users import otp as otp_store
+from users.models import CustomUser, OutboundEmail
+from users.outbox import EmailDispatcher, queue_mail
+from users.smtp_pool import PooledSMTPBackend, get_pool
+from users.tokens import account_activation_token
+
+UPDATE_PATTERN = re.compile(r'^UPDATE "(?P<table>\w+)" SET (?P<assignments>.*?) WHERE ', re.S)
+COLUMN_PATTERN = re.compile(r'"(\w+)" = ')
+
+
+class RecordedSQL:
+    """ SQL emitted while handling one request, with helpers to inspect what was written """
+
+    def __init__(self, queries):
+        self.statements = [query['sql'] for query in queries]
+
+    def updated_columns(self, table=CustomUser._meta.db_table):
+        """ Column names set by each UPDATE of table, in order """
+        columns = []
+        for statement in self.statements:
+            match = UPDATE_PATTERN.match(statement)
+            if match and match['table'] == table:
+                columns.append(set(COLUMN_PATTERN.findall(match['assignments'])))
+        return columns
+
+    def __str__(self):
+        return '\n'.join(self.statements)
+
+
+class UserWriteAmplificationTestCase(APITestCase):
+    """
+    Records the SQL each user endpoint emits and checks that UPDATEs on the wide
+    users_customuser row only touch the columns the flow actually changes.
+    """
+
+    def setUp(self):
+        cache.clear()
+        otp_store.get_cache().clear()
+        self.user = CustomUser.objects.create_user(email='owner@example.com', password='old-password', is_active=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.otp = otp_store.issue(self.user)
+
+    @contextmanager
+    def record_sql(self):
+        with CaptureQueriesContext(connection) as context:
+            recorded = RecordedSQL([])
+            yield recorded
+        recorded.statements = [query['sql'] for query in context.captured_queries]
+
+    def assertUpdates(self, recorded, *expected):
+        self.assertEqual(recorded.updated_columns(), [set(columns) for columns in expected], msg=f'\n{recorded}')
+
+    def test_register(self):
+        with self.record_sql() as recorded:
+            response = self.client.post(reverse('accounts:register'),
+                                        {'email': 'new@example.com', 'password': 'secret-pass'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        # The OTP lives in the cache; the user row is only inserted
+        self.assertUpdates(recorded)
+        self.assertFalse(CustomUser.objects.get(email='new@example.com').is_active)
+
+    def test_verify_otp(self):
+        with self.record_sql() as recorded:
+            response = self.client.post(reverse('accounts:verify_otp'),
+                                        {'email': self.user.email, 'otp': self.otp}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertUpdates(recorded, {'is_email_verified', 'is_active'})
+        self.assertEqual(len(recorded.statements), 1, msg=f'\n{recorded}')
+
+    def test_resend_otp(self):
+        with self.record_sql() as recorded, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('accounts:resend_otp'), {'email': self.user.email}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertUpdates(recorded)
+        # The resent OTP replaces the first one
+        self.assertFalse(otp_store.verify(self.user.email, self.otp))
+
+    def test_update_role(self):
+        admin = CustomUser.objects.create_superuser(email='admin@example.com', password='pass')
+        self.client.force_authenticate(admin)
+        with self.record_sql() as recorded:
+            response = self.client.patch(reverse('accounts:update-user-role', args=[self.user.pk]),
+                                         {'role': 'MANAGER'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertUpdates(recorded, {'role'})
+
+        # Setting the current role again writes nothing
+        with self.record_sql() as recorded:
+            self.client.patch(reverse('accounts:update-user-role', args=[self.user.pk]), {'role': 'MANAGER'}, format='json')
+        self.assertUpdates(recorded)
+
+    def test_password_reset_confirm(self):
+        url = reverse('accounts:password_reset_confirm', args=[
+            urlsafe_base64_encode(force_bytes(self.user.pk)), account_activation_token.make_token(self.user)
+        ])
+        with self.record_sql() as recorded:
+            response = self.client.post(url, {'password': 'new-password', 'password_confirm': 'new-password'},
+                                        format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertUpdates(recorded, {'password'})
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('new-password'))
+
+
+class OTPStoreTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        otp_store.get_cache().clear()
+        self.user = CustomUser.objects.create_user(email='owner@example.com', password='pass', is_active=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.otp = otp_store.issue(self.user)
+
+    def wrong(self, otp):
+        return '000000' if otp != '000000' else '111111'
+
+    def test_otp_is_used_once(self):
+        self.assertTrue(otp_store.verify('owner@EXAMPLE.com', self.otp))
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.is_active and self.user.is_email_verified)
+        self.assertFalse(otp_store.verify(self.user.email, self.otp))
+
+    def test_failed_attempts_burn_otp(self):
+        with override_settings(OTP_MAX_ATTEMPTS=3):
+            for _ in range(3):
+                self.assertFalse(otp_store.verify(self.user.email, self.wrong(self.otp)))
+        self.assertFalse(otp_store.verify(self.user.email, self.otp))
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+
+    def test_expired_otp_is_rejected(self):
+        with override_settings(OTP_EXPIRATION_TIME=0), self.captureOnCommitCallbacks(execute=True):
+            otp = otp_store.issue(self.user)
+        self.assertFalse(otp_store.verify(self.user.email, otp))
+
+    def test_rolled_back_otp_never_becomes_valid(self):
+        otp = otp_store.issue(self.user)
+        self.assertFalse(otp_store.verify(self.user.email, otp))
+        self.assertTrue(otp_store.verify(self.user.email, self.otp))
+
+    def test_resend_limit(self):
+        with override_settings(OTP_RESEND_LIMIT=2):
+            self.assertEqual([otp_store.allow_resend(self.user.email) for _ in range(3)], [True, True, False])
+
+    def test_otp_survives_unrelated_cache_traffic(self):
+        # Far past the 300 entries at which the default local memory cache starts culling
+        for index in range(1000):
+            cache.set(f'unrelated:{index}', index)
+        self.assertTrue(otp_store.verify(self.user.email, self.otp))
+
+
+class CacheChecksTestCase(SimpleTestCase):
+    def locmem(self, location):
+        return {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': location}
+
+    def test_dummy_otp_cache_is_refused(self):
+        dummy = {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+        with override_settings(CACHES={'default': self.locmem('default'), 'otp': dummy}):
+            self.assertEqual([error.id for error in check_otp_cache(None)], ['users.E002'])
+        with override_settings(OTP_CACHE_ALIAS='missing'):
+            self.assertEqual([error.id for error in check_otp_cache(None)], ['users.E001'])
+        with override_settings(ACCOUNT_EMAIL_VERIFICATION='none', OTP_CACHE_ALIAS='missing'):
+            self.assertEqual(check_otp_cache(None), [])
+
+    def test_deploy_check_requires_shared_caches(self):
+        errors = check_shared_caches(None)
+        self.assertEqual([error.id for error in errors], ['users.E003', 'users.E003'])
+        self.assertEqual([error.msg.split("'")[1] for error in errors], ['default', 'otp'])
+        shared = {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://localhost:6379'}
+        with override_settings(CACHES={'default': shared, 'otp': shared}):
+            self.assertEqual(check_shared_caches(None), [])
+
+
+class AuthUserCacheTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        local_users.clear()
+        self.manager = CustomUser.objects.create_user(email='manager@example.com', password='pass', role='MANAGER')
+        CreditCard.objects.create(user=self.manager, card_type='VISA', credit_limit=500)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.manager)}')
+
+    def test_warm_cache_costs_no_auth_queries(self):
+        self.assertEqual(self.client.get(reverse('card-list-create')).status_code, 200)
+        # Same single page query as with force_authenticate
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(reverse('card-list-create')).status_code, 200)
+
+        # Another process only has the shared cache
+        local_users.clear()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(reverse('card-list-create')).status_code, 200)
+
+    def test_changes_invalidate_cached_user(self):
+        self.assertEqual(self.client.get(reverse('card-risk-scores')).status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.manager.role = 'USER'
+            self.manager.save(update_fields=['role'])
+        self.assertEqual(self.client.get(reverse('card-risk-scores')).status_code, 403)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.manager.is_active = False
+            self.manager.save(update_fields=['is_active'])
+        self.assertEqual(self.client.get(reverse('card-risk-scores')).status_code, 401)
+
+    def test_password_change_revokes_token(self):
+        # simplejwt rebinds api_settings on SIMPLE_JWT changes, which modules holding the old object never see
+        with mock.patch.object(api_settings, 'CHECK_REVOKE_TOKEN', True):
+            self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.manager)}')
+            self.assertEqual(self.client.get(reverse('card-list-create')).status_code, 200)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.manager.set_password('new-pass')
+                self.manager.save(update_fields=['password'])
+            self.assertEqual(self.client.get(reverse('card-list-create')).status_code, 401)
+
+
+class TokenBlacklistTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        local_users.clear()
+        blacklist_filter.clear()
+        self.user = CustomUser.objects.create_user(email='owner@example.com', password='pass')
+
+    def refresh(self, token):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('accounts:token_refresh'), {'refresh': str(token)}, format='json')
+
+    def test_rotation_blacklists_old_token(self):
+        token = RefreshToken.for_user(self.user)
+        response = self.refresh(token)
+        self.assertEqual(response.status_code, 200)
+        rotated = response.data['refresh']
+
+        self.assertTrue(BlacklistedToken.objects.filter(token__jti=token['jti']).exists())
+        # The replacement is outstanding too, so it can be revoked and pruned like a login token
+        self.assertTrue(OutstandingToken.objects.filter(jti=RefreshToken(rotated)['jti']).exists())
+        self.assertEqual(self.refresh(token).status_code, 401)
+        self.assertEqual(self.refresh(rotated).status_code, 200)
+
+    def test_replay_fails_with_stale_filter(self):
+        token = RefreshToken.for_user(self.user)
+        self.assertEqual(self.refresh(token).status_code, 200)
+        # Another process whose filter has not synced the rotation yet
+        blacklist_filter.bloom = BloomFilter(1000, 0.01)
+        self.assertEqual(self.refresh(token).status_code, 401)
+        self.assertEqual(OutstandingToken.objects.count(), 2)
+
+    def test_live_token_skips_blacklist_query(self):
+        self.refresh(RefreshToken.for_user(self.user))
+        token = RefreshToken.for_user(self.user)
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.refresh(token).status_code, 200)
+        statements = [query['sql'] for query in context.captured_queries]
+        self.assertFalse([sql for sql in statements if sql.startswith('SELECT') and 'blacklistedtoken' in sql],
+                         msg='\n'.join(statements))
+
+    def test_blacklisting_elsewhere_reaches_filter(self):
+        token = RefreshToken.for_user(self.user)
+        self.assertEqual(self.refresh(RefreshToken.for_user(self.user)).status_code, 200)
+        # Admin action or another process
+        with self.captureOnCommitCallbacks(execute=True):
+            BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=token['jti']))
+        self.assertEqual(self.refresh(token).status_code, 401)
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter(1000, 0.01)
+        items = [f'jti-{index}' for index in range(1000)]
+        for item in items:
+            bloom.add(item)
+        self.assertTrue(all(item in bloom for item in items))
+        false_positives = sum(f'other-{index}' in bloom for index in range(10000))
+        self.assertLess(false_positives, 300)
+
+    def test_bloom_filter_counts_distinct_items(self):
+        bloom = BloomFilter(1000, 0.01)
+        self.assertTrue(bloom.add('jti'))
+        self.assertFalse(bloom.add('jti'))
+        self.assertEqual(bloom.count, 1)
+
+    def test_overlapping_syncs_do_not_fill_the_filter(self):
+        self.assertEqual(self.refresh(RefreshToken.for_user(self.user)).status_code, 200)
+        bloom = blacklist_filter.bloom
+        for _ in range(3):
+            blacklist_filter.next_sync = 0
+            blacklist_filter.sync()
+        self.assertIs(blacklist_filter.bloom, bloom)
+        self.assertEqual(bloom.count, 1)
+
+    def test_full_filter_is_rebuilt_outside_the_lock(self):
+        live, expired = RefreshToken.for_user(self.user), RefreshToken.for_user(self.user)
+        self.refresh(live)
+        self.refresh(expired)
+        OutstandingToken.objects.filter(jti=expired['jti']).update(expires_at=timezone.now() - timedelta(minutes=1))
+        full = blacklist_filter.bloom = BloomFilter(1, 0.01)
+        full.add('old-jti')
+        rebuild = blacklist_filter.rebuild
+
+        def check_while_rebuilding(generation):
+            self.assertFalse(blacklist_filter._lock.locked())
+            # Other requests keep using the full filter meanwhile
+            self.assertTrue(blacklist_filter.might_contain('old-jti'))
+            self.assertIs(blacklist_filter.bloom, full)
+            rebuild(generation)
+
+        blacklist_filter.next_sync = 0
+        with mock.patch.object(blacklist_filter, 'rebuild', side_effect=check_while_rebuilding) as patched:
+            blacklist_filter.sync()
+        patched.assert_called_once()
+        self.assertFalse(blacklist_filter.rebuilding)
+        self.assertIn(live['jti'], blacklist_filter.bloom)
+        self.assertNotIn('old-jti', blacklist_filter.bloom)
+        self.assertEqual(blacklist_filter.bloom.count, 1)
+
+    def test_prune_deletes_expired_tokens_only(self):
+        live = RefreshToken.for_user(self.user)
+        expired = [RefreshToken.for_user(self.user) for _ in range(5)]
+        self.refresh(expired[0])
+        OutstandingToken.objects.filter(jti__in=[token['jti'] for token in expired]).update(
+            expires_at=timezone.now() - timedelta(minutes=1)
+        )
+        call_command('prune_tokens', chunk_size=2, stdout=open(os.devnull, 'w'))
+        self.assertTrue(OutstandingToken.objects.filter(jti=live['jti']).exists())
+        self.assertFalse(OutstandingToken.objects.filter(jti__in=[token['jti'] for token in expired]).exists())
+        self.assertFalse(BlacklistedToken.objects.exists())
+
+
+@override_settings(PASSWORD_HASHING_WORKERS=1, PASSWORD_HASHING_MAX_PENDING=2)
+class PasswordHashingTestCase(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='owner@example.com', password='secret-pass')
+
+    def login(self, password='secret-pass'):
+        return self.client.post(reverse('accounts:token_obtain_pair'),
+                                {'email': self.user.email, 'password': password}, format='json')
+
+    def test_login_checks_password_in_pool(self):
+        self.assertIsNotNone(get_executor()._pool)
+        self.assertEqual(self.login().status_code, 200)
+        self.assertEqual(self.login('wrong-pass').status_code, 401)
+        self.assertEqual(self.client.post(reverse('accounts:token_obtain_pair'),
+                                          {'email': 'nobody@example.com', 'password': 'x'}, format='json').status_code,
+                         401)
+
+    def test_full_queue_fails_fast(self):
+        executor = get_executor()
+        for _ in range(2):
+            executor._slots.acquire()
+        try:
+            response = self.login()
+        finally:
+            for _ in range(2):
+                executor._slots.release()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.data['detail'].code, 'hashing_unavailable')
+
+    def test_slow_hash_times_out(self):
+        with override_settings(PASSWORD_HASHING_TIMEOUT=0.001):
+            self.assertEqual(self.login().status_code, 503)
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.PBKDF2PasswordHasher',
+                                         'django.contrib.auth.hashers.MD5PasswordHasher'])
+    def test_outdated_hash_is_upgraded(self):
+        CustomUser.objects.filter(pk=self.user.pk).update(
+            password=make_password('secret-pass', hasher='md5')
+        )
+        self.assertEqual(self.login().status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$'))
+        self.assertEqual(self.login().status_code, 200)
+
+
+class FailingEmailBackend(EmailBackend):
+    """ locmem backend whose server refuses the first `failures` messages """
+    failures = 0
+
+    def send_messages(self, messages):
+        if FailingEmailBackend.failures:
+            FailingEmailBackend.failures -= 1
+            raise ConnectionRefusedError('SMTP server unavailable')
+        return super().send_messages(messages)
+
+
+class UnreachableEmailBackend(EmailBackend):
+    """ locmem backend whose server cannot be connected to """
+
+    def open(self):
+        raise ConnectionRefusedError('Connection refused')
+
+
+class EmailOutboxTestCase(TestCase):
+    def test_registration_queues_instead_of_sending(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('accounts:register'), {'email': 'new@example.com', 'password': 'secret-pass'},
+                                        content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(mail.outbox, [])
+        queued = OutboundEmail.objects.get()
+        self.assertEqual((queued.subject, queued.recipients, queued.status), ('Your OTP Code', ['new@example.com'], 'PENDING'))
+        # The emailed code is the one the OTP store accepts
+        self.assertTrue(any(otp_store.verify('new@example.com', otp)
+                            for otp in re.findall(r'\b\d{6}\b', queued.html_body)))
+
+    def test_dispatch_delivers_and_marks_sent(self):
+        queue_mail('Hello', 'plain', 'from@example.com', ['to@example.com'], html_message='<p>html</p>')
+        queue_mail('Second', 'plain', 'from@example.com', ['other@example.com'])
+
+        self.assertEqual(EmailDispatcher(batch_size=1).dispatch(), (2, 0))
+        self.assertEqual([message.subject for message in mail.outbox], ['Hello', 'Second'])
+        self.assertEqual(mail.outbox[0].alternatives[0][0], '<p>html</p>')
+        self.assertFalse(OutboundEmail.objects.exclude(status='SENT').exists())
+        # Nothing is sent twice
+        self.assertEqual(EmailDispatcher().dispatch(), (0, 0))
+
+    @override_settings(EMAIL_BACKEND='users.tests.FailingEmailBackend', EMAIL_OUTBOX_MAX_ATTEMPTS=2,
+                       EMAIL_OUTBOX_RETRY_DELAY=0)
+    def test_failed_delivery_is_retried_then_given_up(self):
+        message = queue_mail('Hello', 'plain', 'from@example.com', ['to@example.com'])
+        FailingEmailBackend.failures = 1
+        self.assertEqual(EmailDispatcher().dispatch(), (0, 1))
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts, message.last_error), ('PENDING', 1, 'SMTP server unavailable'))
+
+        self.assertEqual(EmailDispatcher().dispatch(), (1, 0))
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), ('SENT', 2))
+
+        failing = queue_mail('Never', 'plain', 'from@example.com', ['to@example.com'])
+        FailingEmailBackend.failures = 2
+        # One attempt per run, even when the retry is already due
+        self.assertEqual(EmailDispatcher().dispatch(), (0, 1))
+        self.assertEqual(EmailDispatcher().dispatch(), (0, 1))
+        failing.refresh_from_db()
+        self.assertEqual((failing.status, failing.attempts), ('FAILED', 2))
+
+    @override_settings(EMAIL_BACKEND='users.tests.UnreachableEmailBackend', EMAIL_OUTBOX_MAX_ATTEMPTS=2,
+                       EMAIL_OUTBOX_RETRY_DELAY=60)
+    def test_connection_failure_fails_the_whole_batch(self):
+        messages = [queue_mail(f'Message {index}', 'plain', 'from@example.com', ['to@example.com'])
+                    for index in range(3)]
+        before = timezone.now()
+        self.assertEqual(EmailDispatcher(batch_size=2).dispatch(), (0, 3))
+        for message in messages:
+            message.refresh_from_db()
+            self.assertEqual((message.status, message.attempts, message.last_error, message.claim_token),
+                             ('PENDING', 1, 'Connection refused', ''))
+            self.assertGreaterEqual(message.next_attempt_at, before + timedelta(seconds=60))
+
+        OutboundEmail.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(EmailDispatcher().dispatch(), (0, 3))
+        self.assertEqual(list(OutboundEmail.objects.order_by().values_list('status', 'attempts').distinct()), [('FAILED', 2)])
+
+    @override_settings(EMAIL_BACKEND='users.tests.UnreachableEmailBackend')
+    def test_loop_survives_dispatch_errors(self):
+        queue_mail('Hello', 'plain', 'from@example.com', ['to@example.com'])
+        errors = [OperationalError('database is locked')]
+
+        def dispatch(dispatcher):
+            if errors:
+                raise errors.pop()
+            raise KeyboardInterrupt
+
+        with mock.patch.object(EmailDispatcher, 'dispatch', dispatch), mock.patch('time.sleep') as sleep, \
+                self.assertLogs('users.management.commands.dispatch_emails', 'ERROR'):
+            call_command('dispatch_emails', loop=True, interval=3, stdout=io.StringIO())
+        sleep.assert_called_once_with(3)
+
+        with mock.patch.object(EmailDispatcher, 'dispatch', side_effect=OperationalError('database is locked')):
+            with self.assertRaises(OperationalError):
+                call_command('dispatch_emails', stdout=io.StringIO())
+
+
+class PooledSMTPBackendTestCase(SimpleTestCase):
+    def setUp(self):
+        self.server = StandInSMTPServer().start()
+        self.connection_kwargs = {'host': '127.0.0.1', 'port': self.server.port, 'username': '', 'password': '',
+                                  'use_tls': False, 'use_ssl': False, 'timeout': 5}
+        self.addCleanup(self.server.stop)
+        self.addCleanup(lambda: get_pool(**self.connection_kwargs).close_all())
+
+    def messages(self, count):
+        return [EmailMessage(f'Message {index}', 'body', 'from@example.com', ['to@example.com']) for index in range(count)]
+
+    def test_sessions_are_reused(self):
+        backend = PooledSMTPBackend(**self.connection_kwargs)
+        self.assertEqual(backend.send_messages(self.messages(3)), 3)
+        self.assertEqual(backend.send_messages(self.messages(2)), 2)
+        self.assertEqual((self.server.sessions, self.server.messages), (1, 5))
+
+    def test_dropped_session_is_reopened(self):
+        backend = PooledSMTPBackend(**self.connection_kwargs)
+        backend.open()
+        backend.send_messages(self.messages(1))
+        # The server goes away under the open session
+        backend.connection.backend.connection.sock.shutdown(socket.SHUT_RDWR)
+        self.assertEqual(backend.send_messages(self.messages(2)), 2)
+        backend.close()
+        self.assertEqual((self.server.sessions, self.server.messages), (2, 3))
+
+    @override_settings(EMAIL_POOL_MAX_MESSAGES=2)
+    def test_session_is_renewed_after_max_messages(self):
+        PooledSMTPBackend(**self.connection_kwargs).send_messages(self.messages(5))
+        self.assertEqual((self.server.sessions, self.server.messages), (3, 5))
@@ -1,17 +1,27 @@
-import random
-from django.utils import timezone
-from datetime import timedelta
-from django.conf import settings
+import secrets
 
 
 def generate_otp():
-    return str(random.randint(100000, 999999))
+    return str(100000 + secrets.randbelow(900000))
 
 
-def set_otp(user):
-    otp = generate_otp()
-    user.otp = otp
-    opt_expiration_time = int(getattr(settings, 'OTP_EXPIRATION_TIME', 5))
-    user.otp_expiration = timezone.now() + timedelta(minutes=opt_expiration_time)
-    user.save()
-    return otp
+def save_changes(instance, **changes):
+    """
+    Assign changes to instance and write only the columns whose value actually differs,
+    with save(update_fields=...) so post_save receivers still run.
+    Returns the names of the fields that were written.
+    """
+    changed = [name for name, value in changes.items() if getattr(instance, name) != value]
+    for name in changed:
+        setattr(instance, name, changes[name])
+    if changed:
+        instance.save(update_fields=changed)
+    return changed
+
+
+def prefix_range(prefix):
+    """
+    Bounds for a prefix match written as a range (value >= lower AND value < upper),
+    which a B-tree index can serve where LIKE 'prefix%' cannot.
+    """
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
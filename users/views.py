@@ -15,8 +15,11 @@ from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.tokens import RefreshToken, AccessToken
 from django.shortcuts import get_object_or_404
 
+from cards.conditional import conditional_response, make_etag, set_validators
 from cards.permissions import IsAdminOrManager
+from users import hashing
 from users.tokens import account_activation_token
+from users.utils import save_changes
 from .models import CustomUser
 from .serializers import CustomUserSerializer, ResendActivationEmailSerializer, \
     PasswordResetSerializer, PasswordChangeSerializer, AuthSerializer, VerifyOTPSerializer, ResendOTPSerializer, \
@@ -74,6 +77,9 @@ class UserInfoFromTokenAPI(APIView):
                 response=AuthSerializer,
                 description="Successfully retrieved user information."
             ),
+            304: OpenApiResponse(
+                description="Not modified - If-None-Match matched."
+            ),
             401: OpenApiResponse(
                 description="Unauthorized - Invalid or expired token."
             ),
@@ -86,6 +92,13 @@ class UserInfoFromTokenAPI(APIView):
     def get(self, request):
         # If authenticated, get the user from the request
         user = request.user
+        # CustomUser has no modification timestamp, so only an ETag over the returned fields is offered
+        etag = make_etag('user-info', user.id, user.first_name, user.last_name, user.email,
+                         user.profile_picture.name, user.role)
+        not_modified = conditional_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+
         user_data = {
             "id": user.id,
             "first_name": user.first_name,
@@ -94,7 +107,7 @@ class UserInfoFromTokenAPI(APIView):
             "dp": user.profile_picture.url if user.profile_picture else None,
             'role': user.role
         }
-        return Response(user_data, status=status.HTTP_200_OK)
+        return set_validators(Response(user_data, status=status.HTTP_200_OK), etag)
 
 
 class UpdateUserInfoAPI(APIView):
@@ -177,8 +190,7 @@ class UpdateUserRoleView(APIView):
                 )
 
             # Update user role
-            target_user.role = serializer.validated_data['role']
-            target_user.save()
+            save_changes(target_user, role=serializer.validated_data['role'])
 
             return Response({
                 'message': 'User role updated successfully',
@@ -266,8 +278,8 @@ class PasswordResetConfirmView(APIView):
             password_confirm = request.data.get('password_confirm')
 
             if password and password_confirm and password == password_confirm:
-                user.set_password(password)
-                user.save()
+                hashing.set_password(user, password)
+                user.save(update_fields=['password'])
                 return Response({'status': 'password reset complete'}, status=status.HTTP_200_OK)
             else:
                 return Response({'status': 'passwords do not match'}, status=status.HTTP_400_BAD_REQUEST)